@@ -9,6 +9,9 @@ from dbt.exceptions import DbtRuntimeError
 # https://github.com/trinodb/trino/blob/master/core/trino-spi/src/main/java/io/trino/spi/type/VarcharType.java
 TRINO_VARCHAR_MAX_LENGTH = 2147483646
 
+# Integer types, from the narrowest to the widest
+INTEGER_TYPES = ("tinyint", "smallint", "integer", "bigint")
+
 
 @dataclass
 class ExtricaColumn(Column):
@@ -48,6 +51,28 @@ class ExtricaColumn(Column):
     def is_numeric(self) -> bool:
         return self.dtype.lower() == "decimal"
 
+    def can_widen_to(self, other: "ExtricaColumn") -> bool:
+        """Whether every value of this column fits the type of `other`, so
+        that the column type can be changed without rewriting any data.
+        """
+        dtype, other_dtype = self.dtype.lower(), other.dtype.lower()
+        if dtype == "int":
+            dtype = "integer"
+        if other_dtype == "int":
+            other_dtype = "integer"
+        if dtype == "varchar" and other_dtype == "varchar":
+            return other.string_size() >= self.string_size()
+        if dtype in INTEGER_TYPES and other_dtype in INTEGER_TYPES:
+            return INTEGER_TYPES.index(other_dtype) >= INTEGER_TYPES.index(dtype)
+        if dtype == "decimal" and other_dtype == "decimal":
+            return (
+                self.numeric_precision is not None
+                and other.numeric_precision is not None
+                and other.numeric_scale == self.numeric_scale
+                and other.numeric_precision >= self.numeric_precision
+            )
+        return dtype == "real" and other_dtype == "double"
+
     @classmethod
     def string_type(cls, size: int) -> str:
         return "varchar({})".format(size)
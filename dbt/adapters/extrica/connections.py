@@ -1,13 +1,15 @@
 import decimal
 import re
+import time
+from functools import lru_cache
+from itertools import islice
 from abc import ABCMeta, abstractmethod
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import date, datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import sqlparse
 import trino
 from dbt.adapters.base import Credentials
 from dbt.adapters.sql import SQLConnectionManager
@@ -15,14 +17,79 @@ from dbt.contracts.connection import AdapterResponse
 from dbt.events import AdapterLogger
 from dbt.exceptions import DbtDatabaseError, DbtRuntimeError, FailedToConnectError
 from dbt.helper_types import Port
-from dbt.adapters.extrica.token_handler import JWTHandler
+from dbt.adapters.extrica.metadata_cache import (
+    METADATA_CACHE_SIZE_DEFAULT,
+    METADATA_CACHE_TTL_DEFAULT,
+    MetadataResultCache,
+    is_metadata_query,
+)
+from dbt.adapters.extrica.profiling import (
+    PROFILE_SQL_MAX_LENGTH,
+    ProfilingSink,
+    close_profiling_sinks,
+    get_profiling_sink,
+    query_stats,
+)
+from dbt.adapters.extrica.session_pool import all_http_session_pools, get_http_session_pool
+from dbt.adapters.extrica.token_handler import ExtricaJWTAuthentication, get_jwt_handler
 from trino.transaction import IsolationLevel
 
 from dbt.adapters.extrica.__version__ import version
 
 logger = AdapterLogger("Extrica")
 PREPARED_STATEMENTS_ENABLED_DEFAULT = True
-jwt_handler: JWTHandler = None
+STREAM_RESULTS_DEFAULT = False
+# SQL longer than this is split without going through the LRU cache, so
+# large one-off statements (e.g. seed inserts) are not kept in memory
+SPLIT_CACHE_MAX_SQL_LENGTH = 65536
+
+# string literals, quoted identifiers, comments and statement separators
+_SQL_TOKENS = re.compile(
+    r"""'[^']*(?:''[^']*)*'|"[^"]*(?:""[^"]*)*"|--[^\n]*|/\*.*?(?:\*/|\Z)|;""",
+    re.DOTALL,
+)
+
+
+
+def _split_sql_statements(sql: str) -> Tuple[str, ...]:
+    statements = []
+    start = 0
+    end = 0
+    has_code = False
+    for match in _SQL_TOKENS.finditer(sql):
+        if not has_code and sql[end : match.start()].strip():
+            has_code = True
+        end = match.end()
+
+        token = match.group()
+        if token == ";":
+            if has_code:
+                statements.append(sql[start : match.start()].strip())
+            start = end
+            has_code = False
+        elif token[0] in "'\"":
+            has_code = True
+
+    if has_code or sql[end:].strip():
+        statements.append(sql[start:].strip())
+    return tuple(statements)
+
+
+_split_sql_statements_cached = lru_cache(maxsize=512)(_split_sql_statements)
+
+
+def split_sql_statements(sql: str) -> Tuple[str, ...]:
+    """Split `sql` on the `;` that are not part of a string literal, a quoted
+    identifier or a comment. Statements made only of comments and whitespace
+    are left out.
+    """
+    if ";" not in sql and "--" not in sql and "/*" not in sql:
+        stripped = sql.strip()
+        return (stripped,) if stripped else ()
+    if len(sql) > SPLIT_CACHE_MAX_SQL_LENGTH:
+        return _split_sql_statements(sql)
+    return _split_sql_statements_cached(sql)
+
 
 class HttpScheme(Enum):
     HTTP = "http"
@@ -73,6 +140,12 @@ class ExtricaCredentials(Credentials, metaclass=ABCMeta):
             "catalog",
             "cert",
             "prepared_statements_enabled",
+            "stream_results",
+            "http_pool_size",
+            "profiling_output",
+            "metadata_cache",
+            "metadata_cache_ttl",
+            "metadata_cache_size",
         )
 
     @abstractmethod
@@ -95,6 +168,12 @@ class ExtricaJwtCredentials(ExtricaCredentials):
     http_headers: Optional[Dict[str, str]] = None
     session_properties: Dict[str, Any] = field(default_factory=dict)
     prepared_statements_enabled: bool = PREPARED_STATEMENTS_ENABLED_DEFAULT
+    stream_results: bool = STREAM_RESULTS_DEFAULT
+    http_pool_size: Optional[int] = None
+    profiling_output: Optional[str] = None
+    metadata_cache: bool = False
+    metadata_cache_ttl: int = METADATA_CACHE_TTL_DEFAULT
+    metadata_cache_size: int = METADATA_CACHE_SIZE_DEFAULT
     retries: Optional[int] = trino.constants.DEFAULT_MAX_ATTEMPTS
     timezone: Optional[str] = None
 
@@ -107,11 +186,12 @@ class ExtricaJwtCredentials(ExtricaCredentials):
         return "jwt"
 
     def trino_auth(self):
-        global jwt_handler 
-        if jwt_handler == None:
-            jwt_handler = JWTHandler(host=self.host ,username= self.username, password= self.password)
-            self.jwt_token = jwt_handler.get_token()      
-        return trino.auth.JWTAuthentication(self.jwt_token)
+        jwt_handler = get_jwt_handler(host=self.host, username=self.username, password=self.password)
+        return ExtricaJWTAuthentication(jwt_handler.get_token)
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
 
 class ConnectionWrapper(object):
     """Wrap a Trino connection in a way that accomplishes two tasks:
@@ -120,16 +200,38 @@ class ConnectionWrapper(object):
         persist to the db but then present the usual cursor interface
     - provide `cancel()` on the same object as `commit()`/`rollback()`/...
 
+    When `stream_results` is enabled, rows of a query are not prefetched but
+    pulled lazily page by page from the Trino protocol as they are fetched.
+    Statements that only report an update count (DDL/DML) are always run to
+    completion in execute(), without keeping their result around. A streamed
+    query is still running when execute() returns, so its final stats are not
+    known yet and `streaming` is set for the adapter response to leave them out.
+
     """
 
-    def __init__(self, handle, prepared_statements_enabled):
+    def __init__(
+        self,
+        handle,
+        prepared_statements_enabled,
+        stream_results=False,
+        http_session_pool=None,
+        http_session=None,
+    ):
         self.handle = handle
         self._cursor = None
         self._fetch_result = None
+        self.streaming = False
         self._prepared_statements_enabled = prepared_statements_enabled
+        self._stream_results = stream_results
+        self._http_session_pool = http_session_pool
+        self._http_session = http_session
+        # client-side timings of the last execute(), in milliseconds
+        self.timings: Dict[str, Optional[float]] = {}
 
     def cursor(self):
         self._cursor = self.handle.cursor()
+        self._fetch_result = None
+        self.streaming = False
         return self
 
     def cancel(self):
@@ -137,7 +239,14 @@ class ConnectionWrapper(object):
             self._cursor.cancel()
 
     def close(self):
-        # this is a noop on trino, but pass it through anyway
+        if self._http_session_pool is not None:
+            # trino would close the http session, hand it back to the pool
+            # instead so that its connections are kept alive for reuse
+            self._http_session_pool.release(self._http_session)
+            self._http_session_pool = None
+            self._http_session = None
+            return
+
         self.handle.close()
 
     def commit(self):
@@ -150,37 +259,24 @@ class ConnectionWrapper(object):
         pass
 
     def fetchall(self):
-        if self._cursor is None:
+        if self._cursor is None or self._fetch_result is None:
             return None
 
-        if self._fetch_result is not None:
-            ret = self._fetch_result
-            self._fetch_result = None
-            return ret
-
-        return None
+        ret = list(self._fetch_result)
+        self._fetch_result = None
+        return ret
 
     def fetchone(self):
-        if self._cursor is None:
+        if self._cursor is None or self._fetch_result is None:
             return None
 
-        if self._fetch_result is not None:
-            ret = self._fetch_result[0]
-            self._fetch_result = None
-            return ret
-
-        return None
+        return next(self._fetch_result, None)
 
     def fetchmany(self, size):
-        if self._cursor is None:
+        if self._cursor is None or self._fetch_result is None:
             return None
 
-        if self._fetch_result is not None:
-            ret = self._fetch_result[:size]
-            self._fetch_result = None
-            return ret
-
-        return None
+        return list(islice(self._fetch_result, size))
 
     def execute(self, sql, bindings=None):
         if not self._prepared_statements_enabled and bindings is not None:
@@ -190,13 +286,45 @@ class ConnectionWrapper(object):
             bindings = tuple(self._escape_value(b) for b in bindings)
             sql = sql % bindings
 
+            start = time.perf_counter()
             result = self._cursor.execute(sql)
         else:
+            start = time.perf_counter()
             result = self._cursor.execute(sql, params=bindings)
-
-        self._fetch_result = self._cursor.fetchall()
+        execute_ms = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        self.streaming = False
+        if not self._stream_results:
+            self._fetch_result = iter(self._cursor.fetchall())
+        elif self._cursor.update_type is not None:
+            # the statement returns no rows, only an update count: drain the
+            # remaining pages so that the query finishes, but keep nothing.
+            for _ in iter(self._cursor.fetchone, None):
+                pass
+        else:
+            self._fetch_result = self._stream_rows(self._cursor)
+            self.streaming = True
+            # rows are fetched later, by the caller
+            start = None
+        self.timings = {
+            "execute_ms": execute_ms,
+            "fetch_ms": _elapsed_ms(start) if start is not None else None,
+        }
         return result
 
+    @staticmethod
+    def _stream_rows(cursor):
+        # rows are pulled outside of the connection manager's exception
+        # handler, translate trino errors the way it would
+        try:
+            yield from iter(cursor.fetchone, None)
+        except trino.exceptions.Error as e:
+            if isinstance(e, trino.exceptions.TrinoQueryError):
+                logger.debug("Trino query id: {}".format(e.query_id))
+            logger.debug("Trino error: {}".format(e))
+            raise DbtDatabaseError(str(e)) from e
+
     @property
     def description(self):
         return self._cursor.description
@@ -228,11 +356,44 @@ class ConnectionWrapper(object):
 class ExtricaAdapterResponse(AdapterResponse):
     query: str = ""
     query_id: str = ""
+    # from the `stats` block Trino reports for the query
+    cpu_time_ms: Optional[int] = None
+    wall_time_ms: Optional[int] = None
+    queued_time_ms: Optional[int] = None
+    elapsed_time_ms: Optional[int] = None
+    peak_memory_bytes: Optional[int] = None
+    processed_rows: Optional[int] = None
+    processed_bytes: Optional[int] = None
+    physical_input_bytes: Optional[int] = None
+    spilled_bytes: Optional[int] = None
+    total_splits: Optional[int] = None
 
 
 class ExtricaConnectionManager(SQLConnectionManager):
     TYPE = "extrica"
 
+    # both disabled unless the profile enables them
+    _profiling_sink: Optional[ProfilingSink] = None
+    _metadata_cache: Optional[MetadataResultCache] = None
+
+    def __init__(self, profile):
+        super().__init__(profile)
+        credentials = profile.credentials
+        # size the shared http session pool so every dbt thread can keep
+        # its own keep-alive session, unless the profile overrides it
+        get_http_session_pool(
+            credentials.host,
+            credentials.username,
+            getattr(credentials, "http_pool_size", None) or profile.threads,
+        )
+        profiling_output = getattr(credentials, "profiling_output", None)
+        self._profiling_sink = get_profiling_sink(profiling_output) if profiling_output else None
+        self._metadata_cache = (
+            MetadataResultCache(credentials.metadata_cache_ttl, credentials.metadata_cache_size)
+            if getattr(credentials, "metadata_cache", False)
+            else None
+        )
+
     @contextmanager
     def exception_handler(self, sql):
         try:
@@ -276,6 +437,10 @@ class ExtricaConnectionManager(SQLConnectionManager):
 
         conn_args = {}
 
+        http_session_pool = get_http_session_pool(credentials.host, credentials.username)
+        http_session = http_session_pool.acquire()
+        http_session.verify = credentials.cert
+
         # it's impossible for trino to fail here as 'connections' are actually
         # just cursor factories.
         trino_conn = trino.dbapi.connect(
@@ -297,9 +462,16 @@ class ExtricaConnectionManager(SQLConnectionManager):
             source=f"dbt-extrica-{version}",
             verify=credentials.cert,
             timezone=credentials.timezone,
+            http_session=http_session,
         )
         connection.state = "open"
-        connection.handle = ConnectionWrapper(trino_conn, credentials.prepared_statements_enabled)
+        connection.handle = ConnectionWrapper(
+            trino_conn,
+            credentials.prepared_statements_enabled,
+            credentials.stream_results,
+            http_session_pool,
+            http_session,
+        )
         return connection
 
     @classmethod
@@ -310,35 +482,60 @@ class ExtricaConnectionManager(SQLConnectionManager):
             query=cursor._cursor.query,
             query_id=cursor._cursor.query_id,
             rows_affected=cursor._cursor.rowcount,
+            # the stats of a streamed query are those of its first page
+            **({} if cursor.streaming else query_stats(cursor._cursor.stats)),
         )  # type: ignore
 
     def cancel(self, connection):
         connection.handle.cancel()
 
-    def add_query(self, sql, auto_begin=True, bindings=None, abridge_sql_log=False):
+    def cleanup_all(self):
+        super().cleanup_all()
+        close_profiling_sinks()
+        for (host, username), pool in all_http_session_pools().items():
+            stats = pool.stats()
+            logger.debug(
+                "HTTP session pool for {}@{}: {} hits, {} misses, {} idle sessions".format(
+                    username, host, stats["hits"], stats["misses"], stats["idle"]
+                )
+            )
+        if self._metadata_cache is not None:
+            stats = self._metadata_cache.stats()
+            logger.debug(
+                "Metadata result cache: {} hits, {} misses, {} evictions, {} invalidations".format(
+                    stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"]
+                )
+            )
+    def add_query(
+        self, sql, auto_begin=True, bindings=None, abridge_sql_log=False, single_statement=False
+    ):
+        """Run each of the statements in `sql`.
+
+        Callers that know `sql` is a single statement (e.g. the seed loader)
+        can pass `single_statement=True` to skip splitting it.
+        """
         connection = None
         cursor = None
 
-        # TODO: is this sufficient? Largely copy+pasted from snowflake, so
-        # there's some common behavior here we can maybe factor out into the
-        # SQLAdapter?
-        queries = [q.rstrip(";") for q in sqlparse.split(sql)]
+        start = time.perf_counter()
+        if single_statement:
+            queries = (sql,) if sql.strip() else ()
+        else:
+            queries = split_sql_statements(sql)
+        split_ms = _elapsed_ms(start)
 
         for individual_query in queries:
-            # hack -- after the last ';', remove comments and don't run
-            # empty queries. this avoids using exceptions as flow control,
-            # and also allows us to return the status of the last cursor
-            without_comments = re.sub(
-                re.compile("^.*(--.*)$", re.MULTILINE), "", individual_query
-            ).strip()
-
-            if without_comments == "":
-                continue
-
+            start = time.perf_counter()
             parent = super(ExtricaConnectionManager, self)
             connection, cursor = parent.add_query(
                 individual_query, auto_begin, bindings, abridge_sql_log
             )
+            if self._profiling_sink is not None:
+                self._record_profile(connection, cursor, _elapsed_ms(start), split_ms)
+                # splitting is reported once, with the first statement
+                split_ms = None
+            if self._metadata_cache is not None:
+                self._metadata_cache.invalidate(individual_query)
 
         if cursor is None:
             conn = self.get_thread_connection()
@@ -356,6 +553,38 @@ class ExtricaConnectionManager(SQLConnectionManager):
 
         return connection, cursor
 
+    def execute(
+        self, sql: str, auto_begin: bool = False, fetch: bool = False, limit: Optional[int] = None
+    ):
+        cache = self._metadata_cache
+        if cache is None or not fetch or not is_metadata_query(sql):
+            return super().execute(sql, auto_begin, fetch, limit)
+
+        # keyed on the SQL before the query comment is added, which differs
+        # from one node to the other
+        key = (sql, limit)
+        result = cache.get(key)
+        if result is not None:
+            logger.debug("Using cached result of metadata query: {}".format(sql))
+            return result
+
+        generation = cache.generation
+        result = super().execute(sql, auto_begin, fetch, limit)
+        cache.put(key, sql, result, generation)
+        return result
+
+    def _record_profile(self, connection, cursor, add_query_ms, split_ms):
+        self._profiling_sink.record(
+            connection=connection.name,
+            query_id=cursor._cursor.query_id,
+            sql=cursor._cursor.query[:PROFILE_SQL_MAX_LENGTH],
+            rows_affected=cursor._cursor.rowcount,
+            split_ms=split_ms,
+            add_query_ms=add_query_ms,
+            **cursor.timings,
+            stats={} if cursor.streaming else query_stats(cursor._cursor.stats),
+        )
+
     @classmethod
     def data_type_code_to_name(cls, type_code) -> str:
         return type_code.split("(")[0].upper()
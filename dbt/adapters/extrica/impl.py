@@ -1,8 +1,15 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, Optional
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import agate
-from dbt.adapters.base.impl import AdapterConfig, ConstraintSupport
+from dbt.adapters.base.impl import AdapterConfig, ConstraintSupport, catch_as_completed
+from dbt.adapters.base.meta import available
 from dbt.adapters.capability import (
     Capability,
     CapabilityDict,
@@ -10,16 +17,100 @@ from dbt.adapters.capability import (
     Support,
 )
 from dbt.adapters.sql import SQLAdapter
+from dbt.context.base import BaseContext
+from dbt.contracts.graph.manifest import Manifest
 from dbt.contracts.graph.nodes import ConstraintType
-from dbt.exceptions import DbtDatabaseError
+from dbt.exceptions import DbtDatabaseError, DbtRuntimeError
+from dbt.utils import executor
 
 from dbt.adapters.extrica import ExtricaColumn, ExtricaConnectionManager, ExtricaRelation
+from dbt.adapters.extrica.connections import ExtricaAdapterResponse, logger
+
+from dbt.adapters.extrica.incremental import (
+    DEFAULT_MICROBATCH_PARALLELISM,
+    DEFAULT_MICROBATCH_RETRIES,
+    MICROBATCH_BATCH_SIZES,
+    MicrobatchWindow,
+    microbatch_windows,
+    offset_timestamp,
+    partition_columns_from_properties,
+    render_partition_predicates,
+    render_range_predicates,
+    truncate_timestamp,
+    typed_literal,
+)
+from dbt.adapters.extrica.seed import (
+    DEFAULT_SEED_BATCH_BYTES,
+    DEFAULT_SEED_PARALLELISM,
+    StagedSeed,
+    build_seed_batches,
+    remove_staged_seed,
+    write_staged_seed,
+)
+
+GET_COLUMNS_IN_RELATIONS_MACRO_NAME = "extrica__get_columns_in_relations"
+LIST_RELATIONS_IN_SCHEMAS_MACRO_NAME = "extrica__list_relations_in_schemas"
+# Maximum number of schemas listed in a single information_schema query
+LIST_RELATIONS_CHUNK_SIZE = 100
+# Maximum number of schemas, or relations, documented by a single catalog query
+CATALOG_SCHEMAS_CHUNK_SIZE = 10
+CATALOG_RELATIONS_CHUNK_SIZE = 50
+# Maximum number of table names listed in a single information_schema query
+COLUMNS_PREFETCH_CHUNK_SIZE = 500
+# Connectors whose tables support MERGE; hive only does for transactional
+# tables, which is why it is not listed
+MERGE_CONNECTORS = frozenset(["iceberg", "delta_lake", "delta-lake", "kudu"])
+# Connectors supporting CREATE OR REPLACE TABLE
+CREATE_OR_REPLACE_CONNECTORS = frozenset(["iceberg", "delta_lake", "delta-lake"])
+# Connectors able to change the type of a column without rewriting the table.
+# postgresql is left out: it supports SET DATA TYPE, but rewrites the table
+# for most type changes, e.g. integer to bigint
+SET_DATA_TYPE_CONNECTORS = frozenset(["iceberg", "memory"])
+# Number of column comments updated at once by persist_docs
+COLUMN_COMMENTS_PARALLELISM = 4
+# Number of materialized views refreshed at once by refresh_materialized_views
+MATERIALIZED_VIEW_REFRESH_PARALLELISM = 4
+# Number of GRANT/REVOKE statements run at once
+GRANTS_PARALLELISM = 4
+# Number of relations dropped at once by drop_schema, and the number of
+# times the drops that failed are retried
+DROP_SCHEMA_PARALLELISM = 8
+DROP_SCHEMA_RETRIES = 2
+# Number of threads dropping relations in the background
+BACKGROUND_DROP_WORKERS = 2
+
+
+@dataclass
+class ConcurrentStatement:
+    """A statement run by `ExtricaAdapter._run_concurrently`, named by
+    `label` in the worker connections and in the errors.
+    """
+
+    label: str
+    sql: str
+    bindings: Optional[Any] = None
 
 
 @dataclass
 class ExtricaConfig(AdapterConfig):
     properties: Optional[Dict[str, str]] = None
     view_security: Optional[str] = "definer"
+    seed_batch_bytes: Optional[int] = DEFAULT_SEED_BATCH_BYTES
+    seed_parallelism: Optional[int] = DEFAULT_SEED_PARALLELISM
+    seed_load_method: Optional[str] = "insert"
+    seed_staging_location: Optional[str] = None
+    seed_staging_catalog: Optional[str] = None
+    seed_staging_schema: Optional[str] = None
+    partition_by: Optional[List[str]] = None
+    delete_insert_with_merge: Optional[bool] = False
+    incremental_prune_columns: Optional[List[str]] = None
+    event_time: Optional[str] = None
+    batch_size: Optional[str] = "day"
+    begin: Optional[str] = None
+    lookback: Optional[int] = 1
+    microbatch_apply: Optional[str] = "delete+insert"
+    microbatch_parallelism: Optional[int] = None
+    microbatch_retries: Optional[int] = DEFAULT_MICROBATCH_RETRIES
 
 
 class ExtricaAdapter(SQLAdapter):
@@ -44,6 +135,36 @@ class ExtricaAdapter(SQLAdapter):
         }
     )
 
+    def __init__(self, config):
+        super().__init__(config)
+        # columns of relations, as returned by get_columns_in_relation, for
+        # the duration of the invocation. Entries are dropped whenever the
+        # adapter changes (or rebuilds) the relation.
+        self._columns_cache: Dict[Tuple[Optional[str], ...], List[ExtricaColumn]] = {}
+        self._columns_cache_lock = threading.Lock()
+        self._columns_prefetched_schemas: Set[Tuple[Optional[str], ...]] = set()
+        # bumped on each invalidation, and recorded per relation (and per
+        # schema), so that columns fetched before an invalidation are not
+        # stored after it
+        self._columns_cache_epoch = 0
+        self._columns_invalidated_at: Dict[Tuple[Optional[str], ...], int] = {}
+        self._columns_cache_hits = 0
+        self._columns_cache_misses = 0
+        # connector of each catalog, looked up once per invocation
+        self._catalog_connectors: Dict[str, Optional[str]] = {}
+        self._catalog_connectors_lock = threading.Lock()
+        # relations dropped in the background, waited for at the end of the run
+        self._background_drops: List[Future] = []
+        self._background_drops_executor: Optional[ThreadPoolExecutor] = None
+        self._background_drops_lock = threading.Lock()
+        # privileges of the relations of a schema, fetched at once when the
+        # relations cache is populated, or else on the first grants
+        # reconciliation in the schema. Relations the adapter changed since
+        # are fetched again on their own.
+        self._grants_cache: Dict[Tuple[Optional[str], ...], Dict[str, Dict[str, List[str]]]] = {}
+        self._grants_unknown: Set[Tuple[Optional[str], ...]] = set()
+        self._grants_cache_lock = threading.Lock()
+
     @classmethod
     def date_function(cls):
         return "datenow()"
@@ -68,14 +189,1122 @@ class ExtricaAdapter(SQLAdapter):
     def timestamp_add_sql(self, add_to: str, number: int = 1, interval: str = "hour") -> str:
         return f"{add_to} + interval '{number}' {interval}"
 
+    @staticmethod
+    def _columns_cache_key(relation) -> Tuple[Optional[str], ...]:
+        return tuple(
+            part.lower() if part is not None else None
+            for part in (relation.database, relation.schema, relation.identifier)
+        )
+
+    def _get_cached_columns(self, key) -> Optional[List[ExtricaColumn]]:
+        with self._columns_cache_lock:
+            cached = self._columns_cache.get(key)
+            if cached is not None:
+                self._columns_cache_hits += 1
+                return list(cached)
+        return None
+
+    def _store_columns(self, key, columns: List[ExtricaColumn], epoch: int) -> None:
+        """Cache `columns` fetched at `epoch`, unless the relation or its
+        schema were invalidated since. Called with the lock held.
+        """
+        invalidated_at = max(
+            self._columns_invalidated_at.get(key, 0),
+            self._columns_invalidated_at.get(key[:2], 0),
+        )
+        if invalidated_at <= epoch:
+            self._columns_cache[key] = columns
+
     def get_columns_in_relation(self, relation):
+        key = self._columns_cache_key(relation)
+        cached = self._get_cached_columns(key)
+        if cached is not None:
+            return cached
+
+        # on the first miss in a schema, fetch the columns of all the
+        # relations dbt knows about in that schema with a single query
+        with self._columns_cache_lock:
+            prefetch = key[:2] not in self._columns_prefetched_schemas
+            self._columns_prefetched_schemas.add(key[:2])
+        if prefetch:
+            known = self.cache.get_relations(relation.database, relation.schema)
+            if len(known) > 1:
+                self.prefetch_columns(known)
+                cached = self._get_cached_columns(key)
+                if cached is not None:
+                    return cached
+
+        with self._columns_cache_lock:
+            self._columns_cache_misses += 1
+            epoch = self._columns_cache_epoch
+
         try:
-            return super().get_columns_in_relation(relation)
+            columns = super().get_columns_in_relation(relation)
         except DbtDatabaseError as exc:
             if "does not exist" in str(exc):
                 return []
             else:
                 raise
 
+        if columns:
+            with self._columns_cache_lock:
+                self._store_columns(key, list(columns), epoch)
+        return columns
+
+    @available
+    def prefetch_columns(self, relations: Iterable[ExtricaRelation]) -> str:
+        """Fetch the columns of `relations` with one information_schema.columns
+        query per schema, and store them in the column cache.
+
+        A relation without an identifier stands for every relation of its
+        schema.
+        """
+        identifiers_by_schema: Dict[Tuple[Optional[str], Optional[str]], Optional[Set[str]]] = {}
+        for relation in relations:
+            schema_key = (relation.database, relation.schema)
+            if relation.identifier is None:
+                identifiers_by_schema[schema_key] = None
+            elif schema_key not in identifiers_by_schema:
+                identifiers_by_schema[schema_key] = {relation.identifier.lower()}
+            elif identifiers_by_schema[schema_key] is not None:
+                identifiers_by_schema[schema_key].add(relation.identifier.lower())
+
+        for (database, schema), identifiers in identifiers_by_schema.items():
+            if identifiers is None:
+                chunks: List[Optional[List[str]]] = [None]
+            else:
+                names = sorted(identifiers)
+                chunks = [
+                    names[i : i + COLUMNS_PREFETCH_CHUNK_SIZE]
+                    for i in range(0, len(names), COLUMNS_PREFETCH_CHUNK_SIZE)
+                ]
+            for chunk in chunks:
+                self._prefetch_schema_columns(database, schema, chunk)
+        # so jinja doesn't render things
+        return ""
+
+    def _prefetch_schema_columns(
+        self, database: Optional[str], schema: Optional[str], identifiers: Optional[List[str]]
+    ) -> None:
+        schema_relation = self.Relation.create(database=database, schema=schema)
+        with self._columns_cache_lock:
+            epoch = self._columns_cache_epoch
+        table = self.execute_macro(
+            GET_COLUMNS_IN_RELATIONS_MACRO_NAME,
+            kwargs={
+                "information_schema": schema_relation.information_schema(),
+                "schema": schema,
+                "identifiers": identifiers,
+            },
+        )
+
+        columns_by_table: Dict[str, List[ExtricaColumn]] = defaultdict(list)
+        for row in table:
+            columns_by_table[row["table_name"]].append(
+                self.Column.from_description(row["column_name"].lower(), row["data_type"])
+            )
+
+        with self._columns_cache_lock:
+            for table_name, columns in columns_by_table.items():
+                relation = self.Relation.create(
+                    database=database, schema=schema, identifier=table_name
+                )
+                self._store_columns(self._columns_cache_key(relation), columns, epoch)
+
+    @available
+    def invalidate_column_cache(self, relation) -> str:
+        """Forget the cached columns of `relation`, to be called after any
+        DDL changing its columns.
+        """
+        if relation is not None:
+            key = self._columns_cache_key(relation)
+            with self._columns_cache_lock:
+                self._columns_cache_epoch += 1
+                self._columns_invalidated_at[key] = self._columns_cache_epoch
+                self._columns_cache.pop(key, None)
+        # so jinja doesn't render things
+        return ""
+
+    def _invalidate_column_cache_for_schema(self, relation) -> None:
+        database, schema, _ = self._columns_cache_key(relation)
+        with self._columns_cache_lock:
+            self._columns_cache_epoch += 1
+            self._columns_invalidated_at[(database, schema)] = self._columns_cache_epoch
+            for key in list(self._columns_cache):
+                if key[:2] == (database, schema):
+                    del self._columns_cache[key]
+
+    def _invalidate_grants_cache(self, relation) -> None:
+        if relation is not None:
+            with self._grants_cache_lock:
+                self._grants_unknown.add(self._columns_cache_key(relation))
+
+    @available
+    def invalidate_relation_caches(self, relation) -> str:
+        """Forget the cached columns and privileges of `relation`, to be
+        called whenever it is created or replaced without going through the
+        relation cache, e.g. by CREATE OR REPLACE.
+        """
+        self.invalidate_column_cache(relation)
+        self._invalidate_grants_cache(relation)
+        return ""
+
+    def cache_added(self, relation):
+        self.invalidate_column_cache(relation)
+        self._invalidate_grants_cache(relation)
+        return super().cache_added(relation)
+
+    def cache_dropped(self, relation):
+        self.invalidate_column_cache(relation)
+        self._invalidate_grants_cache(relation)
+        return super().cache_dropped(relation)
+
+    def cache_renamed(self, from_relation, to_relation):
+        self.invalidate_column_cache(from_relation)
+        self.invalidate_column_cache(to_relation)
+        self._invalidate_grants_cache(from_relation)
+        self._invalidate_grants_cache(to_relation)
+        return super().cache_renamed(from_relation, to_relation)
+
+    def drop_schema(self, relation) -> None:
+        self._invalidate_column_cache_for_schema(relation)
+        with self._grants_cache_lock:
+            self._grants_cache.pop(self._columns_cache_key(relation)[:2], None)
+        super().drop_schema(relation)
+
+    @available
+    def drop_schema_relations(
+        self,
+        relation: ExtricaRelation,
+        parallelism: Optional[int] = None,
+        retries: Optional[int] = None,
+    ) -> int:
+        """Drop every relation of the schema of `relation`, by up to
+        `parallelism` statements at once: views first, as they may depend on
+        the other relations, then tables and materialized views. Drops that
+        fail are retried, up to `retries` times.
+
+        Returns the number of relations dropped.
+        """
+        parallelism = parallelism or DROP_SCHEMA_PARALLELISM
+        retries = DROP_SCHEMA_RETRIES if retries is None else retries
+        relations = self.list_relations_without_caching(relation.without_identifier())
+        views = [rel for rel in relations if rel.is_view]
+        others = [rel for rel in relations if not rel.is_view]
+
+        for phase in (views, others):
+            self._run_concurrently(
+                f"{relation.schema}__drop",
+                (
+                    ConcurrentStatement(
+                        rel.identifier,
+                        "drop {} if exists {}".format(
+                            (rel.type or "table").replace("_", " "), rel.render()
+                        ),
+                    )
+                    for rel in phase
+                ),
+                parallelism,
+                retries,
+            )
+            for rel in phase:
+                self.cache_dropped(rel)
+        return len(relations)
+
+    def cleanup_connections(self) -> None:
+        self._wait_for_background_drops()
+        logger.debug(
+            "Column cache: {} hits, {} misses".format(
+                self._columns_cache_hits, self._columns_cache_misses
+            )
+        )
+        super().cleanup_connections()
+
+    def list_relations_in_schemas(
+        self, database: Optional[str], schemas: Iterable[str]
+    ) -> List[ExtricaRelation]:
+        """List the relations of several schemas of `database` with a single
+        query per LIST_RELATIONS_CHUNK_SIZE schemas.
+        """
+        database_relation = self.Relation.create(database=database)
+        schemas = sorted(schemas)
+
+        relations = []
+        quote_policy = {"database": True, "schema": True, "identifier": True}
+        for i in range(0, len(schemas), LIST_RELATIONS_CHUNK_SIZE):
+            results = self.execute_macro(
+                LIST_RELATIONS_IN_SCHEMAS_MACRO_NAME,
+                kwargs={
+                    "relation": database_relation,
+                    "schemas": schemas[i : i + LIST_RELATIONS_CHUNK_SIZE],
+                },
+            )
+            for _database, name, _schema, _type in results:
+                try:
+                    _type = self.Relation.get_relation_type(_type)
+                except ValueError:
+                    _type = self.Relation.External
+                relations.append(
+                    self.Relation.create(
+                        database=_database,
+                        schema=_schema,
+                        identifier=name,
+                        quote_policy=quote_policy,
+                        type=_type,
+                    )
+                )
+        return relations
+
+    def _relations_cache_for_schemas(
+        self, manifest: Manifest, cache_schemas: Optional[Set[ExtricaRelation]] = None
+    ) -> None:
+        """Populate the relations cache with one query per catalog, instead of
+        one query per schema, running the catalogs in parallel.
+
+        The privileges of the schemas with nodes configuring `grants` are
+        fetched alongside, with one query per schema.
+        """
+        if not cache_schemas:
+            cache_schemas = self._get_cache_schemas(manifest)
+
+        schemas_by_database: Dict[Optional[str], Set[str]] = defaultdict(set)
+        for cache_schema in cache_schemas:
+            if cache_schema.schema:
+                schemas_by_database[cache_schema.database].add(cache_schema.schema)
+
+        with executor(self.config) as tpe:
+            grants_futures = [
+                tpe.submit_connected(
+                    self,
+                    f"grants_{database}_{schema}",
+                    self._prefetch_schema_grants,
+                    database,
+                    schema,
+                )
+                for database, schema in self._get_grants_schemas(manifest, schemas_by_database)
+            ]
+            futures: List[Future[List[ExtricaRelation]]] = []
+            for database, schemas in schemas_by_database.items():
+                fut = tpe.submit_connected(
+                    self,
+                    f"list_{database}",
+                    self.list_relations_in_schemas,
+                    database,
+                    schemas,
+                )
+                futures.append(fut)
+
+            for future in as_completed(futures):
+                # if we can't read the relations we need to just raise anyway,
+                # so just call future.result() and let that raise on failure
+                for relation in future.result():
+                    self.cache.add(relation)
+            for future in grants_futures:
+                future.result()
+
+        # it's possible that there were no relations in some schemas. We want
+        # to insert the schemas we query into the cache's `.schemas` attribute
+        # so we can check it later
+        self.cache.update_schemas(
+            (database, schema)
+            for database, schemas in schemas_by_database.items()
+            for schema in schemas
+        )
+
+    def _get_one_catalog_chunk(self, name: str, get_one_catalog, *args) -> agate.Table:
+        start = time.time()
+        table = get_one_catalog(*args)
+        logger.debug(
+            "Catalog chunk {}: {} rows in {:.2f}s".format(name, len(table.rows), time.time() - start)
+        )
+        return table
+
+    def get_catalog(self, manifest: Manifest) -> Tuple[agate.Table, List[Exception]]:
+        """Like the default implementation, but the schemas of each catalog are
+        documented in chunks of CATALOG_SCHEMAS_CHUNK_SIZE, all running in
+        parallel, to keep every catalog query small.
+        """
+        with executor(self.config) as tpe:
+            futures: List[Future[agate.Table]] = []
+            schema_map = self._get_catalog_schemas(manifest)
+            for info, schemas in schema_map.items():
+                schemas = sorted(schemas)
+                for i in range(0, len(schemas), CATALOG_SCHEMAS_CHUNK_SIZE):
+                    name = ".".join([str(info.database), "information_schema", str(i)])
+                    fut = tpe.submit_connected(
+                        self,
+                        name,
+                        self._get_one_catalog_chunk,
+                        name,
+                        self._get_one_catalog,
+                        info,
+                        set(schemas[i : i + CATALOG_SCHEMAS_CHUNK_SIZE]),
+                        manifest,
+                    )
+                    futures.append(fut)
+
+            catalogs, exceptions = catch_as_completed(futures)
+        return catalogs, exceptions
+
+    def get_catalog_by_relations(
+        self, manifest: Manifest, relations: Set[ExtricaRelation]
+    ) -> Tuple[agate.Table, List[Exception]]:
+        """Like get_catalog, in chunks of CATALOG_RELATIONS_CHUNK_SIZE relations."""
+        with executor(self.config) as tpe:
+            futures: List[Future[agate.Table]] = []
+            relations_by_schema = self._get_catalog_relations_by_info_schema(relations)
+            for info_schema, info_schema_relations in relations_by_schema.items():
+                info_schema_relations = list(info_schema_relations)
+                for i in range(0, len(info_schema_relations), CATALOG_RELATIONS_CHUNK_SIZE):
+                    name = ".".join([str(info_schema.database), "information_schema", str(i)])
+                    fut = tpe.submit_connected(
+                        self,
+                        name,
+                        self._get_one_catalog_chunk,
+                        name,
+                        self._get_one_catalog_by_relations,
+                        info_schema,
+                        info_schema_relations[i : i + CATALOG_RELATIONS_CHUNK_SIZE],
+                        manifest,
+                    )
+                    futures.append(fut)
+
+            catalogs, exceptions = catch_as_completed(futures)
+        return catalogs, exceptions
+
     def valid_incremental_strategies(self):
-        return ["append", "merge", "delete+insert"]
+        return ["append", "merge", "delete+insert", "insert_overwrite", "microbatch"]
+
+    def _get_catalog_connector(self, database: str) -> Optional[str]:
+        key = database.lower()
+        with self._catalog_connectors_lock:
+            if key in self._catalog_connectors:
+                return self._catalog_connectors[key]
+
+        sql = "select connector_name from system.metadata.catalogs where catalog_name = '{}'".format(
+            key.replace("'", "''")
+        )
+        try:
+            _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+            rows = cursor.fetchall() or []
+        except DbtDatabaseError as e:
+            logger.debug("Could not look up the connector of catalog {}: {}".format(database, e))
+            rows = []
+        connector = rows[0][0] if rows else None
+
+        with self._catalog_connectors_lock:
+            self._catalog_connectors[key] = connector
+        return connector
+
+    @available
+    def catalog_supports_merge(self, database: str) -> bool:
+        """Whether the tables of catalog `database` support MERGE, based on
+        its connector. Catalogs whose connector cannot be found are assumed
+        not to.
+        """
+        return self._get_catalog_connector(database) in MERGE_CONNECTORS
+
+    @available
+    def catalog_supports_create_or_replace(self, database: str) -> bool:
+        """Whether tables of catalog `database` can be replaced atomically
+        with CREATE OR REPLACE TABLE, based on its connector.
+        """
+        return self._get_catalog_connector(database) in CREATE_OR_REPLACE_CONNECTORS
+
+    @available
+    def can_widen_column_type(
+        self, relation: ExtricaRelation, column_name: str, new_column_type: str
+    ) -> bool:
+        """Whether column `column_name` of `relation` can be changed to
+        `new_column_type` with ALTER COLUMN ... SET DATA TYPE: the connector
+        must support it, and the new type must hold every value of the
+        current one (e.g. varchar(10) to varchar(20), integer to bigint).
+        """
+        if relation.database is None or (
+            self._get_catalog_connector(relation.database) not in SET_DATA_TYPE_CONNECTORS
+        ):
+            return False
+        columns = {column.name.lower(): column for column in self.get_columns_in_relation(relation)}
+        current = columns.get(column_name.lower())
+        if current is None:
+            return False
+        try:
+            new_column = self.Column.from_description(column_name, new_column_type)
+        except DbtRuntimeError:
+            return False
+        return current.can_widen_to(new_column)
+
+    @available
+    def drop_relation_in_background(self, relation: ExtricaRelation) -> str:
+        """Drop `relation` on a background thread, so that the current node
+        does not wait for it. Drops still running are waited for at the end
+        of the run; failures are logged but do not fail the run.
+        """
+        self.cache_dropped(relation)
+        sql = "drop {} if exists {}".format(relation.type.replace("_", " "), relation.render())
+
+        def drop():
+            with self._worker_connection(f"{relation.identifier}__drop"):
+                self.connections.add_query(sql, auto_begin=False, single_statement=True)
+
+        with self._background_drops_lock:
+            if self._background_drops_executor is None:
+                self._background_drops_executor = ThreadPoolExecutor(
+                    max_workers=BACKGROUND_DROP_WORKERS, thread_name_prefix="extrica-drop"
+                )
+            self._background_drops.append(self._background_drops_executor.submit(drop))
+        return ""
+
+    def _wait_for_background_drops(self) -> None:
+        with self._background_drops_lock:
+            futures, self._background_drops = self._background_drops, []
+            executor, self._background_drops_executor = self._background_drops_executor, None
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning("Failed to drop a relation in the background: {}".format(e))
+        if executor is not None:
+            executor.shutdown()
+
+    def _get_materialized_views_freshness(
+        self, database: str, schema: str, names: Iterable[str]
+    ) -> Dict[str, bool]:
+        """Whether each materialized view `names` of a schema is fresh,
+        from system.metadata.materialized_views. Views whose freshness is
+        unknown are reported as not fresh, and views which do not exist are
+        left out.
+        """
+        names = sorted({name.lower() for name in names})
+        sql = (
+            "select * from system.metadata.materialized_views "
+            "where catalog_name = '{}' and schema_name = '{}' and name in ({})"
+        ).format(
+            database.lower().replace("'", "''"),
+            schema.lower().replace("'", "''"),
+            ", ".join("'{}'".format(name.replace("'", "''")) for name in names),
+        )
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        rows = cursor.fetchall() or []
+        columns = [column[0] for column in cursor.description or []]
+
+        freshness = {}
+        for row in rows:
+            values = dict(zip(columns, row))
+            # `freshness` replaced the `is_fresh` column in later Trino versions
+            if "freshness" in values:
+                freshness[values["name"]] = values["freshness"] == "FRESH"
+            else:
+                freshness[values["name"]] = values.get("is_fresh") is True
+        return freshness
+
+    @available
+    def materialized_view_is_fresh(self, relation: ExtricaRelation) -> bool:
+        """Whether materialized view `relation` is up to date with the tables
+        it reads, so that refreshing it would not change its data.
+        """
+        freshness = self._get_materialized_views_freshness(
+            relation.database, relation.schema, [relation.identifier]
+        )
+        return freshness.get(relation.identifier.lower(), False)
+
+    @available
+    def refresh_materialized_views(
+        self,
+        relations: Iterable[ExtricaRelation],
+        parallelism: Optional[int] = None,
+        skip_fresh: bool = True,
+    ) -> Dict[str, ExtricaAdapterResponse]:
+        """Refresh materialized views `relations`, up to `parallelism` at
+        once. With `skip_fresh`, the views that are already fresh are left
+        alone; their freshness is fetched with one query per schema.
+
+        Returns the response of each refresh by relation name, with the
+        refresh duration in `elapsed_time_ms`.
+        """
+        relations = list(relations)
+        if skip_fresh:
+            by_schema: Dict[Tuple[str, str], List[ExtricaRelation]] = defaultdict(list)
+            for relation in relations:
+                by_schema[(relation.database, relation.schema)].append(relation)
+            stale = []
+            for (database, schema), schema_relations in by_schema.items():
+                freshness = self._get_materialized_views_freshness(
+                    database, schema, [relation.identifier for relation in schema_relations]
+                )
+                stale.extend(
+                    relation
+                    for relation in schema_relations
+                    if not freshness.get(relation.identifier.lower(), False)
+                )
+            logger.debug(
+                "Skipping the refresh of {} fresh materialized views".format(
+                    len(relations) - len(stale)
+                )
+            )
+            relations = stale
+
+        responses = self._run_concurrently(
+            "materialized_views__refresh",
+            (
+                ConcurrentStatement(
+                    str(relation), "refresh materialized view {}".format(relation.render())
+                )
+                for relation in relations
+            ),
+            parallelism or MATERIALIZED_VIEW_REFRESH_PARALLELISM,
+        )
+        for relation_name, response in responses.items():
+            logger.debug(
+                "Refreshed materialized view {} in {} ms".format(
+                    relation_name, response.elapsed_time_ms
+                )
+            )
+        return responses
+
+    def _fetch_grants(
+        self, relation: ExtricaRelation, identifier: Optional[str] = None
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """The privileges on the relations of the schema of `relation`, or
+        only on relation `identifier`, as {table: {privilege: [grantees]}}.
+        """
+        sql = (
+            "select table_name, grantee, lower(privilege_type) from {} where table_schema = '{}'"
+        ).format(
+            relation.information_schema("table_privileges"),
+            relation.schema.lower().replace("'", "''"),
+        )
+        if identifier is not None:
+            sql += " and table_name = '{}'".format(identifier.lower().replace("'", "''"))
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+
+        grants: Dict[str, Dict[str, List[str]]] = defaultdict(dict)
+        for table_name, grantee, privilege in cursor.fetchall() or []:
+            grants[table_name].setdefault(privilege, []).append(grantee)
+        return grants
+
+    @staticmethod
+    def _get_grants_schemas(
+        manifest: Optional[Manifest], schemas_by_database: Dict[Optional[str], Set[str]]
+    ) -> Set[Tuple[str, str]]:
+        """The cached schemas of the nodes of `manifest` configuring grants."""
+        cached = {
+            (database.lower(), schema.lower()): (database, schema)
+            for database, schemas in schemas_by_database.items()
+            if database
+            for schema in schemas
+        }
+        grants_schemas = set()
+        if manifest is None:
+            return grants_schemas
+        for node in manifest.nodes.values():
+            if not getattr(node.config, "grants", None) or not node.database:
+                continue
+            key = (node.database.lower(), node.schema.lower())
+            if key in cached:
+                grants_schemas.add(cached[key])
+        return grants_schemas
+
+    def _prefetch_schema_grants(self, database: str, schema: str) -> None:
+        relation = self.Relation.create(database=database, schema=schema)
+        grants = self._fetch_grants(relation)
+        with self._grants_cache_lock:
+            self._grants_cache.setdefault(self._columns_cache_key(relation)[:2], grants)
+
+    def _get_current_grants(self, relation: ExtricaRelation) -> Dict[str, List[str]]:
+        key = self._columns_cache_key(relation)
+        with self._grants_cache_lock:
+            schema_grants = self._grants_cache.get(key[:2])
+            unknown = key in self._grants_unknown
+        if schema_grants is None:
+            schema_grants = self._fetch_grants(relation)
+            with self._grants_cache_lock:
+                self._grants_cache.setdefault(key[:2], schema_grants)
+                self._grants_unknown.discard(key)
+        elif unknown:
+            grants = self._fetch_grants(relation, relation.identifier).get(key[2], {})
+            with self._grants_cache_lock:
+                schema_grants[key[2]] = grants
+                self._grants_unknown.discard(key)
+        return dict(schema_grants.get(key[2], {}))
+
+    @available
+    def reconcile_grants(
+        self,
+        relation: ExtricaRelation,
+        grant_config: Dict[str, List[str]],
+        should_revoke: bool = True,
+        parallelism: Optional[int] = None,
+    ) -> int:
+        """Grant and revoke privileges on `relation` so that they match
+        `grant_config`, by up to `parallelism` statements at once.
+
+        The current privileges are taken from those of the whole schema,
+        fetched with one query at the start of the run, or the first time a
+        relation of the schema is reconciled. Returns the number of
+        GRANT/REVOKE statements run.
+        """
+        if should_revoke:
+            current = self._get_current_grants(relation)
+            needs_granting = BaseContext.diff_of_two_dicts(grant_config, current)
+            needs_revoking = BaseContext.diff_of_two_dicts(current, grant_config)
+        else:
+            needs_granting, needs_revoking = grant_config, {}
+
+        statements = [
+            "revoke {} on {} from {}".format(privilege, relation.render(), grantee)
+            for privilege, grantees in needs_revoking.items()
+            for grantee in grantees
+        ] + [
+            "grant {} on {} to {}".format(privilege, relation.render(), self.quote(grantee))
+            for privilege, grantees in needs_granting.items()
+            for grantee in grantees
+        ]
+        if not statements:
+            logger.debug(
+                "On {}: All grants are in place, no revocation or granting needed.".format(
+                    relation
+                )
+            )
+            return 0
+
+        self._run_concurrently(
+            f"{relation.identifier}__grants",
+            (
+                ConcurrentStatement(str(index), statement)
+                for index, statement in enumerate(statements)
+            ),
+            parallelism or GRANTS_PARALLELISM,
+        )
+
+        if not should_revoke:
+            # privileges not in grant_config may remain
+            self._invalidate_grants_cache(relation)
+            return len(statements)
+
+        key = self._columns_cache_key(relation)
+        with self._grants_cache_lock:
+            schema_grants = self._grants_cache.get(key[:2])
+            if schema_grants is not None:
+                schema_grants[key[2]] = {
+                    privilege: list(grantees) for privilege, grantees in grant_config.items()
+                }
+                self._grants_unknown.discard(key)
+        return len(statements)
+
+    @available
+    def get_partition_columns(
+        self, partition_by: Optional[List[str]], properties: Optional[Dict[str, str]]
+    ) -> List[str]:
+        """The partition columns used by the insert_overwrite strategy: the
+        `partition_by` config, or the identity partitions in `properties`.
+        """
+        if isinstance(partition_by, str):
+            partition_by = [partition_by]
+        columns = partition_by or partition_columns_from_properties(properties)
+        if not columns:
+            raise DbtRuntimeError(
+                "The insert_overwrite incremental strategy requires `partition_by`, "
+                "or identity partitions in the `partitioned_by`/`partitioning` properties"
+            )
+        return columns
+
+    def _get_typed_columns(
+        self, relation: ExtricaRelation, names: List[str]
+    ) -> Tuple[List[str], List[str]]:
+        """The quoted names and the data types of columns `names` of
+        `relation`.
+        """
+        columns = {column.name.lower(): column for column in self.get_columns_in_relation(relation)}
+        missing = [name for name in names if name.lower() not in columns]
+        if missing:
+            raise DbtRuntimeError("Columns {} not found in {}".format(", ".join(missing), relation))
+        return (
+            [self.quote(name.lower()) for name in names],
+            [columns[name.lower()].data_type for name in names],
+        )
+
+    @available
+    def get_partition_predicates(
+        self, relation: ExtricaRelation, partition_by: List[str]
+    ) -> List[str]:
+        """Predicates on the `partition_by` columns selecting the partitions
+        that hold the rows of `relation`, made of constants only so that
+        deleting them can be done on metadata.
+        """
+        quoted, data_types = self._get_typed_columns(relation, partition_by)
+        # values are read as varchar to be rendered back as typed literals,
+        # without going through agate's type inference
+        sql = "select distinct {} from {}".format(
+            ", ".join("cast({} as varchar)".format(column) for column in quoted),
+            relation.render(),
+        )
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        rows = cursor.fetchall() or []
+        return render_partition_predicates(quoted, data_types, rows)
+
+    @available
+    def get_prune_predicates(
+        self, relation: ExtricaRelation, columns: List[str], alias: Optional[str] = None
+    ) -> List[str]:
+        """Predicates bounding `columns` to the range of values they take in
+        `relation`, computed with a single query. Used on the target of an
+        incremental model, with its `alias` if any, they let Trino skip the
+        partitions and files out of the range of the new rows.
+
+        `relation` is expected to be a table: the query would run the whole
+        query of a view.
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        quoted, data_types = self._get_typed_columns(relation, columns)
+        sql = "select {} from {}".format(
+            ", ".join(
+                "cast(min({0}) as varchar), cast(max({0}) as varchar)".format(column)
+                for column in quoted
+            ),
+            relation.render(),
+        )
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        row = cursor.fetchall()[0]
+        bounds = [(row[2 * i], row[2 * i + 1]) for i in range(len(quoted))]
+        if alias:
+            quoted = ["{}.{}".format(alias, column) for column in quoted]
+        return render_range_predicates(quoted, data_types, bounds)
+
+    @available
+    def get_microbatch_windows(
+        self,
+        relation: Optional[ExtricaRelation],
+        event_time: str,
+        batch_size: str,
+        begin=None,
+        lookback: Optional[int] = None,
+    ) -> List[MicrobatchWindow]:
+        """The windows to build, up to and including the current one.
+
+        They start `lookback` windows before the latest `event_time` found
+        in `relation`, or at `begin` when there is no relation or it is
+        empty. Windows never start before `begin`.
+        """
+        if batch_size not in MICROBATCH_BATCH_SIZES:
+            raise DbtRuntimeError(
+                "Invalid batch_size '{}', expected one of: {}".format(
+                    batch_size, ", ".join(MICROBATCH_BATCH_SIZES)
+                )
+            )
+        if isinstance(begin, str):
+            begin = datetime.fromisoformat(begin)
+        elif isinstance(begin, date) and not isinstance(begin, datetime):
+            begin = datetime.combine(begin, datetime.min.time())
+
+        if relation is not None:
+            sql = "select cast(max({}) as timestamp(6)), localtimestamp(6) from {}".format(
+                event_time, relation.render()
+            )
+        else:
+            sql = "select null, localtimestamp(6)"
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        checkpoint, now = cursor.fetchall()[0]
+
+        if checkpoint is not None:
+            start = offset_timestamp(
+                truncate_timestamp(checkpoint, batch_size), batch_size, -(lookback or 0)
+            )
+            if begin is not None:
+                start = max(start, begin)
+        elif begin is not None:
+            start = begin
+        else:
+            raise DbtRuntimeError(
+                "The microbatch incremental strategy requires `begin` to build {}".format(
+                    relation or "a new relation"
+                )
+            )
+        end = offset_timestamp(truncate_timestamp(now, batch_size), batch_size, 1)
+        return microbatch_windows(start, end, batch_size)
+
+    @available
+    def get_snapshot_watermark(self, relation: ExtricaRelation) -> Optional[str]:
+        """The latest dbt_updated_at of snapshot `relation`, as a typed
+        literal, or None when the snapshot is empty.
+
+        A literal rather than a subquery, so that it can be used to prune
+        the partitions and files of the source.
+        """
+        sql = (
+            "select cast(max(dbt_updated_at) as varchar), typeof(max(dbt_updated_at)) from {}"
+        ).format(relation.render())
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        rows = cursor.fetchall() or []
+        if not rows or rows[0][0] is None:
+            return None
+        return typed_literal(rows[0][0], rows[0][1])
+
+    @available
+    def run_microbatch(
+        self,
+        relation: ExtricaRelation,
+        batches: List[Dict[str, str]],
+        parallelism: Optional[int] = None,
+        retries: Optional[int] = None,
+    ) -> int:
+        """Run the SQL of each batch, a `{"name": ..., "sql": ...}` dict, on
+        up to `parallelism` connections at once. Batches that fail are
+        retried, up to `retries` times, without running the others again.
+
+        Returns the number of rows written by the batches.
+        """
+        parallelism = parallelism or DEFAULT_MICROBATCH_PARALLELISM
+        retries = DEFAULT_MICROBATCH_RETRIES if retries is None else retries
+
+        responses = self._run_concurrently(
+            f"{relation.identifier}__batch",
+            (ConcurrentStatement(batch["name"], batch["sql"]) for batch in batches),
+            parallelism,
+            retries,
+            single_statement=False,
+        )
+        return sum(max(response.rows_affected or 0, 0) for response in responses.values())
+
+    @available
+    def persist_column_comments(
+        self,
+        relation: ExtricaRelation,
+        column_dict: Dict[str, Dict],
+        parallelism: Optional[int] = None,
+    ) -> int:
+        """Set the comments of the columns of `relation` to the descriptions
+        in `column_dict`, the `columns` of a model.
+
+        The existing comments are read with one information_schema query,
+        and only the columns whose comment differs are commented on, by up
+        to `parallelism` statements at once. Returns the number of columns
+        commented on.
+        """
+        sql = (
+            "select column_name, comment from {} where table_schema = '{}' and table_name = '{}'"
+        ).format(
+            relation.information_schema("columns"),
+            relation.schema.lower().replace("'", "''"),
+            relation.identifier.lower().replace("'", "''"),
+        )
+        _, cursor = self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        existing = {row[0].lower(): row[1] or None for row in cursor.fetchall() or []}
+
+        statements = []
+        for column_name, column in column_dict.items():
+            if column_name.lower() not in existing:
+                continue
+            comment = column.get("description") or None
+            if comment == existing[column_name.lower()]:
+                continue
+            statements.append(
+                "comment on column {}.{} is {}".format(
+                    relation.render(),
+                    self.quote(column_name) if column.get("quote") else column_name,
+                    "'{}'".format(comment.replace("'", "''")) if comment else "null",
+                )
+            )
+        if not statements:
+            return 0
+
+        self._run_concurrently(
+            f"{relation.identifier}__comment",
+            (
+                ConcurrentStatement(str(index), statement)
+                for index, statement in enumerate(statements)
+            ),
+            parallelism or COLUMN_COMMENTS_PARALLELISM,
+        )
+        return len(statements)
+
+    @contextmanager
+    def _worker_connection(self, name: str) -> Iterator[None]:
+        """Like `connection_named`, for threads started by the adapter itself.
+
+        The query header is left alone, as it is shared with the thread
+        running the current node.
+        """
+        self.acquire_connection(name)
+        try:
+            yield
+        finally:
+            self.release_connection()
+
+    def _run_concurrently(
+        self,
+        name: str,
+        statements: Iterable[ConcurrentStatement],
+        parallelism: int,
+        retries: int = 0,
+        single_statement: bool = True,
+        abridge_sql_log: bool = False,
+    ) -> Dict[str, ExtricaAdapterResponse]:
+        """Run `statements` on up to `parallelism` worker connections at once,
+        or one after the other on the current connection when `parallelism`
+        is 1. Statements that fail are retried, up to `retries` times, without
+        running the others again.
+
+        `statements` is consumed lazily, at most twice `parallelism` ahead of
+        the workers. Returns the response of each statement by label.
+        """
+
+        def run(statement: ConcurrentStatement) -> ExtricaAdapterResponse:
+            _, cursor = self.connections.add_query(
+                statement.sql,
+                auto_begin=False,
+                bindings=statement.bindings,
+                abridge_sql_log=abridge_sql_log,
+                single_statement=single_statement,
+            )
+            return self.connections.get_response(cursor)
+
+        def run_on_worker(statement: ConcurrentStatement) -> ExtricaAdapterResponse:
+            with self._worker_connection(f"{name}_{statement.label}"):
+                return run(statement)
+
+        responses: Dict[str, ExtricaAdapterResponse] = {}
+        pending: Iterable[ConcurrentStatement] = statements
+        for attempt in range(retries + 1):
+            failures: List[Tuple[ConcurrentStatement, Exception]] = []
+            # on the last attempt, no statement is started after a failure
+            last_attempt = attempt == retries
+            if parallelism <= 1:
+                for statement in pending:
+                    try:
+                        responses[statement.label] = run(statement)
+                    except Exception as e:
+                        failures.append((statement, e))
+                        if last_attempt:
+                            break
+            else:
+                with ThreadPoolExecutor(max_workers=parallelism) as pool:
+                    futures: Dict[Future, ConcurrentStatement] = {}
+
+                    def collect(done: Iterable[Future]) -> None:
+                        for future in done:
+                            statement = futures.pop(future)
+                            try:
+                                responses[statement.label] = future.result()
+                            except Exception as e:
+                                failures.append((statement, e))
+
+                    for statement in pending:
+                        if len(futures) >= parallelism * 2:
+                            collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                        if failures and last_attempt:
+                            break
+                        futures[pool.submit(run_on_worker, statement)] = statement
+                    collect(as_completed(list(futures)))
+            if not failures:
+                return responses
+
+            pending = [statement for statement, _ in failures]
+            logger.debug(
+                "{} statements of {} failed on attempt {}: {}".format(
+                    len(failures),
+                    name,
+                    attempt + 1,
+                    ", ".join(statement.label for statement in pending),
+                )
+            )
+
+        first_statement, first_error = failures[0]
+        raise DbtRuntimeError(
+            "{} statements of {} failed ({}), the first error was in {}: {}".format(
+                len(failures),
+                name,
+                ", ".join(statement.label for statement in pending),
+                first_statement.label,
+                first_error,
+            )
+        )
+
+    @available
+    def load_seed_rows(
+        self,
+        relation: ExtricaRelation,
+        agate_table: agate.Table,
+        column_types: List[str],
+        column_names_csv: str,
+        batch_bytes: Optional[int] = None,
+        parallelism: Optional[int] = None,
+    ) -> str:
+        """Insert the rows of a seed in batches of about `batch_bytes`,
+        running up to `parallelism` batches at once.
+
+        Returns the SQL of the first batch, to be rendered in the compiled
+        files.
+        """
+        binding_char = "?" if self.config.credentials.prepared_statements_enabled else "%s"
+        insert_sql = "insert into {} ({}) values".format(relation.render(), column_names_csv)
+        batches = build_seed_batches(
+            insert_sql,
+            agate_table.rows,
+            column_types,
+            binding_char,
+            batch_bytes or DEFAULT_SEED_BATCH_BYTES,
+        )
+        parallelism = parallelism or DEFAULT_SEED_PARALLELISM
+
+        first_batch = next(batches, None)
+        if first_batch is None:
+            return ""
+        self.connections.add_query(
+            first_batch.sql,
+            bindings=first_batch.bindings,
+            abridge_sql_log=True,
+            single_statement=True,
+        )
+
+        self._run_concurrently(
+            f"{relation.identifier}__seed",
+            (
+                ConcurrentStatement(str(index), batch.sql, batch.bindings)
+                for index, batch in enumerate(batches, start=1)
+            ),
+            parallelism,
+            abridge_sql_log=True,
+        )
+        return first_batch.sql
+
+    @available
+    def stage_seed(self, agate_table: agate.Table, staging_location: str) -> StagedSeed:
+        """Write the rows of a seed as a Parquet file under `staging_location`."""
+        if not staging_location:
+            raise DbtRuntimeError(
+                "`seed_staging_location` must be set to load seeds with seed_load_method='staged'"
+            )
+        return write_staged_seed(agate_table, staging_location)
+
+    @available
+    def load_staged_seed(
+        self,
+        staged_seed: StagedSeed,
+        staging_relation: ExtricaRelation,
+        create_staging_sql: str,
+        load_sql: str,
+    ) -> str:
+        """Create the external `staging_relation` over a staged seed, then
+        load the seed from it with `load_sql`. The external table and the
+        staged files are removed whether the load succeeded or not.
+        """
+        try:
+            self.drop_relation(staging_relation)
+            for sql in (create_staging_sql, load_sql):
+                self.connections.add_query(sql, auto_begin=False, single_statement=True)
+        finally:
+            # a failed cleanup is logged, so that it does not hide the error
+            # of the load
+            try:
+                self.drop_relation(staging_relation)
+            except Exception as e:
+                logger.warning("Failed to drop {}: {}".format(staging_relation, e))
+            try:
+                remove_staged_seed(staged_seed.location)
+            except Exception as e:
+                logger.warning(
+                    "Failed to remove the staged seed {}: {}".format(staged_seed.location, e)
+                )
+        return load_sql
@@ -0,0 +1,198 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+# table properties holding the partitioning of hive/delta and iceberg tables
+PARTITION_PROPERTIES = ("partitioned_by", "partitioning")
+
+_QUOTED_STRING = re.compile(r"'((?:[^']|'')*)'")
+_IDENTITY_PARTITION = re.compile(r'^"?(\w+)"?$')
+
+
+def partition_columns_from_properties(properties: Optional[Dict[str, Any]]) -> List[str]:
+    """The identity partition columns declared in the `properties` config,
+    e.g. `partitioned_by: "ARRAY['ds']"`. Partition transforms such as
+    iceberg's `day(ts)` are left out.
+    """
+    columns: List[str] = []
+    for key in PARTITION_PROPERTIES:
+        value = (properties or {}).get(key)
+        if not value:
+            continue
+        for partition in _QUOTED_STRING.findall(str(value)):
+            match = _IDENTITY_PARTITION.match(partition.strip())
+            if match:
+                columns.append(match.group(1))
+    return columns
+
+
+def typed_literal(value: str, data_type: str) -> str:
+    return "cast('{}' as {})".format(value.replace("'", "''"), data_type)
+
+
+# Maximum number of predicates, and so of DELETE statements, rendered for
+# the partitions replaced by insert_overwrite
+PARTITION_PREDICATES_MAX = 20
+
+
+def _partition_boxes(rows: Set[Tuple[Optional[str], ...]]) -> List[Tuple[Set[Optional[str]], ...]]:
+    """Split partitions `rows` into "boxes", one set of values per column
+    whose cartesian product only holds partitions of `rows`. Partitions
+    whose other columns take the same values are grouped in one box.
+    """
+    if len(next(iter(rows))) == 1:
+        return [({row[0] for row in rows},)]
+    suffixes: Dict[Optional[str], Set[Tuple[Optional[str], ...]]] = defaultdict(set)
+    for row in rows:
+        suffixes[row[0]].add(row[1:])
+    heads: Dict[FrozenSet[Tuple[Optional[str], ...]], Set[Optional[str]]] = defaultdict(set)
+    for head, suffix in suffixes.items():
+        heads[frozenset(suffix)].add(head)
+    return [
+        (head_values,) + box
+        for suffix, head_values in heads.items()
+        for box in _partition_boxes(set(suffix))
+    ]
+
+
+def _render_in(column: str, data_type: str, values: Set[Optional[str]]) -> str:
+    literals = ", ".join(
+        typed_literal(value, data_type) for value in sorted(v for v in values if v is not None)
+    )
+    conditions = ["{} in ({})".format(column, literals)] if literals else []
+    if None in values:
+        conditions.append("{} is null".format(column))
+    return " or ".join(conditions)
+
+
+def render_partition_predicates(
+    columns: Sequence[str],
+    data_types: Sequence[str],
+    rows: Sequence[Sequence[Optional[str]]],
+    max_predicates: int = PARTITION_PREDICATES_MAX,
+) -> List[str]:
+    """Render predicates matching the partitions in `rows`, the distinct
+    values of the (quoted) partition `columns` cast to varchar.
+
+    The predicates only compare partition columns to constants, so that the
+    connector can tell which partitions they select and drop them without
+    rewriting data files. Partitions are grouped in `in` lists per column,
+    as long as the lists only match partitions of `rows`: a single column,
+    or partitions such as (day, region) for every region of each day, give
+    one predicate. When that still gives more than `max_predicates`
+    predicates, they are or-ed together into `max_predicates` predicates.
+    """
+    if not rows:
+        return []
+    boxes = []
+    for box in _partition_boxes({tuple(row) for row in rows}):
+        conditions = [
+            _render_in(column, data_type, values)
+            for column, data_type, values in zip(columns, data_types, box)
+        ]
+        if len(conditions) > 1:
+            conditions = ["(" + c + ")" if " or " in c else c for c in conditions]
+        boxes.append(" and ".join(conditions))
+    boxes.sort()
+    if len(boxes) <= max_predicates:
+        return boxes
+    size = -(-len(boxes) // max_predicates)
+    return [
+        " or ".join("(" + box + ")" for box in boxes[i : i + size])
+        for i in range(0, len(boxes), size)
+    ]
+
+
+def render_range_predicates(
+    columns: Sequence[str], data_types: Sequence[str], bounds: Sequence[Sequence[Optional[str]]]
+) -> List[str]:
+    """Render `column between min and max` predicates from the (min, max)
+    `bounds` of each column, cast to varchar. Columns without bounds (no
+    rows, or only nulls) are left out.
+    """
+    predicates = []
+    for column, data_type, (minimum, maximum) in zip(columns, data_types, bounds):
+        if minimum is None or maximum is None:
+            continue
+        predicates.append(
+            "{} between {} and {}".format(
+                column, typed_literal(minimum, data_type), typed_literal(maximum, data_type)
+            )
+        )
+    return predicates
+
+
+MICROBATCH_BATCH_SIZES = ("hour", "day", "month", "year")
+# Number of windows appended at once. delete+insert windows are applied one
+# at a time unless `microbatch_parallelism` is set, as concurrent deletes
+# from the same table conflict on commit with Iceberg and Delta Lake
+DEFAULT_MICROBATCH_PARALLELISM = 4
+DEFAULT_MICROBATCH_RETRIES = 1
+
+_MICROBATCH_LABEL_FORMATS = {
+    "hour": "%Y%m%d%H",
+    "day": "%Y%m%d",
+    "month": "%Y%m",
+    "year": "%Y",
+}
+
+
+@dataclass
+class MicrobatchWindow:
+    """The time window [start, end) processed by one microbatch."""
+
+    start: datetime
+    end: datetime
+    batch_size: str
+
+    @property
+    def label(self) -> str:
+        return self.start.strftime(_MICROBATCH_LABEL_FORMATS[self.batch_size])
+
+    @property
+    def start_literal(self) -> str:
+        return "timestamp '{}'".format(self.start.strftime("%Y-%m-%d %H:%M:%S"))
+
+    @property
+    def end_literal(self) -> str:
+        return "timestamp '{}'".format(self.end.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def truncate_timestamp(timestamp: datetime, batch_size: str) -> datetime:
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    if batch_size == "hour":
+        return timestamp
+    timestamp = timestamp.replace(hour=0)
+    if batch_size == "day":
+        return timestamp
+    timestamp = timestamp.replace(day=1)
+    if batch_size == "month":
+        return timestamp
+    return timestamp.replace(month=1)
+
+
+def offset_timestamp(timestamp: datetime, batch_size: str, batches: int) -> datetime:
+    """Move a truncated `timestamp` by a number of batches."""
+    if batch_size == "hour":
+        return timestamp + timedelta(hours=batches)
+    if batch_size == "day":
+        return timestamp + timedelta(days=batches)
+    if batch_size == "month":
+        months = timestamp.year * 12 + timestamp.month - 1 + batches
+        return timestamp.replace(year=months // 12, month=months % 12 + 1)
+    return timestamp.replace(year=timestamp.year + batches)
+
+
+def microbatch_windows(start: datetime, end: datetime, batch_size: str) -> List[MicrobatchWindow]:
+    """Split [start, end) in consecutive windows of `batch_size`, `start`
+    being rounded down to the beginning of its window.
+    """
+    windows = []
+    window_start = truncate_timestamp(start, batch_size)
+    while window_start < end:
+        window_end = offset_timestamp(window_start, batch_size, 1)
+        windows.append(MicrobatchWindow(window_start, window_end, batch_size))
+        window_start = window_end
+    return windows
@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, FrozenSet, Hashable, Optional, Tuple
+
+METADATA_CACHE_TTL_DEFAULT = 300
+METADATA_CACHE_SIZE_DEFAULT = 256
+
+_LEADING_COMMENTS = re.compile(r"^(?:\s+|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
+_STATEMENT_KEYWORD = re.compile(r"\w+")
+_SOURCE_RELATIONS = re.compile(r"\b(?:from|join)\s+([\w.\"]+)", re.IGNORECASE)
+_WORDS = re.compile(r"\w+")
+_QUALIFIED_NAME = re.compile(r"\"?(\w+)\"?\s*\.\s*\"?(\w+)\"?(?:\s*\.\s*\"?(\w+)\"?)?")
+
+# statements which can change what metadata queries return
+_DDL_KEYWORDS = frozenset(["create", "drop", "alter", "comment", "grant", "revoke", "deny", "call"])
+
+
+def _first_keyword(sql: str) -> Tuple[str, str]:
+    body = sql[_LEADING_COMMENTS.match(sql).end() :]
+    match = _STATEMENT_KEYWORD.match(body)
+    return (match.group().lower() if match else ""), body
+
+
+def is_metadata_query(sql: str) -> bool:
+    """Whether `sql` only reads the shape of the catalog, which only DDL
+    changes: `describe`/`show` statements (except `show stats`) and selects
+    whose sources are all in `information_schema`.
+
+    `system` tables are left out, as some report state that changes with
+    DML, e.g. the freshness of materialized views.
+    """
+    keyword, body = _first_keyword(sql)
+    if keyword == "describe":
+        return True
+    if keyword == "show":
+        words = body.lower().split(None, 2)
+        return len(words) < 2 or words[1] != "stats"
+    if keyword != "select":
+        return False
+    sources = [source.replace('"', "").lower() for source in _SOURCE_RELATIONS.findall(body)]
+    return bool(sources) and all("information_schema." in source for source in sources)
+
+
+def ddl_schemas(sql: str) -> Optional[FrozenSet[str]]:
+    """The names possibly designating a schema touched by `sql`, when it is a
+    DDL statement. An empty set means that the statement is not DDL, None
+    that the schemas could not be told apart (e.g. `create schema`), and all
+    cached metadata must be dropped.
+    """
+    keyword, body = _first_keyword(sql)
+    if keyword not in _DDL_KEYWORDS:
+        return frozenset()
+    words = body.lower().split(None, 2)
+    if len(words) > 1 and words[1] == "schema":
+        return None
+
+    names = set()
+    for first, second, third in _QUALIFIED_NAME.findall(body):
+        # catalog.schema.relation, or schema.relation: in the latter case the
+        # first part is the schema, but may as well be a catalog
+        names.update([second.lower()] if third else [first.lower(), second.lower()])
+    return frozenset(names) if names else None
+
+
+class MetadataResultCache:
+    """An LRU cache of the results of metadata queries, shared by the
+    threads of a run.
+
+    Entries expire after `ttl` seconds and at most `max_size` are kept.
+    Each entry remembers the words of its SQL, so that DDL on a schema only
+    drops the entries that mention that schema.
+    """
+
+    def __init__(
+        self, ttl: float = METADATA_CACHE_TTL_DEFAULT, max_size: int = METADATA_CACHE_SIZE_DEFAULT
+    ):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # bumped by every invalidation, so that results of queries which ran
+        # concurrently with DDL are not cached
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, FrozenSet[str], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, sql: str, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            words = frozenset(word.lower() for word in _WORDS.findall(sql))
+            self._entries[key] = (time.monotonic() + self.ttl, words, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, sql: str) -> None:
+        """Drop the entries that DDL statement `sql` may have made stale."""
+        schemas = ddl_schemas(sql)
+        if schemas is not None and not schemas:
+            return
+        with self._lock:
+            self.generation += 1
+            if schemas is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, entry in self._entries.items() if entry[1] & schemas]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
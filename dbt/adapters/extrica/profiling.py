@@ -0,0 +1,81 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Trino query stats reported in the adapter response, by response field
+TRINO_STATS_FIELDS = {
+    "cpu_time_ms": "cpuTimeMillis",
+    "wall_time_ms": "wallTimeMillis",
+    "queued_time_ms": "queuedTimeMillis",
+    "elapsed_time_ms": "elapsedTimeMillis",
+    "peak_memory_bytes": "peakMemoryBytes",
+    "processed_rows": "processedRows",
+    "processed_bytes": "processedBytes",
+    "physical_input_bytes": "physicalInputBytes",
+    "spilled_bytes": "spilledBytes",
+    "total_splits": "totalSplits",
+}
+
+# how much of each statement is written to the profile
+PROFILE_SQL_MAX_LENGTH = 1000
+
+
+def query_stats(stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Pick the stats reported in the adapter response out of the `stats`
+    block of a Trino query.
+    """
+    if not stats:
+        return {}
+    return {
+        field: stats[key] for field, key in TRINO_STATS_FIELDS.items() if stats.get(key) is not None
+    }
+
+
+class ProfilingSink:
+    """Append one JSON document per statement to `path`.
+
+    Records are written by every dbt thread, so writes are serialized and
+    flushed one by one, which keeps the file readable while a run is going.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, **fields: Any) -> None:
+        line = json.dumps(
+            {"timestamp": datetime.now(timezone.utc).isoformat(), **fields}, default=str
+        )
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_profiling_sinks: Dict[str, ProfilingSink] = {}
+_profiling_sinks_lock = threading.Lock()
+
+
+def get_profiling_sink(path: str) -> ProfilingSink:
+    """Return the process-wide sink writing to `path`."""
+    with _profiling_sinks_lock:
+        sink = _profiling_sinks.get(path)
+        if sink is None:
+            sink = ProfilingSink(path)
+            _profiling_sinks[path] = sink
+        return sink
+
+
+def close_profiling_sinks() -> None:
+    with _profiling_sinks_lock:
+        for sink in _profiling_sinks.values():
+            sink.close()
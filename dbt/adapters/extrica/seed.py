@@ -0,0 +1,194 @@
+import decimal
+import re
+import uuid
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import agate
+from dbt.exceptions import DbtRuntimeError
+
+DEFAULT_SEED_BATCH_BYTES = 500000
+DEFAULT_SEED_PARALLELISM = 4
+
+_TYPE_NAME = re.compile(r"(\w+)(\(.*\))?")
+
+# integers out of this range don't fit in a Parquet int64 column
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+
+@dataclass
+class SeedColumnStrategy:
+    """How the values of one seed column are rendered in an INSERT.
+
+    This mirrors the `create_bindings` macro, but the type of the column is
+    classified once instead of for every cell:
+
+    - string values of an interval column are rendered as `INTERVAL <value>`
+    - string values of other non-varchar columns are rendered as typed
+      literals, e.g. `DATE '2024-01-01'`
+    - anything else is passed as a binding
+    """
+
+    type_name: str
+    is_interval: bool
+    is_varchar: bool
+
+    @classmethod
+    def from_type(cls, column_type: str) -> "SeedColumnStrategy":
+        match = _TYPE_NAME.match(column_type)
+        type_name = match.group(1) if match else column_type
+        return cls(
+            type_name=type_name.upper(),
+            is_interval="interval" in type_name,
+            is_varchar="varchar" in column_type.lower(),
+        )
+
+    def render(self, value: Any) -> Tuple[Optional[str], Any]:
+        """Return (literal, None) for values inlined in the SQL or
+        (None, binding) for values passed as bindings.
+        """
+        if value is not None and isinstance(value, str):
+            if self.is_interval:
+                return "{} {}".format(self.type_name, value), None
+            if not self.is_varchar:
+                return "{} '{}'".format(self.type_name, value.replace("'", "''")), None
+            return None, value
+        if value is not None and self.is_varchar:
+            return None, str(value)
+        return None, value
+
+
+@dataclass
+class SeedBatch:
+    sql: str
+    bindings: List[Any]
+
+
+def build_seed_batches(
+    insert_sql: str,
+    rows: Iterable[Iterable[Any]],
+    column_types: List[str],
+    binding_char: str,
+    batch_bytes: int = DEFAULT_SEED_BATCH_BYTES,
+) -> Iterator[SeedBatch]:
+    """Split `rows` in INSERT statements of roughly `batch_bytes` each,
+    counting both the SQL text and the bindings sent with it.
+
+    `insert_sql` is the statement prefix, up to and including `values`.
+    """
+    strategies = [SeedColumnStrategy.from_type(column_type) for column_type in column_types]
+
+    tuples: List[str] = []
+    bindings: List[Any] = []
+    size = len(insert_sql)
+
+    for row in rows:
+        parts = []
+        row_bindings = []
+        row_size = 3
+        for strategy, value in zip(strategies, row):
+            literal, binding = strategy.render(value)
+            if literal is None:
+                parts.append(binding_char)
+                row_bindings.append(binding)
+                row_size += len(str(binding)) + 3
+            else:
+                parts.append(literal)
+                row_size += len(literal) + 1
+
+        if tuples and size + row_size > batch_bytes:
+            yield SeedBatch(sql=insert_sql + "\n" + ",".join(tuples), bindings=bindings)
+            tuples, bindings, size = [], [], len(insert_sql)
+
+        tuples.append("(" + ",".join(parts) + ")")
+        bindings.extend(row_bindings)
+        size += row_size
+
+    if tuples:
+        yield SeedBatch(sql=insert_sql + "\n" + ",".join(tuples), bindings=bindings)
+
+
+@dataclass
+class StagedSeed:
+    """A seed written as a Parquet file under `location`, along with the
+    hive column definitions needed to read it back.
+    """
+
+    location: str
+    columns: List[Tuple[str, str]]
+
+
+def _staging_column_type(agate_table: agate.Table, col_idx: int) -> Tuple[str, Any]:
+    import pyarrow as pa
+
+    column_type = agate_table.column_types[col_idx]
+    if isinstance(column_type, agate.Boolean):
+        return "boolean", pa.bool_()
+    if isinstance(column_type, agate.Number):
+        if agate_table.aggregate(agate.MaxPrecision(col_idx)):
+            return "double", pa.float64()
+        values = [value for value in agate_table.columns[col_idx].values() if value is not None]
+        if values and (min(values) < _INT64_MIN or max(values) > _INT64_MAX):
+            # staged as text, the cast to the seed column type (e.g. a decimal
+            # set in column_types) keeps every digit
+            return "varchar", pa.string()
+        return "bigint", pa.int64()
+    if isinstance(column_type, agate.DateTime):
+        return "timestamp", pa.timestamp("ms")
+    if isinstance(column_type, agate.Date):
+        return "date", pa.date32()
+    return "varchar", pa.string()
+
+
+def _staging_value(value: Any) -> Any:
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def write_staged_seed(agate_table: agate.Table, staging_location: str) -> StagedSeed:
+    """Write `agate_table` as a Parquet file in a new directory under
+    `staging_location`, which can be any URI supported by pyarrow
+    (`s3://...`, `gs://...`, `hdfs://...` or a local `file://` path).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.fs
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise DbtRuntimeError(
+            "Staged seeds require pyarrow, install it with `pip install dbt-extrica[staging]`"
+        )
+
+    location = "{}/{}".format(staging_location.rstrip("/"), uuid.uuid4().hex)
+    filesystem, path = pyarrow.fs.FileSystem.from_uri(location)
+    filesystem.create_dir(path, recursive=True)
+    try:
+        columns = []
+        arrays = []
+        fields = []
+        for col_idx, col_name in enumerate(agate_table.column_names):
+            hive_type, arrow_type = _staging_column_type(agate_table, col_idx)
+            name = str(col_name).lower()
+            values = [_staging_value(row[col_idx]) for row in agate_table.rows]
+            if hive_type == "varchar":
+                values = [None if value is None else str(value) for value in values]
+            columns.append((name, hive_type))
+            fields.append(pa.field(name, arrow_type))
+            arrays.append(pa.array(values, type=arrow_type))
+
+        table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+        pq.write_table(table, path + "/part-00000.parquet", filesystem=filesystem)
+    except BaseException:
+        # don't leave a partial file behind
+        filesystem.delete_dir(path)
+        raise
+    return StagedSeed(location=location, columns=columns)
+
+
+def remove_staged_seed(location: str) -> None:
+    import pyarrow.fs
+
+    filesystem, path = pyarrow.fs.FileSystem.from_uri(location)
+    filesystem.delete_dir(path)
@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+DEFAULT_POOL_SIZE = 4
+
+
+class HttpSessionPool:
+    """A per-process pool of keep-alive `requests.Session` objects.
+
+    Sessions are checked out exclusively, so that the per-connection state
+    trino sets on a session (headers, auth) is never shared between two
+    concurrent users, and are returned to the pool when the connection
+    closes, so that the next connection reuses its open TLS connections.
+
+    At most `max_size` idle sessions are kept, extra ones are closed on
+    release.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE):
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._idle: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def resize(self, max_size: int) -> None:
+        with self._lock:
+            self.max_size = max(1, max_size)
+            while len(self._idle) > self.max_size:
+                self._idle.pop().close()
+
+    def acquire(self) -> requests.Session:
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return requests.Session()
+
+    def release(self, session: requests.Session) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(session)
+                return
+        session.close()
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+            }
+
+
+_session_pools: Dict[Tuple[str, str], HttpSessionPool] = {}
+_session_pools_lock = threading.Lock()
+
+
+def get_http_session_pool(
+    host: str, username: str, max_size: Optional[int] = None
+) -> HttpSessionPool:
+    """Return the process-wide session pool for the given (host, username),
+    shared by the sign-in call and all trino connections. When `max_size`
+    is given the pool is resized to it.
+    """
+    key = (host, username)
+    with _session_pools_lock:
+        pool = _session_pools.get(key)
+        if pool is None:
+            pool = HttpSessionPool(max_size or DEFAULT_POOL_SIZE)
+            _session_pools[key] = pool
+            return pool
+    if max_size:
+        pool.resize(max_size)
+    return pool
+
+
+def all_http_session_pools() -> Dict[Tuple[str, str], HttpSessionPool]:
+    with _session_pools_lock:
+        return dict(_session_pools)
@@ -1,6 +1,19 @@
 import jwt
 import datetime
-import requests
+import threading
+import trino
+from dbt.events import AdapterLogger
+from requests.auth import AuthBase
+from typing import Callable, Dict, Optional, Tuple
+
+from dbt.adapters.extrica.session_pool import get_http_session_pool
+
+logger = AdapterLogger("Extrica")
+
+# Minimum delay between two background refresh attempts, so a failing
+# sign-in endpoint is not hammered in a tight loop.
+MIN_REFRESH_INTERVAL = datetime.timedelta(seconds=30)
+
 
 class JWTHandler:
     def __init__(self, host, username, password ):
@@ -8,40 +21,154 @@ class JWTHandler:
         self.password = password
         self.host = host
         self.jwt = None
+        self.expires_at: Optional[datetime.datetime] = None
         self.leeway = datetime.timedelta(minutes=2)
-  
+        # tokens are refreshed in the background this long before they expire,
+        # ahead of the leeway so that callers never have to wait for a sign-in
+        self.refresh_ahead = datetime.timedelta(minutes=5)
+        self._lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+
     def is_expired(self):
-        if self.jwt == None:
+        if self.jwt == None or self.expires_at == None:
             return True
-    
-        decoded_jwt = jwt.decode(self.jwt, options={"verify_signature": False})
-        exp = decoded_jwt["exp"]
-        exp_datetime = datetime.datetime.fromtimestamp(exp)
+
         now = datetime.datetime.now()
-        leeway_expiry = exp_datetime - self.leeway
+        leeway_expiry = self.expires_at - self.leeway
 
         return now > leeway_expiry
-    
+
+    @staticmethod
+    def decode_expiry(token) -> datetime.datetime:
+        decoded_jwt = jwt.decode(token, options={"verify_signature": False})
+        return datetime.datetime.fromtimestamp(decoded_jwt["exp"])
+
     def generate_tokens(self):
-        print("==========Extrica Token Call===========")
+        logger.debug("Signing in to Extrica at {} as {}".format(self.host, self.username))
 
         url = "https://"+self.host+"/iam/security/signin"
 
         payload = {
-        "email": self.username, 
+        "email": self.username,
         "password":self.password
         }
 
-        response = requests.post(url, json=payload)
+        session_pool = get_http_session_pool(self.host, self.username)
+        session = session_pool.acquire()
+        try:
+            # pooled sessions carry the bearer token auth set up by trino,
+            # which must not be used (nor resolved) for the sign-in itself
+            response = session.post(url, json=payload, auth=_no_auth)
+        finally:
+            session_pool.release(session)
 
         if response.status_code == 200:
             data = response.json()
             self.jwt = data["accessToken"]
+            self.expires_at = self.decode_expiry(self.jwt)
         else:
-            print("Error getting tokens:", response.text)
+            logger.error("Error getting Extrica tokens: {}".format(response.text))
 
     def get_token(self):
         if self.is_expired():
-            self.generate_tokens()
-        
-        return self.jwt
\ No newline at end of file
+            # single flight: only one thread signs in, the others wait for
+            # it and pick up the fresh token
+            with self._lock:
+                if self.is_expired():
+                    self.generate_tokens()
+                    self._schedule_refresh()
+
+        return self.jwt
+
+    def stop(self):
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _refresh(self):
+        with self._lock:
+            try:
+                self.generate_tokens()
+            except Exception as e:
+                # runs on the timer thread: log, and try again later rather
+                # than letting the token expire
+                logger.error("Error refreshing the Extrica token: {}".format(e))
+            finally:
+                self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        # must be called with self._lock held
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+        if self.expires_at is None:
+            return
+
+        delay = self.expires_at - self.refresh_ahead - datetime.datetime.now()
+        delay = max(delay, MIN_REFRESH_INTERVAL)
+
+        self._refresh_timer = threading.Timer(delay.total_seconds(), self._refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+
+_jwt_handlers: Dict[Tuple[str, str, str], JWTHandler] = {}
+_jwt_handlers_lock = threading.Lock()
+
+
+def get_jwt_handler(host, username, password) -> JWTHandler:
+    """Return the process-wide JWTHandler for the given credentials, so
+    that all connections and threads share a single token.
+
+    When the password of a (host, username) changes, the handler of the
+    previous password is stopped and replaced.
+    """
+    key = (host, username, password)
+    with _jwt_handlers_lock:
+        handler = _jwt_handlers.get(key)
+        if handler is None:
+            for stale_key in [k for k in _jwt_handlers if k[:2] == key[:2]]:
+                _jwt_handlers.pop(stale_key).stop()
+            handler = JWTHandler(host=host, username=username, password=password)
+            _jwt_handlers[key] = handler
+        return handler
+
+
+def _no_auth(r):
+    return r
+
+
+class _BearerTokenProviderAuth(AuthBase):
+    def __init__(self, token_provider: Callable[[], Optional[str]]):
+        self.token_provider = token_provider
+
+    def __call__(self, r):
+        token = self.token_provider()
+        if token is None:
+            raise trino.exceptions.TrinoAuthError("Could not obtain an Extrica access token")
+        r.headers["Authorization"] = "Bearer " + token
+        return r
+
+
+class ExtricaJWTAuthentication(trino.auth.Authentication):
+    """Like trino.auth.JWTAuthentication, but the token is looked up through
+    `token_provider` on every request, so open connections pick up refreshed
+    tokens without having to reconnect.
+    """
+
+    def __init__(self, token_provider: Callable[[], Optional[str]]):
+        self.token_provider = token_provider
+
+    def set_http_session(self, http_session):
+        http_session.auth = _BearerTokenProviderAuth(self.token_provider)
+        return http_session
+
+    def get_exceptions(self):
+        return ()
+
+    def __eq__(self, other):
+        if not isinstance(other, ExtricaJWTAuthentication):
+            return False
+        return self.token_provider == other.token_provider
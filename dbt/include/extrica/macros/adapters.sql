@@ -26,8 +26,32 @@
 {% endmacro %}
 
 
+{% macro extrica__get_columns_in_relations(information_schema, schema, identifiers) -%}
+  {% call statement('get_columns_in_relations', fetch_result=True, auto_begin=False) -%}
+    select
+      table_name,
+      column_name,
+      data_type
+    from {{ information_schema }}.columns
+    where table_schema = '{{ schema | lower }}'
+    {%- if identifiers is not none %}
+      and table_name in ('{{ identifiers | join("', '") }}')
+    {%- endif %}
+    order by table_name, ordinal_position
+  {%- endcall %}
+  {{ return(load_result('get_columns_in_relations').table) }}
+{% endmacro %}
+
+
 {% macro extrica__list_relations_without_caching(relation) %}
-  {% call statement('list_relations_without_caching', fetch_result=True) -%}
+  {{ return(extrica__list_relations_in_schemas(relation, [relation.schema])) }}
+{% endmacro %}
+
+
+{#-- List the relations of several schemas of the same catalog (relation.database) at once. --#}
+{% macro extrica__list_relations_in_schemas(relation, schemas) %}
+  {%- set schemas_csv = "'" ~ (schemas | map('lower') | join("', '")) ~ "'" -%}
+  {% call statement('list_relations_in_schemas', fetch_result=True) -%}
     select
       t.table_catalog as database,
       t.table_name as name,
@@ -41,11 +65,11 @@
     left join (
             select * from system.metadata.materialized_views
             where catalog_name = '{{ relation.database | lower }}'
-              and schema_name = '{{ relation.schema | lower }}') mv
+              and schema_name in ({{ schemas_csv }})) mv
           on mv.catalog_name = t.table_catalog and mv.schema_name = t.table_schema and mv.name = t.table_name
-    where t.table_schema = '{{ relation.schema | lower }}'
+    where t.table_schema in ({{ schemas_csv }})
   {% endcall %}
-  {{ return(load_result('list_relations_without_caching').table) }}
+  {{ return(load_result('list_relations_in_schemas').table) }}
 {% endmacro %}
 
 
@@ -56,6 +80,11 @@
 
 
 {% macro extrica__create_csv_table(model, agate_table) %}
+  {#-- staged seeds are created with a `create table ... as select`, see extrica__load_staged_csv_rows --#}
+  {% if config.get('seed_load_method', 'insert') == 'staged' %}
+    {{ return('') }}
+  {% endif %}
+
   {%- set column_override = model['config'].get('column_types', {}) -%}
   {%- set quote_seed_column = model['config'].get('quote_columns', None) -%}
   {%- set _properties = config.get('properties') -%}
@@ -100,6 +129,8 @@
 {%- endmacro -%}
 
 {% macro extrica__create_table_as(temporary, relation, sql) -%}
+  {#-- the relation may be replaced, so its cached columns and privileges may be stale from now on --#}
+  {%- do adapter.invalidate_relation_caches(relation) -%}
   {%- set _properties = config.get('properties') -%}
 
   {%- set contract_config = config.get('contract') -%}
@@ -133,7 +164,29 @@
 {% endmacro %}
 
 
+{#-- like table_columns_and_constraints, with the column comments set at
+     creation, so that persist_docs has nothing left to do --#}
+{% macro extrica__get_table_columns_and_constraints() -%}
+  {%- if not config.persist_column_docs() -%}
+    {{ return(table_columns_and_constraints()) }}
+  {%- endif -%}
+  {%- set raw_column_constraints = adapter.render_raw_columns_constraints(raw_columns=model['columns']) -%}
+  {%- set raw_model_constraints = adapter.render_raw_model_constraints(raw_constraints=model['constraints']) -%}
+    (
+    {% for column in model['columns'].values() -%}
+      {{ raw_column_constraints[loop.index0] }}
+      {%- if column.get('description') %} comment '{{ column['description'] | replace("'", "''") }}'{% endif -%}
+      {{ "," if not loop.last or raw_model_constraints }}
+    {% endfor %}
+    {% for c in raw_model_constraints -%}
+        {{ c }}{{ "," if not loop.last }}
+    {% endfor -%}
+    )
+{%- endmacro %}
+
+
 {% macro extrica__create_view_as(relation, sql) -%}
+  {%- do adapter.invalidate_relation_caches(relation) -%}
   {%- set view_security = config.get('view_security', 'definer') -%}
   {%- if view_security not in ['definer', 'invoker'] -%}
       {%- set log_message = 'Invalid value for view_security (%s) specified. Setting default value (%s).' % (view_security, 'definer') -%}
@@ -171,14 +224,8 @@
 
 {# On extrica, 'cascade' is not supported so we have to manually cascade. #}
 {% macro extrica__drop_schema(relation) -%}
-  {% for row in list_relations_without_caching(relation) %}
-    {% set rel_db = row[0] %}
-    {% set rel_identifier = row[1] %}
-    {% set rel_schema = row[2] %}
-    {% set rel_type = api.Relation.get_relation_type(row[3]) %}
-    {% set existing = api.Relation.create(database=rel_db, schema=rel_schema, identifier=rel_identifier, type=rel_type) %}
-    {% do drop_relation(existing) %}
-  {% endfor %}
+  {#-- drops the views, then the other relations of the schema, concurrently --#}
+  {% do adapter.drop_schema_relations(relation) %}
   {%- call statement('drop_schema') -%}
     drop schema if exists {{ relation }}
   {% endcall %}
@@ -211,6 +258,18 @@
 {% endmacro %}
 
 
+{% macro extrica__persist_docs(relation, model, for_relation, for_columns) -%}
+  {% if for_relation and config.persist_relation_docs() and model.description %}
+    {% do run_query(alter_relation_comment(relation, model.description)) %}
+  {% endif %}
+
+  {#-- only the columns whose comment changed are commented on, concurrently --#}
+  {% if for_columns and config.persist_column_docs() and model.columns %}
+    {% do adapter.persist_column_comments(relation, model.columns) %}
+  {% endif %}
+{% endmacro %}
+
+
 {% macro extrica__list_schemas(database) -%}
   {% call statement('list_schemas', fetch_result=True, auto_begin=False) %}
     select schema_name
@@ -260,6 +319,8 @@
     {%- endset -%}
     {% do run_query(sql) %}
   {% endfor %}
+
+  {% do adapter.invalidate_relation_caches(relation) %}
 {% endmacro %}
 
 
@@ -287,15 +348,24 @@
   {%- endcall %}
 
   {% set should_revoke = should_revoke(exists_as_view, full_refresh_mode=True) %}
-  {% do apply_grants(target_relation, grant_config, should_revoke=True) %}
+  {% do apply_grants(target_relation, grant_config, should_revoke=should_revoke) %}
 
   {{ run_hooks(post_hooks) }}
 
   {{ return({'relations': [target_relation]}) }}
 {% endmacro %}
 
+{% macro extrica__create_columns(relation, columns) %}
+  {{ default__create_columns(relation, columns) }}
+  {% do adapter.invalidate_relation_caches(relation) %}
+{% endmacro %}
+
+
 {% macro extrica__alter_column_type(relation, column_name, new_column_type) %}
   {#
+    When the new type is a widening of the current one (e.g. varchar(10) to
+    varchar(20)) and the connector supports it, only change the metadata.
+    Otherwise:
     1. Create a new column (w/ temp name and correct type)
     2. Copy data over to it
     3. Drop the existing column
@@ -303,10 +373,18 @@
   #}
   {%- set tmp_column = column_name + "__dbt_alter" -%}
 
-  {% call statement('alter_column_type') %}
-    alter table {{ relation }} add column {{ adapter.quote(tmp_column) }} {{ new_column_type }};
-    update {{ relation }} set {{ adapter.quote(tmp_column) }} = CAST({{ adapter.quote(column_name) }} AS {{ new_column_type }});
-    alter table {{ relation }} drop column {{ adapter.quote(column_name) }};
-    alter table {{ relation }} rename column {{ adapter.quote(tmp_column) }} to {{ adapter.quote(column_name) }}
-  {% endcall %}
+  {% if adapter.can_widen_column_type(relation, column_name, new_column_type) %}
+    {% call statement('alter_column_type') %}
+      alter table {{ relation }} alter column {{ adapter.quote(column_name) }} set data type {{ new_column_type }}
+    {% endcall %}
+  {% else %}
+    {% call statement('alter_column_type') %}
+      alter table {{ relation }} add column {{ adapter.quote(tmp_column) }} {{ new_column_type }};
+      update {{ relation }} set {{ adapter.quote(tmp_column) }} = CAST({{ adapter.quote(column_name) }} AS {{ new_column_type }});
+      alter table {{ relation }} drop column {{ adapter.quote(column_name) }};
+      alter table {{ relation }} rename column {{ adapter.quote(tmp_column) }} to {{ adapter.quote(column_name) }}
+    {% endcall %}
+  {% endif %}
+
+  {% do adapter.invalidate_relation_caches(relation) %}
 {% endmacro %}
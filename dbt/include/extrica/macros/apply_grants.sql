@@ -43,3 +43,10 @@
         {% endcall %}
     {% endfor %}
 {% endmacro %}
+
+{% macro extrica__apply_grants(relation, grant_config, should_revoke=True) %}
+    {#-- diffed against the privileges of the whole schema, fetched once; a no-op when nothing changed --#}
+    {% if grant_config %}
+        {% do adapter.reconcile_grants(relation, grant_config, should_revoke) %}
+    {% endif %}
+{% endmacro %}
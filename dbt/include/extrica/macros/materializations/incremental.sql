@@ -10,14 +10,40 @@
        for faster overall incremental processing.
   #} */
   {%- set views_enabled = config.get('views_enabled', true) -%}
+  {%- set prunes_target = config.get('incremental_prune_columns') and unique_key and strategy in ('merge', 'delete+insert') -%}
 
-  {% if language == 'sql' and (views_enabled and (strategy in ('default', 'append', 'merge') or (unique_key is none))) %}
+  {#-- with incremental_prune_columns, the bounds of the new rows are read from the temp relation first --#}
+  {% if prunes_target %}
+    {{ return('table') }}
+  {#-- microbatch reads a view window by window, delete+insert staging each window in its own table --#}
+  {% elif language == 'sql' and views_enabled and strategy == 'microbatch' %}
+    {{ return('view') }}
+  {#-- insert_overwrite reads the temp relation twice: to find the partitions to replace, then to insert them --#}
+  {% elif language == 'sql' and (views_enabled and (strategy in ('default', 'append', 'merge') or (unique_key is none and strategy != 'insert_overwrite'))) %}
+    {{ return('view') }}
+  {#-- delete+insert evaluates a view twice, but writes the model's rows only once --#}
+  {% elif language == 'sql' and views_enabled and strategy == 'delete+insert' and extrica__delete_insert_with_merge() %}
     {{ return('view') }}
   {% else %}  {#--  play it safe -- #}
     {{ return('table') }}
   {% endif %}
 {% endmacro %}
 
+{% macro extrica__delete_insert_with_merge() %}
+  {#--
+    Whether delete+insert deletes with MERGE, from a view. Opt-in, as the
+    view is evaluated once by the delete and once more by the insert: models
+    reading {{ this }} (e.g. `where ts > (select max(ts) from {{ this }})`)
+    would insert other rows than those deleted, so they keep a table.
+  --#}
+  {%- set with_merge = config.get('delete_insert_with_merge') or false -%}
+  {%- if with_merge and (this | string) in (compiled_code or '') -%}
+    {{ log("Not deleting with MERGE in " ~ this ~ ": the model reads " ~ this) }}
+    {%- set with_merge = false -%}
+  {%- endif -%}
+  {{ return(with_merge and adapter.catalog_supports_merge(this.database)) }}
+{% endmacro %}
+
 {% materialization incremental, adapter='extrica', supported_languages=['sql'] -%}
 
   {#-- Set vars --#}
@@ -46,23 +72,17 @@
   {{ run_hooks(pre_hooks) }}
 
   {% if existing_relation is none %}
-    {%- call statement('main', language=language) -%}
-      {{ create_table_as(False, target_relation, compiled_code, language) }}
-    {%- endcall -%}
+    {% do extrica__create_incremental_table(target_relation, tmp_relation, compiled_code, language) %}
 
   {% elif existing_relation.is_view %}
     {#-- Can't overwrite a view with a table - we must drop --#}
     {{ log("Dropping relation " ~ target_relation ~ " because it is a view and this model is a table.") }}
     {% do adapter.drop_relation(existing_relation) %}
-    {%- call statement('main', language=language) -%}
-      {{ create_table_as(False, target_relation, compiled_code, language) }}
-    {%- endcall -%}
+    {% do extrica__create_incremental_table(target_relation, tmp_relation, compiled_code, language) %}
   {% elif full_refresh_mode %}
     {#-- Can't replace a table - we must drop --#}
     {% do adapter.drop_relation(existing_relation) %}
-    {%- call statement('main', language=language) -%}
-      {{ create_table_as(False, target_relation, compiled_code, language) }}
-    {%- endcall -%}
+    {% do extrica__create_incremental_table(target_relation, tmp_relation, compiled_code, language) %}
 
   {% else %}
     {#-- Create the temp relation, either as a view or as a temp table --#}
@@ -87,12 +107,24 @@
 
     {#-- Get the incremental_strategy, the macro to use for the strategy, and build the sql --#}
     {% set incremental_predicates = config.get('predicates', none) or config.get('incremental_predicates', none) %}
-    {% set strategy_sql_macro_func = adapter.get_incremental_strategy_macro(context, incremental_strategy) %}
+    {%- set prune_columns = config.get('incremental_prune_columns') -%}
+    {% if prune_columns and unique_key and incremental_strategy in ('merge', 'delete+insert') and not tmp_relation.is_view %}
+      {#-- bound the target to the range of the new rows; MERGE aliases the target --#}
+      {%- set target_alias = 'DBT_INTERNAL_DEST' if incremental_strategy == 'merge' else none -%}
+      {% set incremental_predicates = (incremental_predicates or []) + adapter.get_prune_predicates(tmp_relation, prune_columns, target_alias) %}
+    {% endif %}
+    {% if incremental_strategy != 'microbatch' %}
+      {% set strategy_sql_macro_func = adapter.get_incremental_strategy_macro(context, incremental_strategy) %}
+    {% endif %}
     {% set strategy_arg_dict = ({'target_relation': target_relation, 'temp_relation': tmp_relation, 'unique_key': unique_key, 'dest_columns': dest_columns, 'incremental_predicates': incremental_predicates }) %}
 
-    {%- call statement('main') -%}
-      {{ strategy_sql_macro_func(strategy_arg_dict) }}
-    {%- endcall -%}
+    {% if incremental_strategy == 'microbatch' %}
+      {% do extrica__run_microbatch(target_relation, tmp_relation, dest_columns, existing_relation) %}
+    {% else %}
+      {%- call statement('main') -%}
+        {{ strategy_sql_macro_func(strategy_arg_dict) }}
+      {%- endcall -%}
+    {% endif %}
   {% endif %}
 
   {% do drop_relation_if_exists(tmp_relation) %}
@@ -109,10 +141,113 @@
 
 {%- endmaterialization %}
 
+{% macro extrica__create_incremental_table(relation, tmp_relation, compiled_code, language) %}
+  {% if config.get('incremental_strategy') == 'microbatch' and config.get('begin') %}
+    {#-- build the table window by window, from `begin` --#}
+    {% if tmp_relation.is_view %}
+      {%- call statement('create_tmp_relation') -%}
+        {{ create_view_as(tmp_relation, compiled_code) }}
+      {%- endcall -%}
+    {% else %}
+      {%- call statement('create_tmp_relation', language=language) -%}
+        {{ create_table_as(True, tmp_relation, compiled_code, language) }}
+      {%- endcall -%}
+    {% endif %}
+    {%- call statement('create_empty_relation') -%}
+      create table {{ relation }}
+        {{ comment(model.get('description')) }}
+        {{ properties(config.get('properties')) }}
+      as (
+        select * from {{ tmp_relation }}
+      ) with no data
+    {%- endcall -%}
+    {% set dest_columns = adapter.get_columns_in_relation(tmp_relation) %}
+    {% do extrica__run_microbatch(relation, tmp_relation, dest_columns, none) %}
+  {% else %}
+    {%- call statement('main', language=language) -%}
+      {{ create_table_as(False, relation, compiled_code, language) }}
+    {%- endcall -%}
+  {% endif %}
+{% endmacro %}
+
+{% macro extrica__run_microbatch(target, source, dest_columns, checkpoint_relation) %}
+  {%- set event_time = config.get('event_time') -%}
+  {%- if not event_time -%}
+    {% do exceptions.raise_compiler_error("The microbatch incremental strategy requires `event_time`") %}
+  {%- endif -%}
+  {%- set apply = config.get('microbatch_apply') or 'delete+insert' -%}
+  {%- if apply not in ['append', 'delete+insert'] -%}
+    {% do exceptions.raise_compiler_error("Invalid microbatch_apply '" ~ apply ~ "', expected 'append' or 'delete+insert'") %}
+  {%- endif -%}
+  {%- set windows = adapter.get_microbatch_windows(
+        checkpoint_relation,
+        event_time,
+        config.get('batch_size') or 'day',
+        config.get('begin'),
+        config.get('lookback', 1)) -%}
+
+  {%- set batches = [] -%}
+  {%- for window in windows -%}
+    {%- do batches.append({
+          'name': window.label,
+          'sql': extrica__get_microbatch_window_sql(target, source, dest_columns, event_time, window, apply)}) -%}
+  {%- endfor -%}
+  {#-- windows deleting from the same Iceberg or Delta table would conflict on commit: one at a time by default --#}
+  {%- set parallelism = config.get('microbatch_parallelism') or (1 if apply == 'delete+insert' else none) -%}
+  {%- set rows_affected = adapter.run_microbatch(
+        target, batches, parallelism, config.get('microbatch_retries')) -%}
+
+  {%- call noop_statement('main', 'MICROBATCH ' ~ rows_affected, 'MICROBATCH', rows_affected) -%}
+    {%- for batch in batches %}
+      -- window {{ batch['name'] }}
+      {{ batch['sql'] }};
+    {% endfor -%}
+  {%- endcall -%}
+{% endmacro %}
+
+{% macro extrica__get_microbatch_window_sql(target, source, dest_columns, event_time, window, apply) -%}
+    {%- set dest_cols_csv = get_quoted_csv(dest_columns | map(attribute="name")) -%}
+    {%- set window_predicate -%}
+        {{ event_time }} >= {{ window.start_literal }} and {{ event_time }} < {{ window.end_literal }}
+    {%- endset -%}
+
+    {%- if apply == 'append' -%}
+        insert into {{ target }} ({{ dest_cols_csv }})
+        (
+            select {{ dest_cols_csv }}
+            from {{ source }}
+            where {{ window_predicate }}
+        )
+    {%- else -%}
+        {#-- the window is saved first, so that the delete and insert see the same rows --#}
+        {%- set window_relation = make_temp_relation(target, '__dbt_tmp_' ~ window.label) -%}
+        drop table if exists {{ window_relation }};
+
+        create table {{ window_relation }} as (
+            select {{ dest_cols_csv }}
+            from {{ source }}
+            where {{ window_predicate }}
+        );
+
+        delete from {{ target }}
+        where {{ window_predicate }};
+
+        insert into {{ target }} ({{ dest_cols_csv }})
+        (
+            select {{ dest_cols_csv }}
+            from {{ window_relation }}
+        );
+
+        drop table if exists {{ window_relation }}
+    {%- endif -%}
+{%- endmacro %}
+
 {% macro extrica__get_delete_insert_merge_sql(target, source, unique_key, dest_columns, incremental_predicates) -%}
     {%- set dest_cols_csv = get_quoted_csv(dest_columns | map(attribute="name")) -%}
 
-    {% if unique_key %}
+    {% if unique_key and source.is_view %}
+        {{ extrica__get_merge_delete_sql(target, source, unique_key, incremental_predicates) }};
+    {% elif unique_key %}
         {% if unique_key is sequence and unique_key is not string %}
             delete from {{ target }}
             where
@@ -149,6 +284,53 @@
     )
 {%- endmacro %}
 
+{% macro extrica__get_incremental_insert_overwrite_sql(arg_dict) -%}
+    {%- set target = arg_dict["target_relation"] -%}
+    {%- set source = arg_dict["temp_relation"] -%}
+    {%- set incremental_predicates = arg_dict["incremental_predicates"] or [] -%}
+    {%- set dest_cols_csv = get_quoted_csv(arg_dict["dest_columns"] | map(attribute="name")) -%}
+    {%- set partition_by = adapter.get_partition_columns(config.get('partition_by'), config.get('properties')) -%}
+
+    {#-- replace only the partitions present in the new data --#}
+    {% for partition_predicate in adapter.get_partition_predicates(source, partition_by) %}
+        delete from {{ target }}
+        where ({{ partition_predicate }})
+        {%- for predicate in incremental_predicates %}
+            and {{ predicate }}
+        {%- endfor -%}
+        ;
+    {% endfor %}
+
+    insert into {{ target }} ({{ dest_cols_csv }})
+    (
+        select {{ dest_cols_csv }}
+        from {{ source }}
+    )
+{%- endmacro %}
+
+{% macro extrica__get_merge_delete_sql(target, source, unique_key, incremental_predicates) -%}
+    {%- if unique_key is sequence and unique_key is not string -%}
+        {%- set keys = unique_key -%}
+    {%- else -%}
+        {%- set keys = unique_key.split(',') | map('trim') | list -%}
+    {%- endif -%}
+
+    {#-- distinct keys: MERGE fails when a target row matches several source rows --#}
+    merge into {{ target }} as DBT_INTERNAL_DEST
+        using (
+            select distinct {{ keys | join(', ') }}
+            from {{ source }}
+        ) as DBT_INTERNAL_SOURCE
+        on {% for key in keys -%}
+            DBT_INTERNAL_SOURCE.{{ key }} = DBT_INTERNAL_DEST.{{ key }}
+            {{- " and " if not loop.last }}
+        {%- endfor %}
+        {%- for predicate in incremental_predicates or [] %}
+            and {{ predicate }}
+        {%- endfor %}
+    when matched then delete
+{%- endmacro %}
+
 {% macro extrica__get_merge_sql(target, source, unique_key, dest_columns, incremental_predicates) -%}
     {%- set predicates = [] if incremental_predicates is none else [] + incremental_predicates -%}
     {%- set dest_cols_csv = get_quoted_csv(dest_columns | map(attribute="name")) -%}
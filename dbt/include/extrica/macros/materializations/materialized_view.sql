@@ -1,4 +1,5 @@
 {%- macro extrica__get_create_materialized_view_as_sql(target_relation, sql) -%}
+  {%- do adapter.invalidate_relation_caches(target_relation) -%}
   {%- set _properties = config.get('properties') -%}
   create materialized view {{ target_relation }}
     {{ properties(_properties) }}
@@ -17,6 +18,7 @@
     {% endif %}
 
     alter materialized view {{ intermediate_relation }} rename to {{ relation }};
+    {%- do adapter.invalidate_relation_caches(relation) %}
 
 {% endmacro %}
 
@@ -30,6 +32,22 @@
 {% endmacro %}
 
 
+{#-- A fresh materialized view renders no SQL, which the materialization reports as a skip. --#}
+{#-- Set `refresh_fresh_materialized_view` to refresh it anyway. --#}
 {%- macro extrica__refresh_materialized_view(relation) -%}
+  {%- if config.get('refresh_fresh_materialized_view', false) or not adapter.materialized_view_is_fresh(relation) -%}
     refresh materialized view {{ relation }}
+  {%- else -%}
+    {{ log("Materialized view " ~ relation ~ " is fresh, skipping its refresh") }}
+  {%- endif -%}
 {%- endmacro -%}
+
+
+{#-- Refresh the stale materialized views among `relations` concurrently, e.g. from a run-operation. --#}
+{% macro extrica__refresh_materialized_views(relations, parallelism=none) %}
+  {% set responses = adapter.refresh_materialized_views(relations, parallelism) %}
+  {% for relation, response in responses.items() %}
+    {{ log("Refreshed " ~ relation ~ " in " ~ response.elapsed_time_ms ~ " ms", info=true) }}
+  {% endfor %}
+  {{ return(responses) }}
+{% endmacro %}
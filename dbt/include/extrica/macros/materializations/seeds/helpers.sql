@@ -36,6 +36,8 @@
   Usually seed row's values through agate_table's data type detection and come through as python types, in this case typing is
   handled by using bindings in `ConnectionWrapper.execute`. However dbt also allows you to override the data types of the created table
   through setting `column_types`, this case is handled here where we have the type information of the seed table.
+
+  The per-value rendering follows `create_bindings`, and is done by `ExtricaAdapter.load_seed_rows` (see `seed.py`).
 #}
 
 {% macro extrica__load_csv_rows(model, agate_table) %}
@@ -48,39 +50,84 @@
       {%- do types.append(type) -%}
   {%- endfor -%}
 
-  {% set batch_size = get_batch_size() %}
+  {% if config.get('seed_load_method', 'insert') == 'staged' %}
+    {{ return(extrica__load_staged_csv_rows(model, agate_table, types)) }}
+  {% endif %}
 
   {% set cols_sql = get_seed_column_quoted_csv(model, agate_table.column_names) %}
-  {% set bindings = [] %}
-
-  {% set statements = [] %}
-
-  {% for chunk in agate_table.rows | batch(batch_size) %}
-      {% set bindings = [] %}
-
-      {% set sql %}
-          insert into {{ this.render() }} ({{ cols_sql }}) values
-          {% for row in chunk -%}
-              ({%- for tuple in create_bindings(row, types) -%}
-                  {%- if tuple.0 is not none  -%}
-                  {{ tuple.0 }}
-                  {%- do bindings.append(tuple.1) -%}
-                  {%- else -%}
-                  {{ tuple.1 }}
-                  {%- endif -%}
-                  {%- if not loop.last%},{%- endif %}
-              {%- endfor -%})
-              {%- if not loop.last%},{%- endif %}
-          {%- endfor %}
-      {% endset %}
-
-      {% do adapter.add_query(sql, bindings=bindings, abridge_sql_log=True) %}
-
-      {% if loop.index0 == 0 %}
-          {% do statements.append(sql) %}
-      {% endif %}
-  {% endfor %}
+
+  {#
+    Rows are rendered and inserted by the adapter, in batches sized by
+    `seed_batch_bytes` and running up to `seed_parallelism` batches at once.
+  #}
+  {% set sql = adapter.load_seed_rows(
+      this,
+      agate_table,
+      types,
+      cols_sql,
+      batch_bytes=config.get('seed_batch_bytes'),
+      parallelism=config.get('seed_parallelism')
+  ) %}
 
   {# Return SQL so we can render it out into the compiled files #}
-  {{ return(statements[0]) }}
+  {{ return(sql) }}
+{% endmacro %}
+
+
+{#
+  With `seed_load_method='staged'`, the seed is written as a Parquet file under `seed_staging_location`
+  and exposed through an external table of the (hive) `seed_staging_catalog`. The seed table is then
+  created with a single `create table ... as select` (or filled with `insert ... select` when it was
+  truncated), so that the rows are read by the workers instead of being parsed by the coordinator.
+
+  The staging location can be any location supported by pyarrow and readable by the staging catalog,
+  including a local `file://` directory.
+#}
+
+{% macro extrica__load_staged_csv_rows(model, agate_table, types) %}
+  {%- set quote_seed_column = model['config'].get('quote_columns', None) -%}
+  {%- set _properties = config.get('properties') -%}
+  {%- set exists = load_relation(this) is not none -%}
+  {%- set staging_relation = api.Relation.create(
+      database=config.get('seed_staging_catalog') or this.database,
+      schema=config.get('seed_staging_schema') or this.schema,
+      identifier=this.identifier ~ '__dbt_staged',
+      type='table') -%}
+  {%- set staged = adapter.stage_seed(agate_table, config.get('seed_staging_location')) -%}
+
+  {% set create_staging_sql %}
+    create table {{ staging_relation }} (
+      {%- for column in staged.columns %}
+        {{ adapter.quote(column[0]) }} {{ column[1] }}{% if not loop.last %},{% endif %}
+      {%- endfor %}
+    ) with (external_location = '{{ staged.location }}', format = 'PARQUET')
+  {% endset %}
+
+  {% set select_sql %}
+    select
+      {%- for col_name in agate_table.column_names %}
+        {%- set staged_column = adapter.quote(staged.columns[loop.index0][0]) %}
+        {%- set type = types[loop.index0] %}
+        {% if type | lower == 'json' -%}
+          json_parse({{ staged_column }})
+        {%- else -%}
+          cast({{ staged_column }} as {{ type }})
+        {%- endif %} as {{ adapter.quote_seed_column(col_name | string, quote_seed_column) }}
+        {%- if not loop.last %},{% endif %}
+      {%- endfor %}
+    from {{ staging_relation }}
+  {% endset %}
+
+  {% if not exists %}
+    {% set sql %}
+      create table {{ this.render() }} {{ properties(_properties) }} as {{ select_sql }}
+    {% endset %}
+  {% else %}
+    {% set sql %}
+      insert into {{ this.render() }} ({{ get_seed_column_quoted_csv(model, agate_table.column_names) }}) {{ select_sql }}
+    {% endset %}
+  {% endif %}
+
+  {#-- the staged files and the external table are removed even when the load fails --#}
+  {{ return(adapter.load_staged_seed(staged, staging_relation, create_staging_sql, sql)) }}
 {% endmacro %}
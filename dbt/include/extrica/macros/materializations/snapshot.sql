@@ -7,7 +7,41 @@
 
 {% macro extrica__post_snapshot(staging_relation) %}
   -- Clean up the snapshot temp table
-  {% do drop_relation(staging_relation) %}
+  {% if staging_relation.is_view %}
+    {% do adapter.drop_relation_in_background(staging_relation) %}
+  {% else %}
+    {% do drop_relation(staging_relation) %}
+  {% endif %}
+{% endmacro %}
+
+{% macro extrica__snapshot_staging_view() %}
+  {#-- whether the changes are staged in a view: opt-in, and only when the connector supports MERGE --#}
+  {%- set staging_view = config.get('snapshot_staging_view') or false -%}
+  {{ return(staging_view and adapter.catalog_supports_merge(this.database)) }}
+{% endmacro %}
+
+{#
+    Overrides the macro of the same name of the snapshot materialization.
+    Staged in a view, the changes are computed by the MERGE reading it
+    rather than written to a table, read back and dropped.
+#}
+{% macro build_snapshot_staging_table(strategy, sql, target_relation) %}
+    {% set temp_relation = make_temp_relation(target_relation) %}
+
+    {% set select = snapshot_staging_table(strategy, sql, target_relation) %}
+
+    {% if extrica__snapshot_staging_view() %}
+        {% set temp_relation = temp_relation.incorporate(type='view') %}
+        {% call statement('build_snapshot_staging_relation') %}
+            {{ create_view_as(temp_relation, select) }}
+        {% endcall %}
+    {% else %}
+        {% call statement('build_snapshot_staging_relation') %}
+            {{ create_table_as(True, temp_relation, select) }}
+        {% endcall %}
+    {% endif %}
+
+    {% do return(temp_relation) %}
 {% endmacro %}
 
 {% macro extrica__snapshot_merge_sql(target, source, insert_cols) -%}
@@ -32,3 +66,262 @@
             {%- endfor %})
 
 {% endmacro %}
+
+{#
+    The check_hash strategy: like check, but the target stores a bigint
+    xxhash64 of the check columns of each row in dbt_change_hash, and rows
+    are compared on that hash only. The staging query then reads the key,
+    dbt_scd_id and dbt_change_hash of the current rows of the target
+    instead of all their columns.
+#}
+{% macro extrica__snapshot_change_hash(columns) -%}
+  from_big_endian_64(xxhash64(to_utf8(concat({%- for column in columns -%}
+    coalesce(cast({{ column }} as varchar), chr(0)){% if not loop.last %}, '|',{% endif -%}
+  {%- endfor -%}
+  ))))
+{%- endmacro %}
+
+{% macro snapshot_check_hash_strategy(node, snapshotted_rel, current_rel, config, target_exists) %}
+    {% set check_cols_config = config['check_cols'] %}
+    {% set primary_key = config['unique_key'] %}
+    {% set invalidate_hard_deletes = config.get('invalidate_hard_deletes', false) %}
+    {% set updated_at = config.get('updated_at', snapshot_get_time()) %}
+
+    {% if check_cols_config == 'all' %}
+        {% set check_cols = [] %}
+        {% for column in get_columns_in_query(node['compiled_code']) %}
+            {% do check_cols.append(adapter.quote(column)) %}
+        {% endfor %}
+    {% elif check_cols_config is iterable and (check_cols_config | length) > 0 %}
+        {% set check_cols = check_cols_config %}
+    {% else %}
+        {% do exceptions.raise_compiler_error("Invalid value for 'check_cols': " ~ check_cols_config) %}
+    {% endif %}
+    {% set change_hash_expr = extrica__snapshot_change_hash(check_cols) %}
+
+    {% if target_exists %}
+        {% set target_relation = adapter.get_relation(database=node.database, schema=node.schema, identifier=node.alias) %}
+        {% do extrica__snapshot_add_change_hash(target_relation, check_cols) %}
+    {% endif %}
+
+    {#-- a null hash, e.g. when the check columns changed, counts as a change --#}
+    {%- set row_changed_expr -%}
+        ({{ snapshotted_rel }}.dbt_change_hash is null or {{ snapshotted_rel }}.dbt_change_hash != {{ current_rel }}.dbt_change_hash)
+    {%- endset %}
+
+    {% set scd_id_expr = snapshot_hash_arguments([primary_key, updated_at]) %}
+
+    {% do return({
+        "unique_key": primary_key,
+        "updated_at": updated_at,
+        "row_changed": row_changed_expr,
+        "scd_id": scd_id_expr,
+        "invalidate_hard_deletes": invalidate_hard_deletes,
+        "change_hash": change_hash_expr
+    }) %}
+{% endmacro %}
+
+{#-- add dbt_change_hash to a snapshot built with another strategy, hashing its current rows --#}
+{% macro extrica__snapshot_add_change_hash(relation, check_cols) %}
+  {%- set existing_columns = adapter.get_columns_in_relation(relation) | map(attribute='name') | map('lower') | list -%}
+  {% if 'dbt_change_hash' in existing_columns %}
+    {{ return('') }}
+  {% endif %}
+
+  {% call statement('add_change_hash') %}
+    alter table {{ relation }} add column dbt_change_hash bigint
+  {% endcall %}
+  {% do adapter.invalidate_relation_caches(relation) %}
+
+  {%- set missing_columns = [] -%}
+  {%- for column in check_cols if column | replace('"', '') | lower not in existing_columns -%}
+    {%- do missing_columns.append(column) -%}
+  {%- endfor -%}
+  {% if not missing_columns %}
+    {% call statement('backfill_change_hash') %}
+      update {{ relation }}
+      set dbt_change_hash = {{ extrica__snapshot_change_hash(check_cols) }}
+      where dbt_valid_to is null
+    {% endcall %}
+  {% else %}
+    {% do exceptions.warn(
+        "Not backfilling dbt_change_hash in " ~ relation ~ ": it has no column " ~ (missing_columns | join(', '))
+        ~ ". The hash of its current rows stays null, so each of them gets a new version on this run.") %}
+  {% endif %}
+{% endmacro %}
+
+{% macro extrica__build_snapshot_table(strategy, sql) %}
+
+    select *,
+        {{ strategy.scd_id }} as dbt_scd_id,
+        {{ strategy.updated_at }} as dbt_updated_at,
+        {{ strategy.updated_at }} as dbt_valid_from,
+        nullif({{ strategy.updated_at }}, {{ strategy.updated_at }}) as dbt_valid_to
+        {%- if strategy.change_hash %},
+        {{ strategy.change_hash }} as dbt_change_hash
+        {%- endif %}
+    from (
+        {{ sql }}
+    ) sbq
+
+{% endmacro %}
+
+{#
+    Like the default staging table, with two additions:
+    - with the check_hash strategy, only the columns needed to detect
+      changes are read from the target
+    - with `snapshot_watermark: true`, only the source rows whose updated_at
+      is at least the latest dbt_updated_at of the target are considered for
+      insertions and updates. Rows of new keys with an older updated_at are
+      then not picked up. Hard deletes still compare against the whole
+      source.
+#}
+{% macro extrica__snapshot_staging_table(strategy, source_sql, target_relation) -%}
+    {%- set watermark = none -%}
+    {%- if config.get('snapshot_watermark', false) -%}
+      {%- if not config.get('updated_at') -%}
+        {% do exceptions.raise_compiler_error("snapshot_watermark requires the updated_at config") %}
+      {%- endif -%}
+      {%- set watermark = adapter.get_snapshot_watermark(target_relation) -%}
+    {%- endif -%}
+
+    with snapshot_query as (
+
+        {{ source_sql }}
+
+    ),
+
+    {%- if watermark is not none %}
+
+    changed_source as (
+
+        select * from snapshot_query
+        where {{ config.get('updated_at') }} >= {{ watermark }}
+
+    ),
+    {%- set changed_source = 'changed_source' -%}
+    {%- else -%}
+    {%- set changed_source = 'snapshot_query' -%}
+    {%- endif %}
+
+    snapshotted_data as (
+
+        {%- if strategy.change_hash %}
+        select
+            dbt_scd_id,
+            dbt_change_hash,
+        {%- else %}
+        select *,
+        {%- endif %}
+            {{ strategy.unique_key }} as dbt_unique_key
+
+        from {{ target_relation }}
+        where dbt_valid_to is null
+
+    ),
+
+    insertions_source_data as (
+
+        select
+            *,
+            {{ strategy.unique_key }} as dbt_unique_key,
+            {{ strategy.updated_at }} as dbt_updated_at,
+            {{ strategy.updated_at }} as dbt_valid_from,
+            nullif({{ strategy.updated_at }}, {{ strategy.updated_at }}) as dbt_valid_to,
+            {%- if strategy.change_hash %}
+            {{ strategy.change_hash }} as dbt_change_hash,
+            {%- endif %}
+            {{ strategy.scd_id }} as dbt_scd_id
+
+        from {{ changed_source }}
+    ),
+
+    updates_source_data as (
+
+        select
+            *,
+            {{ strategy.unique_key }} as dbt_unique_key,
+            {{ strategy.updated_at }} as dbt_updated_at,
+            {{ strategy.updated_at }} as dbt_valid_from,
+            {{ strategy.updated_at }} as dbt_valid_to
+            {%- if strategy.change_hash %},
+            {{ strategy.change_hash }} as dbt_change_hash
+            {%- endif %}
+
+        from {{ changed_source }}
+    ),
+
+    {%- if strategy.invalidate_hard_deletes %}
+
+    deletes_source_data as (
+
+        select
+            *,
+            {{ strategy.unique_key }} as dbt_unique_key
+        from snapshot_query
+    ),
+    {% endif %}
+
+    insertions as (
+
+        select
+            'insert' as dbt_change_type,
+            source_data.*
+
+        from insertions_source_data as source_data
+        left outer join snapshotted_data on snapshotted_data.dbt_unique_key = source_data.dbt_unique_key
+        where snapshotted_data.dbt_unique_key is null
+           or (
+                snapshotted_data.dbt_unique_key is not null
+            and (
+                {{ strategy.row_changed }}
+            )
+        )
+
+    ),
+
+    updates as (
+
+        select
+            'update' as dbt_change_type,
+            source_data.*,
+            snapshotted_data.dbt_scd_id
+
+        from updates_source_data as source_data
+        join snapshotted_data on snapshotted_data.dbt_unique_key = source_data.dbt_unique_key
+        where (
+            {{ strategy.row_changed }}
+        )
+    )
+
+    {%- if strategy.invalidate_hard_deletes -%}
+    ,
+
+    deletes as (
+
+        select
+            'delete' as dbt_change_type,
+            source_data.*,
+            {{ snapshot_get_time() }} as dbt_valid_from,
+            {{ snapshot_get_time() }} as dbt_updated_at,
+            {{ snapshot_get_time() }} as dbt_valid_to,
+            {%- if strategy.change_hash %}
+            cast(null as bigint) as dbt_change_hash,
+            {%- endif %}
+            snapshotted_data.dbt_scd_id
+
+        from snapshotted_data
+        left join deletes_source_data as source_data on snapshotted_data.dbt_unique_key = source_data.dbt_unique_key
+        where source_data.dbt_unique_key is null
+    )
+    {%- endif %}
+
+    select * from insertions
+    union all
+    select * from updates
+    {%- if strategy.invalidate_hard_deletes %}
+    union all
+    select * from deletes
+    {%- endif %}
+
+{%- endmacro %}
@@ -1,6 +1,6 @@
 {% materialization table, adapter = 'extrica' %}
   {%- set on_table_exists = config.get('on_table_exists', 'rename') -%}
-  {% if on_table_exists not in ['rename', 'drop'] %}
+  {% if on_table_exists not in ['rename', 'drop', 'replace'] %}
       {%- set log_message = 'Invalid value for on_table_exists (%s) specified. Setting default value (%s).' % (on_table_exists, 'rename') -%}
       {% do log(log_message) %}
       {%- set on_table_exists = 'rename' -%}
@@ -9,6 +9,12 @@
   {%- set existing_relation = load_cached_relation(this) -%}
   {%- set target_relation = this.incorporate(type='table') %}
 
+  {% if on_table_exists == 'replace' and existing_relation is not none and not existing_relation.is_table %}
+      {#-- only tables can be replaced by a table #}
+      {{ adapter.drop_relation(existing_relation) }}
+      {%- set existing_relation = none -%}
+  {% endif %}
+
   {% if on_table_exists == 'rename' %}
       {%- set intermediate_relation =  make_intermediate_relation(target_relation) -%}
       -- the intermediate_relation should not already exist in the database; get_relation
@@ -47,6 +53,40 @@
       {#-- finally, drop the existing/backup relation after the commit #}
       {{ drop_relation_if_exists(backup_relation) }}
 
+  {% elif on_table_exists == 'replace' %}
+      {%- set contract_config = config.get('contract') -%}
+      {% if existing_relation is none %}
+          {% call statement('main') -%}
+            {{ create_table_as(False, target_relation, sql) }}
+          {%- endcall %}
+
+      {% elif not contract_config.enforced and adapter.catalog_supports_create_or_replace(target_relation.database) %}
+          {#-- the table is swapped atomically by the connector #}
+          {% call statement('main') -%}
+            {{ extrica__create_or_replace_table_as(target_relation, sql) }}
+          {%- endcall %}
+          {% do adapter.invalidate_relation_caches(target_relation) %}
+
+      {% else %}
+          {%- set intermediate_relation = make_intermediate_relation(target_relation) -%}
+          {%- set backup_relation = make_backup_relation(target_relation, 'table') -%}
+
+          {#-- as in rename mode, only drop the leftovers of a previous run #}
+          {{ drop_relation_if_exists(load_cached_relation(intermediate_relation)) }}
+          {{ drop_relation_if_exists(load_cached_relation(backup_relation)) }}
+
+          {% call statement('main') -%}
+            {{ create_table_as(False, intermediate_relation, sql) }}
+          {%- endcall %}
+
+          {#-- the target is missing only between the two renames #}
+          {{ adapter.rename_relation(existing_relation, backup_relation) }}
+          {{ adapter.rename_relation(intermediate_relation, target_relation) }}
+
+          {#-- the backup is not needed anymore, don't wait for it to be dropped #}
+          {% do adapter.drop_relation_in_background(backup_relation) %}
+      {% endif %}
+
   {% elif on_table_exists == 'drop' %}
       {#-- cleanup #}
       {%- if existing_relation is not none -%}
@@ -68,3 +108,13 @@
 
   {{ return({'relations': [target_relation]}) }}
 {% endmaterialization %}
+
+
+{% macro extrica__create_or_replace_table_as(relation, sql) -%}
+  create or replace table {{ relation }}
+    {{ comment(model.get('description')) }}
+    {{ properties(config.get('properties')) }}
+  as (
+    {{ sql }}
+  )
+{%- endmacro %}
@@ -88,6 +88,9 @@ setup(
         "dbt-core~={}".format(dbt_version),
         "trino~=0.326",
     ],
+    extras_require={
+        "staging": ["pyarrow"],
+    },
     zip_safe=False,
     classifiers=[
         "Development Status :: 5 - Production/Stable",
@@ -1,5 +1,8 @@
 import string
+import threading
+from datetime import datetime
 import unittest
+from types import SimpleNamespace
 from unittest import TestCase
 from unittest.mock import MagicMock, Mock, patch
 
@@ -12,11 +15,16 @@ from dbt.exceptions import DbtDatabaseError, DbtRuntimeError, FailedToConnectErr
 from dbt.adapters.extrica import ExtricaAdapter
 from dbt.adapters.extrica.column import TRINO_VARCHAR_MAX_LENGTH, ExtricaColumn
 from dbt.adapters.extrica.connections import (
+    ConnectionWrapper,
     HttpScheme,
-    ExtricaJwtCredentials
+    ExtricaJwtCredentials,
+    split_sql_statements,
 )
+from dbt.adapters.extrica.impl import ConcurrentStatement
+from dbt.adapters.extrica.seed import StagedSeed
+from dbt.adapters.extrica.session_pool import get_http_session_pool
 
-from .utils import config_from_parts_or_dicts, mock_connection
+from .utils import config_from_parts_or_dicts, load_macros, mock_connection
 
 
 class TestExtricaAdapter(unittest.TestCase):
@@ -76,6 +84,743 @@ class TestExtricaAdapter(unittest.TestCase):
         self.assertEqual(connection.state, "open")
         self.assertIsNotNone(connection.handle)
 
+    def test_connection_close_returns_http_session_to_pool(self):
+        adapter = self.adapter
+        connection = adapter.acquire_connection("dummy")
+        pool = get_http_session_pool("extrica host", "")
+        session = connection.handle._http_session
+        hits = pool.stats()["hits"]
+
+        adapter.release_connection()
+        connection = adapter.acquire_connection("dummy")
+        self.assertIs(connection.handle._http_session, session)
+        self.assertEqual(pool.stats()["hits"], hits + 1)
+
+    def test_load_seed_rows_in_parallel_batches(self):
+        adapter = self.adapter
+        adapter.acquire_connection("seed")
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="seed")
+        table = agate.Table(
+            [[i, "name_{}".format(i)] for i in range(1000)],
+            column_names=["id", "name"],
+            column_types=[agate.Number(), agate.Text()],
+        )
+
+        with patch.object(
+            adapter.connections, "add_query", return_value=(None, MagicMock())
+        ) as add_query, patch.object(adapter.connections, "get_response"):
+            sql = adapter.load_seed_rows(
+                relation, table, ["INTEGER", "VARCHAR"], '"id", "name"', batch_bytes=2000, parallelism=3
+            )
+
+        self.assertTrue(sql.startswith('insert into "db"."schema"."seed" ("id", "name") values'))
+        self.assertGreater(add_query.call_count, 1)
+        inserted = sum(len(call.kwargs["bindings"]) for call in add_query.call_args_list)
+        self.assertEqual(inserted, 2000)
+
+    @patch("dbt.adapters.extrica.impl.remove_staged_seed")
+    def test_staged_seed_is_cleaned_up_when_the_load_fails(self, remove_staged_seed):
+        adapter = self.adapter
+        staged = StagedSeed(location="s3://bucket/seeds/abc", columns=[("id", "bigint")])
+        staging = adapter.Relation.create(
+            database="hive", schema="staging", identifier="seed__dbt_staged", type="table"
+        )
+
+        def add_query(sql, **kwargs):
+            if sql.startswith("insert"):
+                raise DbtDatabaseError("boom")
+            return None, MagicMock()
+
+        with patch.object(adapter, "drop_relation") as drop_relation, patch.object(
+            adapter.connections, "add_query", side_effect=add_query
+        ) as queries:
+            with self.assertRaisesRegex(DbtDatabaseError, "boom"):
+                adapter.load_staged_seed(staged, staging, "create table x", "insert into y")
+
+            self.assertEqual(queries.call_count, 2)
+            self.assertEqual(drop_relation.call_count, 2)
+            remove_staged_seed.assert_called_once_with("s3://bucket/seeds/abc")
+
+            # a failed cleanup is only logged
+            queries.side_effect = None
+            queries.return_value = (None, MagicMock())
+            drop_relation.side_effect = [None, DbtDatabaseError("cannot drop")]
+            remove_staged_seed.side_effect = OSError("cannot remove")
+            self.assertEqual(
+                adapter.load_staged_seed(staged, staging, "create table x", "insert into y"),
+                "insert into y",
+            )
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_get_partition_predicates(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [
+            ExtricaColumn("id", "integer"),
+            ExtricaColumn("ds", "date"),
+        ]
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="tmp")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [["2024-01-01"], ["2024-01-02"]]
+
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)) as add_query:
+            predicates = adapter.get_partition_predicates(relation, ["DS"])
+
+        self.assertEqual(
+            add_query.call_args.args[0],
+            'select distinct cast("ds" as varchar) from "db"."schema"."tmp"',
+        )
+        self.assertEqual(
+            predicates,
+            ["\"ds\" in (cast('2024-01-01' as date), cast('2024-01-02' as date))"],
+        )
+        with self.assertRaises(DbtRuntimeError):
+            adapter.get_partition_predicates(relation, ["region"])
+
+    def test_get_microbatch_windows(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="events")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(datetime(2024, 3, 10, 17, 5), datetime(2024, 3, 12, 8))]
+
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)) as add_query:
+            windows = adapter.get_microbatch_windows(relation, "event_ts", "day", lookback=1)
+        self.assertIn("max(event_ts)", add_query.call_args.args[0])
+        self.assertEqual(
+            [window.label for window in windows], ["20240309", "20240310", "20240311", "20240312"]
+        )
+
+        cursor.fetchall.return_value = [(None, datetime(2024, 3, 12, 8))]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)):
+            windows = adapter.get_microbatch_windows(None, "event_ts", "day", begin="2024-03-11")
+            self.assertEqual([window.label for window in windows], ["20240311", "20240312"])
+            with self.assertRaises(DbtRuntimeError):
+                adapter.get_microbatch_windows(None, "event_ts", "day")
+            with self.assertRaises(DbtRuntimeError):
+                adapter.get_microbatch_windows(None, "event_ts", "week", begin="2024-03-11")
+
+    def test_run_microbatch_retries_failed_windows(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="events")
+        batches = [{"name": str(day), "sql": "insert {}".format(day)} for day in range(5)]
+        attempts = {}
+
+        def add_query(sql, **kwargs):
+            attempts[sql] = attempts.get(sql, 0) + 1
+            if sql == "insert 3" and attempts[sql] == 1:
+                raise DbtDatabaseError("worker lost")
+            return None, MagicMock()
+
+        response = MagicMock(rows_affected=10)
+        with patch.object(adapter.connections, "add_query", side_effect=add_query), patch.object(
+            adapter.connections, "get_response", return_value=response
+        ):
+            self.assertEqual(adapter.run_microbatch(relation, batches, parallelism=2), 50)
+            self.assertEqual(attempts["insert 3"], 2)
+            self.assertEqual(attempts["insert 0"], 1)
+
+            attempts.clear()
+            with self.assertRaises(DbtRuntimeError):
+                adapter.run_microbatch(relation, batches[3:4], retries=0)
+
+    def test_catalog_supports_merge(self):
+        adapter = self.adapter
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [["iceberg"]]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)) as add_query:
+            self.assertTrue(adapter.catalog_supports_merge("Lake"))
+            self.assertTrue(adapter.catalog_supports_merge("lake"))
+        add_query.assert_called_once()
+        self.assertIn("catalog_name = 'lake'", add_query.call_args.args[0])
+
+        cursor.fetchall.return_value = [["hive"]]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)):
+            self.assertFalse(adapter.catalog_supports_merge("warehouse"))
+
+        with patch.object(
+            adapter.connections, "add_query", side_effect=DbtDatabaseError("access denied")
+        ):
+            self.assertFalse(adapter.catalog_supports_merge("restricted"))
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_can_widen_column_type(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [
+            ExtricaColumn.from_description("name", "varchar(10)"),
+            ExtricaColumn("id", "integer"),
+        ]
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="lake", schema="schema", identifier="t")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [["iceberg"]]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)):
+            self.assertTrue(adapter.can_widen_column_type(relation, "name", "varchar(20)"))
+            self.assertTrue(adapter.can_widen_column_type(relation, "ID", "bigint"))
+            self.assertFalse(adapter.can_widen_column_type(relation, "id", "varchar"))
+            self.assertFalse(adapter.can_widen_column_type(relation, "missing", "bigint"))
+
+        for connector in ("hive", "postgresql"):
+            cursor.fetchall.return_value = [[connector]]
+            relation = adapter.Relation.create(
+                database="warehouse_" + connector, schema="schema", identifier="t"
+            )
+            with patch.object(adapter.connections, "add_query", return_value=(None, cursor)):
+                self.assertFalse(adapter.can_widen_column_type(relation, "id", "bigint"))
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_get_prune_predicates(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [
+            ExtricaColumn("id", "bigint"),
+            ExtricaColumn("ds", "date"),
+        ]
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="tmp")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [["2024-01-01", "2024-01-31", None, None]]
+
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)) as add_query:
+            predicates = adapter.get_prune_predicates(relation, ["ds", "id"], "DBT_INTERNAL_DEST")
+
+        add_query.assert_called_once()
+        self.assertEqual(
+            add_query.call_args.args[0],
+            'select cast(min("ds") as varchar), cast(max("ds") as varchar), '
+            'cast(min("id") as varchar), cast(max("id") as varchar) from "db"."schema"."tmp"',
+        )
+        self.assertEqual(
+            predicates,
+            [
+                "DBT_INTERNAL_DEST.\"ds\" between cast('2024-01-01' as date)"
+                " and cast('2024-01-31' as date)"
+            ],
+        )
+
+    def test_persist_column_comments_only_changed_columns(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="mart")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            ("id", "The id"),
+            ("name", None),
+            ("note", "Stale"),
+            ("amount", "Old"),
+        ]
+        column_dict = {
+            "id": {"name": "id", "description": "The id"},
+            "name": {"name": "name", "description": ""},
+            "note": {"name": "note", "description": ""},
+            "amount": {"name": "amount", "description": "It's new", "quote": True},
+            "missing": {"name": "missing", "description": "Not in the table"},
+        }
+        statements = []
+
+        def add_query(sql, **kwargs):
+            statements.append(sql)
+            return None, cursor
+
+        with patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(adapter.persist_column_comments(relation, column_dict), 2)
+
+        self.assertIn("table_schema = 'schema' and table_name = 'mart'", statements[0])
+        self.assertEqual(
+            sorted(statements[1:]),
+            [
+                'comment on column "db"."schema"."mart"."amount" is \'It\'\'s new\'',
+                'comment on column "db"."schema"."mart".note is null',
+            ],
+        )
+
+        cursor.fetchall.return_value = [("id", "The id")]
+        statements.clear()
+        with patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(adapter.persist_column_comments(relation, {"id": column_dict["id"]}), 0)
+        self.assertEqual(len(statements), 1)
+
+    def test_get_snapshot_watermark(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="snapshots", identifier="orders")
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [["2024-03-12 08:00:00.000000", "timestamp(6)"]]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)) as add_query:
+            self.assertEqual(
+                adapter.get_snapshot_watermark(relation),
+                "cast('2024-03-12 08:00:00.000000' as timestamp(6))",
+            )
+        self.assertIn('from "db"."snapshots"."orders"', add_query.call_args.args[0])
+
+        cursor.fetchall.return_value = [[None, "unknown"]]
+        with patch.object(adapter.connections, "add_query", return_value=(None, cursor)):
+            self.assertIsNone(adapter.get_snapshot_watermark(relation))
+
+    def test_refresh_materialized_views_skips_fresh_views(self):
+        adapter = self.adapter
+        relations = [
+            adapter.Relation.create(database="db", schema="marts", identifier=name)
+            for name in ("fresh_mv", "stale_mv", "unknown_mv")
+        ]
+        freshness = MagicMock()
+        freshness.description = [("catalog_name",), ("schema_name",), ("name",), ("freshness",)]
+        freshness.fetchall.return_value = [
+            ("db", "marts", "fresh_mv", "FRESH"),
+            ("db", "marts", "stale_mv", "STALE"),
+            ("db", "marts", "unknown_mv", "UNKNOWN"),
+        ]
+        statements = []
+
+        def add_query(sql, **kwargs):
+            statements.append(sql)
+            return None, freshness if "system.metadata" in sql else MagicMock()
+
+        response = MagicMock(elapsed_time_ms=1500)
+        with patch.object(adapter.connections, "add_query", side_effect=add_query), patch.object(
+            adapter.connections, "get_response", return_value=response
+        ):
+            self.assertTrue(adapter.materialized_view_is_fresh(relations[0]))
+            self.assertFalse(adapter.materialized_view_is_fresh(relations[1]))
+            statements.clear()
+            responses = adapter.refresh_materialized_views(relations, parallelism=2)
+
+        self.assertEqual(
+            sorted(responses), ['"db"."marts"."stale_mv"', '"db"."marts"."unknown_mv"']
+        )
+        self.assertEqual(responses['"db"."marts"."stale_mv"'].elapsed_time_ms, 1500)
+        self.assertIn("name in ('fresh_mv', 'stale_mv', 'unknown_mv')", statements[0])
+        self.assertEqual(
+            sorted(statements[1:]),
+            [
+                'refresh materialized view "db"."marts"."stale_mv"',
+                'refresh materialized view "db"."marts"."unknown_mv"',
+            ],
+        )
+
+    def test_reconcile_grants_fetches_schema_privileges_once(self):
+        adapter = self.adapter
+        orders = adapter.Relation.create(database="db", schema="marts", identifier="orders")
+        customers = adapter.Relation.create(database="db", schema="marts", identifier="customers")
+        privileges = MagicMock()
+        privileges.fetchall.return_value = [
+            ("orders", "analyst", "select"),
+            ("orders", "legacy", "select"),
+            ("customers", "analyst", "select"),
+        ]
+        statements = []
+
+        def add_query(sql, **kwargs):
+            statements.append(sql)
+            return None, privileges
+
+        with patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(
+                adapter.reconcile_grants(orders, {"select": ["analyst", "reporting"]}), 2
+            )
+            self.assertEqual(adapter.reconcile_grants(customers, {"select": ["Analyst"]}), 0)
+
+        self.assertEqual(len([sql for sql in statements if "table_privileges" in sql]), 1)
+        self.assertIn("table_schema = 'marts'", statements[0])
+        self.assertNotIn("table_name", statements[0].split("where")[1])
+        self.assertEqual(
+            sorted(statements[1:]),
+            [
+                'grant select on "db"."marts"."orders" to "reporting"',
+                'revoke select on "db"."marts"."orders" from legacy',
+            ],
+        )
+
+        # relations changed by the adapter are fetched again on their own
+        adapter.cache_dropped(customers)
+        privileges.fetchall.return_value = []
+        statements.clear()
+        with patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(adapter.reconcile_grants(customers, {"select": ["analyst"]}), 1)
+            self.assertEqual(
+                adapter.reconcile_grants(orders, {"select": ["analyst", "reporting"]}), 0
+            )
+        self.assertIn("table_name = 'customers'", statements[0])
+        self.assertEqual(len(statements), 2)
+
+    def test_recreated_view_is_granted_again(self):
+        adapter = self.adapter
+        view = adapter.Relation.create(
+            database="db", schema="marts", identifier="orders_v", type="view"
+        )
+        privileges = MagicMock()
+        privileges.fetchall.return_value = [("orders_v", "analyst", "select")]
+        statements = []
+
+        def add_query(sql, **kwargs):
+            statements.append(sql)
+            return None, privileges
+
+        macros = load_macros(
+            "adapters.sql",
+            adapter=adapter,
+            config={"contract": SimpleNamespace(enforced=False)},
+        )
+        with patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(adapter.reconcile_grants(view, {"select": ["analyst"]}), 0)
+
+            # create or replace view drops the privileges on the view
+            self.assertIn("create or replace view", macros.extrica__create_view_as(view, "select 1"))
+            privileges.fetchall.return_value = []
+            statements.clear()
+            self.assertEqual(adapter.reconcile_grants(view, {"select": ["analyst"]}), 1)
+
+        self.assertIn("table_name = 'orders_v'", statements[0])
+        self.assertEqual(statements[1], 'grant select on "db"."marts"."orders_v" to "analyst"')
+
+    def test_drop_schema_relations_drops_views_first(self):
+        adapter = self.adapter
+        schema = adapter.Relation.create(database="db", schema="ci_123")
+        relations = [
+            adapter.Relation.create(database="db", schema="ci_123", identifier=name, type=type)
+            for name, type in [
+                ("orders", "table"),
+                ("orders_v", "view"),
+                ("orders_mv", "materialized_view"),
+                ("customers_v", "view"),
+            ]
+        ]
+        statements = []
+        attempts = {}
+
+        def add_query(sql, **kwargs):
+            attempts[sql] = attempts.get(sql, 0) + 1
+            if "orders_mv" in sql and attempts[sql] == 1:
+                raise DbtDatabaseError("metastore timeout")
+            statements.append(sql)
+            return None, MagicMock()
+
+        with patch.object(
+            adapter, "list_relations_without_caching", return_value=relations
+        ), patch.object(adapter.connections, "add_query", side_effect=add_query):
+            self.assertEqual(adapter.drop_schema_relations(schema, parallelism=2), 4)
+
+            self.assertEqual(
+                sorted(statements[:2]),
+                [
+                    'drop view if exists "db"."ci_123"."customers_v"',
+                    'drop view if exists "db"."ci_123"."orders_v"',
+                ],
+            )
+            self.assertEqual(
+                sorted(statements[2:]),
+                [
+                    'drop materialized view if exists "db"."ci_123"."orders_mv"',
+                    'drop table if exists "db"."ci_123"."orders"',
+                ],
+            )
+
+            attempts.clear()
+            with self.assertRaises(DbtRuntimeError):
+                adapter.drop_schema_relations(schema, retries=0)
+
+    def test_drop_relation_in_background(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(
+            database="db", schema="schema", identifier="model__dbt_backup", type="table"
+        )
+        started = threading.Event()
+        release = threading.Event()
+
+        def add_query(sql, **kwargs):
+            started.set()
+            release.wait(5)
+            return None, MagicMock()
+
+        with patch.object(adapter.connections, "add_query", side_effect=add_query) as add_query:
+            adapter.drop_relation_in_background(relation)
+            self.assertTrue(started.wait(5))
+            release.set()
+            adapter.cleanup_connections()
+
+        self.assertEqual(
+            add_query.call_args.args[0], 'drop table if exists "db"."schema"."model__dbt_backup"'
+        )
+        self.assertEqual(adapter._background_drops, [])
+
+    def test_background_drop_failures_do_not_fail_cleanup(self):
+        adapter = self.adapter
+        relation = adapter.Relation.create(
+            database="db", schema="schema", identifier="model__dbt_backup", type="table"
+        )
+        with patch.object(
+            adapter.connections, "add_query", side_effect=DbtDatabaseError("gone")
+        ):
+            adapter.drop_relation_in_background(relation)
+            adapter.cleanup_connections()
+
+    def test_get_partition_columns(self):
+        adapter = self.adapter
+        self.assertEqual(adapter.get_partition_columns("ds", None), ["ds"])
+        self.assertEqual(
+            adapter.get_partition_columns(None, {"partitioned_by": "ARRAY['ds']"}), ["ds"]
+        )
+        with self.assertRaises(DbtRuntimeError):
+            adapter.get_partition_columns(None, {"format": "'ORC'"})
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_get_columns_in_relation_is_cached(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [ExtricaColumn("id", "integer")]
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="model")
+        same_relation = adapter.Relation.create(database="DB", schema="schema", identifier="MODEL")
+
+        self.assertEqual(adapter.get_columns_in_relation(relation), [ExtricaColumn("id", "integer")])
+        self.assertEqual(adapter.get_columns_in_relation(same_relation), [ExtricaColumn("id", "integer")])
+        get_columns_in_relation.assert_called_once()
+        self.assertEqual((adapter._columns_cache_hits, adapter._columns_cache_misses), (1, 1))
+
+        adapter.invalidate_column_cache(relation)
+        adapter.get_columns_in_relation(relation)
+        self.assertEqual(get_columns_in_relation.call_count, 2)
+
+        adapter.cache_renamed(relation, relation.incorporate(path={"identifier": "other"}))
+        adapter.get_columns_in_relation(relation)
+        self.assertEqual(get_columns_in_relation.call_count, 3)
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_get_columns_in_missing_relation_is_not_cached(self, get_columns_in_relation):
+        get_columns_in_relation.side_effect = DbtDatabaseError("Table does not exist")
+        adapter = self.adapter
+        relation = adapter.Relation.create(database="db", schema="schema", identifier="missing")
+
+        self.assertEqual(adapter.get_columns_in_relation(relation), [])
+        self.assertEqual(adapter.get_columns_in_relation(relation), [])
+        self.assertEqual(get_columns_in_relation.call_count, 2)
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_ddl_macros_evict_cached_columns(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [ExtricaColumn("id", "integer")]
+        adapter = self.adapter
+        relation = adapter.Relation.create(
+            database="db", schema="schema", identifier="model", type="table"
+        )
+
+        def statement(name, caller=None):
+            caller()
+            return ""
+
+        macros = load_macros(
+            "adapters.sql",
+            adapter=adapter,
+            config={"contract": SimpleNamespace(enforced=False)},
+            model={"config": {}, "description": None},
+            statement=statement,
+        )
+        with patch.object(adapter, "can_widen_column_type", new=lambda *args: False):
+            for ddl in (
+                lambda: macros.extrica__create_table_as(False, relation, "select 1 as id"),
+                lambda: macros.extrica__create_view_as(relation, "select 1 as id"),
+                lambda: macros.extrica__alter_column_type(relation, "id", "bigint"),
+            ):
+                calls = get_columns_in_relation.call_count
+                adapter.get_columns_in_relation(relation)
+                adapter.get_columns_in_relation(relation)
+                self.assertEqual(get_columns_in_relation.call_count, calls + 1)
+                ddl()
+                adapter.get_columns_in_relation(relation)
+                self.assertEqual(get_columns_in_relation.call_count, calls + 2)
+                adapter.invalidate_column_cache(relation)
+
+    def _columns_table(self, rows):
+        return agate.Table(
+            rows,
+            column_names=["table_name", "column_name", "data_type"],
+            column_types=[agate.Text(), agate.Text(), agate.Text()],
+        )
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_prefetch_columns(self, get_columns_in_relation):
+        adapter = self.adapter
+        schema = adapter.Relation.create(database="db", schema="schema")
+        columns_table = self._columns_table(
+            [["a", "id", "integer"], ["a", "name", "varchar(10)"], ["b", "amount", "decimal(10,2)"]]
+        )
+
+        with patch.object(adapter, "execute_macro", return_value=columns_table) as execute_macro:
+            adapter.prefetch_columns([schema])
+
+        execute_macro.assert_called_once()
+        self.assertIsNone(execute_macro.call_args.kwargs["kwargs"]["identifiers"])
+        a = adapter.get_columns_in_relation(schema.incorporate(path={"identifier": "a"}))
+        self.assertEqual([column.name for column in a], ["id", "name"])
+        self.assertEqual(a[1].char_size, 10)
+        b = adapter.get_columns_in_relation(schema.incorporate(path={"identifier": "B"}))
+        self.assertEqual((b[0].numeric_precision, b[0].numeric_scale), (10, 2))
+        get_columns_in_relation.assert_not_called()
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_first_miss_prefetches_known_relations_of_schema(self, get_columns_in_relation):
+        get_columns_in_relation.return_value = [ExtricaColumn("x", "integer")]
+        adapter = self.adapter
+        a, b, c = [
+            adapter.Relation.create(database="db", schema="schema", identifier=name, type="table")
+            for name in ("a", "b", "c")
+        ]
+        for relation in (a, b):
+            adapter.cache.add(relation)
+        columns_table = self._columns_table([["a", "id", "integer"], ["b", "id", "integer"]])
+
+        with patch.object(adapter, "execute_macro", return_value=columns_table) as execute_macro:
+            adapter.get_columns_in_relation(a)
+            adapter.get_columns_in_relation(b)
+            adapter.get_columns_in_relation(c)
+
+        execute_macro.assert_called_once()
+        self.assertEqual(execute_macro.call_args.kwargs["kwargs"]["identifiers"], ["a", "b"])
+        get_columns_in_relation.assert_called_once_with(c)
+
+    @patch("dbt.adapters.sql.SQLAdapter.get_columns_in_relation")
+    def test_columns_fetched_before_an_invalidation_are_not_cached(
+        self, get_columns_in_relation
+    ):
+        get_columns_in_relation.return_value = [ExtricaColumn("x", "integer")]
+        adapter = self.adapter
+        schema = adapter.Relation.create(database="db", schema="schema")
+        a, b = [schema.incorporate(path={"identifier": name}) for name in ("a", "b")]
+        columns_table = self._columns_table([["a", "id", "integer"], ["b", "id", "integer"]])
+
+        def rebuild_a_while_prefetching(macro_name, kwargs):
+            # another thread replaces `a` while the query runs
+            adapter.invalidate_column_cache(a)
+            return columns_table
+
+        with patch.object(adapter, "execute_macro", side_effect=rebuild_a_while_prefetching):
+            adapter.prefetch_columns([schema])
+        self.assertEqual(adapter.get_columns_in_relation(a), [ExtricaColumn("x", "integer")])
+        self.assertEqual([column.name for column in adapter.get_columns_in_relation(b)], ["id"])
+        get_columns_in_relation.assert_called_once_with(a)
+
+        # the same goes for a single relation, and for its whole schema
+        def drop_schema_while_fetching(relation):
+            adapter._invalidate_column_cache_for_schema(relation)
+            return [ExtricaColumn("y", "integer")]
+
+        adapter.invalidate_column_cache(a)
+        get_columns_in_relation.side_effect = drop_schema_while_fetching
+        adapter.get_columns_in_relation(a)
+        adapter.get_columns_in_relation(a)
+        self.assertEqual(get_columns_in_relation.call_count, 3)
+
+    def test_relations_cache_is_populated_with_one_query_per_catalog(self):
+        self.config.threads = 2
+        adapter = self.adapter
+        schemas = {
+            adapter.Relation.create(database=database, schema=schema)
+            for database, schema in [("db1", "a"), ("db1", "b"), ("db1", "c"), ("db2", "a")]
+        }
+
+        def list_relations(macro_name, kwargs):
+            database = kwargs["relation"].database
+            return [
+                (database, "t_" + schema, schema, "table" if schema != "b" else "view")
+                for schema in kwargs["schemas"]
+            ]
+
+        with patch.object(adapter, "execute_macro", side_effect=list_relations) as execute_macro:
+            adapter._relations_cache_for_schemas(None, schemas)
+
+        self.assertEqual(execute_macro.call_count, 2)
+        self.assertEqual(
+            sorted(call.kwargs["kwargs"]["schemas"] for call in execute_macro.call_args_list),
+            [["a"], ["a", "b", "c"]],
+        )
+        self.assertEqual(len(adapter.cache.get_relations("db1", "b")), 1)
+        self.assertTrue(adapter.cache.get_relations("db1", "b")[0].is_view)
+        self.assertIn(("db2", "a"), adapter.cache.schemas)
+
+    def test_relations_cache_prefetches_privileges_of_schemas_with_grants(self):
+        self.config.threads = 2
+        adapter = self.adapter
+        schemas = {
+            adapter.Relation.create(database="db", schema=schema) for schema in ("marts", "staging")
+        }
+        manifest = SimpleNamespace(
+            nodes={
+                "model.x.orders": SimpleNamespace(
+                    database="db", schema="marts", config=SimpleNamespace(grants={"select": ["a"]})
+                ),
+                "model.x.stg_orders": SimpleNamespace(
+                    database="db", schema="staging", config=SimpleNamespace(grants={})
+                ),
+            }
+        )
+        privileges = MagicMock()
+        privileges.fetchall.return_value = [("orders", "a", "select")]
+        statements = []
+
+        def add_query(sql, **kwargs):
+            statements.append(sql)
+            return None, privileges
+
+        with patch.object(adapter, "execute_macro", return_value=[]), patch.object(
+            adapter.connections, "add_query", side_effect=add_query
+        ):
+            adapter._relations_cache_for_schemas(manifest, schemas)
+            orders = adapter.Relation.create(database="db", schema="marts", identifier="orders")
+            self.assertEqual(adapter.reconcile_grants(orders, {"select": ["a"]}), 0)
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn("table_schema = 'marts'", statements[0])
+
+    def test_run_concurrently_retries_failures_and_bounds_lookahead(self):
+        adapter = self.adapter
+        attempts = {}
+        taken = []
+        running = []
+
+        def add_query(sql, **kwargs):
+            attempts[sql] = attempts.get(sql, 0) + 1
+            running.append(sql)
+            if sql == "statement 5" and attempts[sql] == 1:
+                raise DbtDatabaseError("worker lost")
+            return None, MagicMock()
+
+        def statements():
+            for index in range(20):
+                # never more than twice the parallelism taken ahead of the workers
+                self.assertLessEqual(len(taken) - len(running), 4)
+                taken.append(index)
+                yield ConcurrentStatement(str(index), "statement {}".format(index))
+
+        response = MagicMock(rows_affected=1)
+        with patch.object(adapter.connections, "add_query", side_effect=add_query), patch.object(
+            adapter.connections, "get_response", return_value=response
+        ):
+            responses = adapter._run_concurrently("test", statements(), 2, retries=1)
+            self.assertEqual(sorted(responses, key=int), [str(index) for index in range(20)])
+            self.assertEqual(attempts["statement 5"], 2)
+            self.assertEqual(attempts["statement 6"], 1)
+
+            # serially, without retries, nothing runs after the first failure
+            attempts.clear()
+            failing = [
+                ConcurrentStatement(str(index), "statement {}".format(index)) for index in (4, 5, 6)
+            ]
+            with self.assertRaises(DbtRuntimeError):
+                adapter._run_concurrently("test", failing, 1)
+            self.assertNotIn("statement 6", attempts)
+
+    def test_get_catalog_in_chunks(self):
+        self.config.threads = 4
+        adapter = self.adapter
+        info = adapter.Relation.create(database="db").information_schema()
+        schemas = {"schema_{:02}".format(i) for i in range(25)}
+
+        def get_one_catalog(information_schema, chunk, manifest):
+            return agate.Table(
+                [["db", schema, "t"] for schema in sorted(chunk)],
+                column_names=["table_database", "table_schema", "table_name"],
+            )
+
+        with patch.object(adapter, "_get_catalog_schemas", return_value={info: schemas}), patch.object(
+            adapter, "_get_one_catalog", side_effect=get_one_catalog
+        ) as _get_one_catalog:
+            catalog, exceptions = adapter.get_catalog(None)
+
+        self.assertEqual(exceptions, [])
+        self.assertEqual(_get_one_catalog.call_count, 3)
+        self.assertEqual(max(len(call.args[1]) for call in _get_one_catalog.call_args_list), 10)
+        self.assertEqual(sorted(row["table_schema"] for row in catalog), sorted(schemas))
+
     def test_cancel_open_connections_empty(self):
         self.assertEqual(len(list(self.adapter.cancel_open_connections())), 0)
 
@@ -256,6 +1001,112 @@ class TestPreparedStatementsEnabled(TestCase):
         self.assertEqual(connection.credentials.prepared_statements_enabled, True)
 
 
+class TestConnectionWrapper(TestCase):
+    def _wrapper(self, rows, stream_results, update_type=None):
+        cursor = MagicMock()
+        cursor.update_type = update_type
+        cursor.fetchall = Mock(side_effect=lambda: list(remaining))
+        remaining = iter(rows)
+        cursor.fetchone = Mock(side_effect=lambda: next(remaining, None))
+        handle = MagicMock()
+        handle.cursor = MagicMock(return_value=cursor)
+        wrapper = ConnectionWrapper(handle, True, stream_results)
+        wrapper.cursor()
+        return wrapper, cursor
+
+    def test_eager_fetch_iterates(self):
+        wrapper, cursor = self._wrapper([[1], [2], [3]], stream_results=False)
+        wrapper.execute("select 1")
+        cursor.fetchall.assert_called_once()
+        self.assertEqual(wrapper.fetchone(), [1])
+        self.assertEqual(wrapper.fetchmany(1), [[2]])
+        self.assertEqual(wrapper.fetchall(), [[3]])
+        self.assertIsNone(wrapper.fetchall())
+
+    def test_streaming_fetch_is_lazy(self):
+        wrapper, cursor = self._wrapper([[1], [2], [3]], stream_results=True)
+        wrapper.execute("select 1")
+        cursor.fetchall.assert_not_called()
+        cursor.fetchone.assert_not_called()
+        self.assertEqual(wrapper.fetchmany(2), [[1], [2]])
+        self.assertEqual(cursor.fetchone.call_count, 2)
+        self.assertEqual(wrapper.fetchall(), [[3]])
+
+    def test_streaming_errors_are_database_errors(self):
+        wrapper, cursor = self._wrapper([[1]], stream_results=True)
+        wrapper.execute("select 1")
+        self.assertTrue(wrapper.streaming)
+        self.assertEqual(wrapper.fetchone(), [1])
+        cursor.fetchone.side_effect = trino.exceptions.TrinoQueryError({"message": "boom"})
+        with self.assertRaises(DbtDatabaseError):
+            wrapper.fetchall()
+
+    def test_streaming_drains_update_statements(self):
+        wrapper, cursor = self._wrapper([[10]], stream_results=True, update_type="INSERT")
+        wrapper.execute("insert into t values (1)")
+        self.assertEqual(cursor.fetchone.call_count, 2)
+        self.assertIsNone(wrapper.fetchall())
+
+
+class TestSplitSqlStatements(TestCase):
+    def test_single_statement(self):
+        self.assertEqual(split_sql_statements("  select 1\n"), ("select 1",))
+        self.assertEqual(split_sql_statements("select 1;"), ("select 1",))
+
+    def test_multiple_statements(self):
+        self.assertEqual(
+            split_sql_statements("create table t (a int);\ninsert into t values (1);"),
+            ("create table t (a int)", "insert into t values (1)"),
+        )
+
+    def test_quoted_semicolons_are_not_split(self):
+        sql = "select 'a;b', 'it''s;', \"c;d\" from t; select 2"
+        self.assertEqual(
+            split_sql_statements(sql),
+            ("select 'a;b', 'it''s;', \"c;d\" from t", "select 2"),
+        )
+
+    def test_comments(self):
+        sql = "select 1 -- one; two\n/* three; */ from t;\n-- trailing comment\n"
+        self.assertEqual(
+            split_sql_statements(sql), ("select 1 -- one; two\n/* three; */ from t",)
+        )
+        self.assertEqual(split_sql_statements("-- nothing to run"), ())
+        self.assertEqual(split_sql_statements("/* a */ ; ;"), ())
+
+    def test_quoted_comment_markers(self):
+        self.assertEqual(split_sql_statements("select '--x'"), ("select '--x'",))
+
+    def test_single_statement_skips_splitting(self):
+        adapter = ExtricaAdapter(config_from_parts_or_dicts(
+            {"name": "x", "version": "1.0", "config-version": 2, "profile": "test"},
+            {
+                "outputs": {
+                    "test": {
+                        "type": "extrica",
+                        "method": "jwt",
+                        "username": "u",
+                        "password": "p",
+                        "host": "h",
+                        "port": 443,
+                        "database": "db",
+                        "schema": "s",
+                    }
+                },
+                "target": "test",
+            },
+        ))
+        manager = adapter.connections
+        sql = "insert into t values ('a;b'); -- not split"
+        with patch("dbt.adapters.sql.connections.SQLConnectionManager.add_query") as add_query:
+            add_query.return_value = (Mock(), Mock())
+            with patch("dbt.adapters.extrica.connections.split_sql_statements") as split:
+                manager.add_query(sql, single_statement=True)
+                split.assert_not_called()
+        add_query.assert_called_once()
+        self.assertEqual(add_query.call_args.args[0], sql)
+
+
 class TestAdapterConversions(TestCase):
     def _get_tester_for(self, column_type):
         from dbt.clients import agate_helper
@@ -361,3 +1212,22 @@ class TestTrinoColumn(unittest.TestCase):
         assert col.is_string() is True
         assert col.is_number() is False
         assert col.is_numeric() is False
+
+    def test_can_widen_to(self):
+        def widens(from_type, to_type):
+            return ExtricaColumn.from_description("c", from_type).can_widen_to(
+                ExtricaColumn.from_description("c", to_type)
+            )
+
+        assert widens("varchar(10)", "varchar(20)") is True
+        assert widens("varchar(10)", "varchar") is True
+        assert widens("varchar", "varchar(20)") is False
+        assert widens("varchar(20)", "varchar(10)") is False
+        assert widens("integer", "bigint") is True
+        assert widens("int", "bigint") is True
+        assert widens("bigint", "integer") is False
+        assert widens("decimal(10,2)", "decimal(12,2)") is True
+        assert widens("decimal(10,2)", "decimal(12,4)") is False
+        assert widens("decimal(10,2)", "decimal(8,2)") is False
+        assert widens("real", "double") is True
+        assert widens("integer", "varchar") is False
@@ -0,0 +1,353 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+from dbt.adapters.extrica import ExtricaRelation
+from dbt.adapters.extrica.incremental import (
+    PARTITION_PREDICATES_MAX,
+    microbatch_windows,
+    offset_timestamp,
+    partition_columns_from_properties,
+    render_partition_predicates,
+    render_range_predicates,
+    truncate_timestamp,
+)
+
+from .utils import load_macros
+
+
+class TestPartitionColumnsFromProperties(unittest.TestCase):
+    def test_hive_partitions(self):
+        self.assertEqual(
+            partition_columns_from_properties({"partitioned_by": "ARRAY['ds', 'region']"}),
+            ["ds", "region"],
+        )
+
+    def test_iceberg_transforms_are_left_out(self):
+        self.assertEqual(
+            partition_columns_from_properties(
+                {"format": "'PARQUET'", "partitioning": "ARRAY['day(ts)', 'country']"}
+            ),
+            ["country"],
+        )
+
+    def test_no_partitions(self):
+        self.assertEqual(partition_columns_from_properties(None), [])
+        self.assertEqual(partition_columns_from_properties({"format": "'ORC'"}), [])
+
+
+class TestRenderPartitionPredicates(unittest.TestCase):
+    def test_single_column_is_one_in_predicate(self):
+        self.assertEqual(
+            render_partition_predicates(
+                ['"ds"'], ["date"], [("2024-01-02",), ("2024-01-01",), (None,)]
+            ),
+            [
+                "\"ds\" in (cast('2024-01-01' as date), cast('2024-01-02' as date))"
+                ' or "ds" is null'
+            ],
+        )
+
+    def test_multiple_columns_are_grouped_in_value_lists(self):
+        self.assertEqual(
+            render_partition_predicates(
+                ['"ds"', '"region"'],
+                ["date", "varchar"],
+                [("2024-01-01", "eu"), ("2024-01-01", None)],
+            ),
+            [
+                "\"ds\" in (cast('2024-01-01' as date))"
+                " and (\"region\" in (cast('eu' as varchar)) or \"region\" is null)",
+            ],
+        )
+        # days with the same regions share a predicate
+        self.assertEqual(
+            render_partition_predicates(
+                ['"ds"', '"region"'],
+                ["date", "varchar"],
+                [
+                    ("2024-01-01", "eu"),
+                    ("2024-01-01", "us"),
+                    ("2024-01-02", "eu"),
+                    ("2024-01-02", "us"),
+                    ("2024-01-03", "eu"),
+                ],
+            ),
+            [
+                "\"ds\" in (cast('2024-01-01' as date), cast('2024-01-02' as date))"
+                " and \"region\" in (cast('eu' as varchar), cast('us' as varchar))",
+                "\"ds\" in (cast('2024-01-03' as date)) and \"region\" in (cast('eu' as varchar))",
+            ],
+        )
+
+    def test_number_of_predicates_is_capped(self):
+        rows = [(str(day), str(day)) for day in range(100)]
+        predicates = render_partition_predicates(
+            ['"day"', '"shard"'], ["integer", "integer"], rows, max_predicates=3
+        )
+        self.assertEqual(len(predicates), 3)
+        self.assertEqual(sum(predicate.count('"day" in') for predicate in predicates), 100)
+
+    def test_values_are_escaped(self):
+        self.assertEqual(
+            render_partition_predicates(['"name"'], ["varchar"], [("o'neil",)]),
+            ["\"name\" in (cast('o''neil' as varchar))"],
+        )
+
+    def test_no_rows_no_predicates(self):
+        self.assertEqual(render_partition_predicates(['"ds"'], ["date"], []), [])
+        self.assertEqual(render_partition_predicates(['"a"', '"b"'], ["int", "int"], []), [])
+
+
+class TestRenderRangePredicates(unittest.TestCase):
+    def test_bounds(self):
+        self.assertEqual(
+            render_range_predicates(
+                ['DBT_INTERNAL_DEST."ds"', 'DBT_INTERNAL_DEST."id"'],
+                ["date", "bigint"],
+                [("2024-01-01", "2024-01-03"), ("10", "42")],
+            ),
+            [
+                "DBT_INTERNAL_DEST.\"ds\" between cast('2024-01-01' as date)"
+                " and cast('2024-01-03' as date)",
+                "DBT_INTERNAL_DEST.\"id\" between cast('10' as bigint) and cast('42' as bigint)",
+            ],
+        )
+
+    def test_columns_without_bounds_are_left_out(self):
+        self.assertEqual(render_range_predicates(['"ds"'], ["date"], [(None, None)]), [])
+
+
+class TestMicrobatchWindows(unittest.TestCase):
+    def test_truncate_and_offset(self):
+        timestamp = datetime(2024, 11, 15, 13, 45, 12)
+        self.assertEqual(truncate_timestamp(timestamp, "hour"), datetime(2024, 11, 15, 13))
+        self.assertEqual(truncate_timestamp(timestamp, "day"), datetime(2024, 11, 15))
+        self.assertEqual(truncate_timestamp(timestamp, "month"), datetime(2024, 11, 1))
+        self.assertEqual(truncate_timestamp(timestamp, "year"), datetime(2024, 1, 1))
+        self.assertEqual(offset_timestamp(datetime(2024, 11, 1), "month", 3), datetime(2025, 2, 1))
+        self.assertEqual(offset_timestamp(datetime(2024, 1, 1), "month", -1), datetime(2023, 12, 1))
+        self.assertEqual(offset_timestamp(datetime(2024, 1, 1), "day", -1), datetime(2023, 12, 31))
+
+    def test_windows_cover_range(self):
+        windows = microbatch_windows(datetime(2024, 1, 30, 6), datetime(2024, 2, 2), "day")
+        self.assertEqual([window.label for window in windows], ["20240130", "20240131", "20240201"])
+        self.assertEqual(windows[0].start_literal, "timestamp '2024-01-30 00:00:00'")
+        self.assertEqual(windows[-1].end_literal, "timestamp '2024-02-02 00:00:00'")
+
+    def test_empty_range(self):
+        self.assertEqual(microbatch_windows(datetime(2024, 1, 2), datetime(2024, 1, 2), "hour"), [])
+
+
+class TestIncrementalTmpRelationType(unittest.TestCase):
+    def tmp_relation_type(
+        self, compiled_code, supports_merge=True, strategy="delete+insert", **config
+    ):
+        adapter = SimpleNamespace(catalog_supports_merge=lambda database: supports_merge)
+        macros = load_macros(
+            "materializations/incremental.sql",
+            config=config,
+            adapter=adapter,
+            this='"lake"."marts"."orders"',
+            compiled_code=compiled_code,
+            log=lambda msg: "",
+        )
+        return macros.get_incremental_tmp_relation_type(strategy, "id", "sql")
+
+    def test_delete_insert_uses_a_table_by_default(self):
+        self.assertEqual(self.tmp_relation_type("select * from src"), "table")
+
+    def test_delete_insert_with_merge_uses_a_view(self):
+        sql = "select * from src"
+        self.assertEqual(self.tmp_relation_type(sql, delete_insert_with_merge=True), "view")
+        self.assertEqual(
+            self.tmp_relation_type(sql, supports_merge=False, delete_insert_with_merge=True),
+            "table",
+        )
+
+    def test_model_reading_this_keeps_a_table(self):
+        # the delete would change what the view returns to the insert
+        sql = 'select * from src where ts > (select max(ts) from "lake"."marts"."orders")'
+        self.assertEqual(self.tmp_relation_type(sql, delete_insert_with_merge=True), "table")
+
+    def test_prune_columns_keep_a_table(self):
+        # the bounds are read from the temp relation before the merge
+        sql = "select * from src"
+        self.assertEqual(self.tmp_relation_type(sql, strategy="merge"), "view")
+        self.assertEqual(
+            self.tmp_relation_type(sql, strategy="merge", incremental_prune_columns=["ds"]),
+            "table",
+        )
+        self.assertEqual(
+            self.tmp_relation_type(
+                sql, delete_insert_with_merge=True, incremental_prune_columns=["ds"]
+            ),
+            "table",
+        )
+
+    def test_microbatch_reads_a_view_with_a_unique_key(self):
+        # windows are staged one by one; the model is not materialized at once
+        self.assertEqual(self.tmp_relation_type("select 1", strategy="microbatch"), "view")
+
+
+class TestRunMicrobatch(unittest.TestCase):
+    def run_microbatch(self, **config):
+        calls = []
+        window = SimpleNamespace(
+            label="20240311",
+            start_literal="timestamp '2024-03-11'",
+            end_literal="timestamp '2024-03-12'",
+        )
+        adapter = SimpleNamespace(
+            get_microbatch_windows=lambda *args: [window],
+            run_microbatch=lambda *args: calls.append(args) or 0,
+        )
+        macros = load_macros(
+            "materializations/incremental.sql",
+            config={"event_time": "ts", **config},
+            adapter=adapter,
+            exceptions=SimpleNamespace(raise_compiler_error=self.fail),
+            get_quoted_csv=lambda names: ", ".join(names),
+            make_temp_relation=lambda relation, suffix: relation + suffix,
+            noop_statement=lambda *args, caller=None: "",
+        )
+        macros.extrica__run_microbatch("events", "events__tmp", [], None)
+        return calls[0][2]
+
+    def test_delete_insert_windows_run_one_at_a_time_by_default(self):
+        self.assertEqual(self.run_microbatch(), 1)
+        self.assertEqual(self.run_microbatch(microbatch_parallelism=3), 3)
+        self.assertIsNone(self.run_microbatch(microbatch_apply="append"))
+
+
+class TestPrunePredicates(unittest.TestCase):
+    def setUp(self):
+        self.target = ExtricaRelation.create(
+            database="lake", schema="marts", identifier="orders", type="table"
+        )
+        self.source = self.target.incorporate(path={"identifier": "orders__dbt_tmp"})
+        self.columns = [SimpleNamespace(name="id"), SimpleNamespace(name="ds")]
+        self.macros = load_macros(
+            "materializations/incremental.sql",
+            config={},
+            get_quoted_csv=lambda names: ", ".join(names),
+            get_merge_update_columns=lambda update, exclude, columns: [c.name for c in columns],
+        )
+
+    def prune_predicates(self, alias=None):
+        column = '"ds"' if alias is None else alias + '."ds"'
+        return render_range_predicates([column], ["date"], [("2024-01-01", "2024-01-31")])
+
+    def render(self, sql):
+        return " ".join(sql.split())
+
+    def test_merge_bounds_the_target_only(self):
+        sql = self.render(
+            self.macros.extrica__get_merge_sql(
+                self.target,
+                self.source,
+                "id",
+                self.columns,
+                self.prune_predicates("DBT_INTERNAL_DEST"),
+            )
+        )
+        self.assertIn(
+            'using "lake"."marts"."orders__dbt_tmp" as DBT_INTERNAL_SOURCE '
+            "on (DBT_INTERNAL_DEST.\"ds\" between cast('2024-01-01' as date)"
+            " and cast('2024-01-31' as date))"
+            " and ( DBT_INTERNAL_SOURCE.id = DBT_INTERNAL_DEST.id )",
+            sql,
+        )
+        # new rows are not filtered: a key whose row moved out of the bounds
+        # is not matched and would be inserted again
+        self.assertIn("when not matched then insert", sql)
+
+    def test_delete_insert_bounds_the_delete_only(self):
+        sql = self.render(
+            self.macros.extrica__get_delete_insert_merge_sql(
+                self.target, self.source, "id", self.columns, self.prune_predicates()
+            )
+        )
+        self.assertIn(
+            'delete from "lake"."marts"."orders" where ( id) in ( select id from'
+            ' "lake"."marts"."orders__dbt_tmp" )'
+            " and \"ds\" between cast('2024-01-01' as date) and cast('2024-01-31' as date) ;",
+            sql,
+        )
+        self.assertTrue(
+            sql.endswith(
+                'insert into "lake"."marts"."orders" (id, ds) ( select id, ds from'
+                ' "lake"."marts"."orders__dbt_tmp" )'
+            )
+        )
+
+
+class TestInsertOverwriteSql(unittest.TestCase):
+    def render(self, columns, data_types, rows, **config):
+        def get_partition_predicates(source, partition_by):
+            self.assertEqual(partition_by, columns)
+            quoted = ['"{}"'.format(column) for column in columns]
+            return render_partition_predicates(quoted, data_types, rows)
+
+        adapter = SimpleNamespace(
+            get_partition_columns=lambda partition_by, properties: partition_by,
+            get_partition_predicates=get_partition_predicates,
+        )
+        macros = load_macros(
+            "materializations/incremental.sql",
+            config={"partition_by": columns, **config},
+            adapter=adapter,
+            get_quoted_csv=lambda names: ", ".join(names),
+        )
+        sql = macros.extrica__get_incremental_insert_overwrite_sql(
+            {
+                "target_relation": '"lake"."marts"."events"',
+                "temp_relation": '"lake"."marts"."events__dbt_tmp"',
+                "dest_columns": [SimpleNamespace(name="id"), SimpleNamespace(name="ds")],
+                "incremental_predicates": config.get("incremental_predicates"),
+            }
+        )
+        return [" ".join(statement.split()) for statement in sql.split(";")]
+
+    def test_single_column_partitions_are_replaced_in_one_delete(self):
+        statements = self.render(["ds"], ["date"], [("2024-01-01",), ("2024-01-02",)])
+        self.assertEqual(
+            statements,
+            [
+                'delete from "lake"."marts"."events" where ("ds" in '
+                "(cast('2024-01-01' as date), cast('2024-01-02' as date)))",
+                'insert into "lake"."marts"."events" (id, ds) '
+                '( select id, ds from "lake"."marts"."events__dbt_tmp" )',
+            ],
+        )
+
+    def test_multi_column_partitions_are_grouped(self):
+        statements = self.render(
+            ["ds", "region"],
+            ["date", "varchar"],
+            [
+                ("2024-01-01", "eu"),
+                ("2024-01-01", "us"),
+                ("2024-01-02", "eu"),
+                ("2024-01-02", "us"),
+            ],
+            incremental_predicates=["\"ds\" >= date '2024-01-01'"],
+        )
+        self.assertEqual(
+            statements[:-1],
+            [
+                'delete from "lake"."marts"."events" where ("ds" in '
+                "(cast('2024-01-01' as date), cast('2024-01-02' as date))"
+                " and \"region\" in (cast('eu' as varchar), cast('us' as varchar)))"
+                " and \"ds\" >= date '2024-01-01'",
+            ],
+        )
+
+    def test_number_of_deletes_is_capped(self):
+        # one partition per day and shard, which cannot be grouped
+        rows = [(str(day), str(day)) for day in range(50)]
+        statements = self.render(["day", "shard"], ["integer", "integer"], rows)
+        deletes = [statement for statement in statements if statement.startswith("delete")]
+        self.assertLessEqual(len(deletes), PARTITION_PREDICATES_MAX)
+        self.assertEqual(sum(delete.count('"day" in') for delete in deletes), 50)
+        self.assertTrue(statements[-1].startswith('insert into "lake"."marts"."events"'))
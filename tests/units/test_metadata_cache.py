@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+
+from dbt.adapters.extrica.connections import ExtricaConnectionManager
+from dbt.adapters.extrica.metadata_cache import (
+    MetadataResultCache,
+    ddl_schemas,
+    is_metadata_query,
+)
+
+LIST_SCHEMAS = "select schema_name from \"db\".information_schema.schemata"
+SHOW_GRANTS = (
+    "select grantee, lower(privilege_type) as privilege_type "
+    "from information_schema.table_privileges "
+    "where table_catalog = 'db' and table_schema = 'analytics' and table_name = 'orders'"
+)
+
+
+class TestClassification(unittest.TestCase):
+    def test_metadata_queries(self):
+        self.assertTrue(is_metadata_query(LIST_SCHEMAS))
+        self.assertTrue(is_metadata_query(SHOW_GRANTS))
+        self.assertTrue(is_metadata_query("/* dbt */\n  describe \"db\".\"analytics\".\"orders\""))
+        self.assertTrue(is_metadata_query("show create table db.analytics.orders"))
+
+    def test_other_queries(self):
+        self.assertFalse(is_metadata_query("select * from db.analytics.orders"))
+        self.assertFalse(
+            is_metadata_query(
+                "select * from db.information_schema.tables join db.analytics.orders on true"
+            )
+        )
+        self.assertFalse(is_metadata_query("insert into t select * from information_schema.tables"))
+        # system tables and table stats change with DML, not only with DDL
+        self.assertFalse(
+            is_metadata_query(
+                "select * from db.information_schema.tables t "
+                "left join system.metadata.materialized_views mv on t.table_name = mv.name"
+            )
+        )
+        self.assertFalse(
+            is_metadata_query("select freshness from system.metadata.materialized_views")
+        )
+        self.assertFalse(is_metadata_query("show stats for db.analytics.orders"))
+
+    def test_ddl_schemas(self):
+        self.assertEqual(
+            ddl_schemas('create table "db"."analytics"."orders" (a int)'), {"analytics"}
+        )
+        self.assertEqual(ddl_schemas("drop view analytics.orders"), {"analytics", "orders"})
+        self.assertIsNone(ddl_schemas('create schema "db"."analytics"'))
+        self.assertIsNone(ddl_schemas("drop table orders"))
+        self.assertEqual(ddl_schemas("insert into db.analytics.orders values (1)"), frozenset())
+        self.assertEqual(ddl_schemas(SHOW_GRANTS), frozenset())
+
+
+class TestMetadataResultCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = MetadataResultCache()
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", SHOW_GRANTS, "result", cache.generation)
+        self.assertEqual(cache.get("k"), "result")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        cache = MetadataResultCache(max_size=2)
+        cache.put("a", "describe a", 1, 0)
+        cache.put("b", "describe b", 2, 0)
+        cache.get("a")
+        cache.put("c", "describe c", 3, 0)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        cache = MetadataResultCache(ttl=10)
+        with patch("dbt.adapters.extrica.metadata_cache.time.monotonic", return_value=100):
+            cache.put("k", "describe t", "result", 0)
+        with patch("dbt.adapters.extrica.metadata_cache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get("k"))
+
+    def test_ddl_invalidates_entries_of_same_schema(self):
+        cache = MetadataResultCache()
+        cache.put("grants", SHOW_GRANTS, 1, 0)
+        cache.put("other", "describe db.staging.orders", 2, 0)
+
+        cache.invalidate("insert into db.analytics.orders values (1)")
+        self.assertEqual(cache.get("grants"), 1)
+
+        cache.invalidate("grant select on db.analytics.orders to role reporting")
+        self.assertIsNone(cache.get("grants"))
+        self.assertEqual(cache.get("other"), 2)
+
+        cache.invalidate('create schema "db"."new"')
+        self.assertIsNone(cache.get("other"))
+
+    def test_results_racing_with_ddl_are_not_cached(self):
+        cache = MetadataResultCache()
+        generation = cache.generation
+        cache.invalidate("drop table db.analytics.orders")
+        cache.put("k", SHOW_GRANTS, 1, generation)
+        self.assertIsNone(cache.get("k"))
+
+
+class TestConnectionManagerCache(unittest.TestCase):
+    def setUp(self):
+        self.manager = ExtricaConnectionManager.__new__(ExtricaConnectionManager)
+        self.manager._profiling_sink = None
+        self.manager._metadata_cache = MetadataResultCache()
+
+    @patch("dbt.adapters.sql.connections.SQLConnectionManager.execute")
+    def test_metadata_queries_are_cached(self, execute):
+        execute.return_value = ("response", "table")
+        for _ in range(3):
+            self.assertEqual(
+                self.manager.execute(LIST_SCHEMAS, fetch=True), ("response", "table")
+            )
+        execute.assert_called_once()
+
+        self.manager.execute("select * from db.analytics.orders", fetch=True)
+        self.manager.execute("select * from db.analytics.orders", fetch=True)
+        self.assertEqual(execute.call_count, 3)
+
+    @patch("dbt.adapters.sql.connections.SQLConnectionManager.add_query")
+    @patch("dbt.adapters.sql.connections.SQLConnectionManager.execute")
+    def test_ddl_through_add_query_invalidates(self, execute, add_query):
+        execute.return_value = ("response", "table")
+        add_query.return_value = (None, object())
+        self.manager.execute(SHOW_GRANTS, fetch=True)
+
+        self.manager.add_query("revoke select on db.analytics.orders from role reporting")
+        self.manager.execute(SHOW_GRANTS, fetch=True)
+        self.assertEqual(execute.call_count, 2)
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from dbt.adapters.extrica.connections import ExtricaConnectionManager
+from dbt.adapters.extrica.profiling import ProfilingSink, get_profiling_sink, query_stats
+
+TRINO_STATS = {
+    "state": "FINISHED",
+    "cpuTimeMillis": 1200,
+    "wallTimeMillis": 3400,
+    "queuedTimeMillis": 5,
+    "elapsedTimeMillis": 900,
+    "peakMemoryBytes": 1048576,
+    "processedRows": 1000,
+    "processedBytes": 65536,
+    "totalSplits": 12,
+}
+
+
+def fake_wrapper(stats=TRINO_STATS, streaming=False):
+    cursor = SimpleNamespace(
+        query="select * from t", query_id="20240101_000000_00000_abcde", rowcount=-1, stats=stats
+    )
+    return SimpleNamespace(
+        _cursor=cursor, streaming=streaming, timings={"execute_ms": 12.5, "fetch_ms": 1.5}
+    )
+
+
+class TestQueryStats(unittest.TestCase):
+    def test_stats_are_mapped_to_response_fields(self):
+        stats = query_stats(TRINO_STATS)
+        self.assertEqual(stats["cpu_time_ms"], 1200)
+        self.assertEqual(stats["peak_memory_bytes"], 1048576)
+        self.assertEqual(stats["total_splits"], 12)
+        self.assertNotIn("spilled_bytes", stats)
+        self.assertEqual(query_stats(None), {})
+
+    def test_stats_are_in_adapter_response(self):
+        response = ExtricaConnectionManager.get_response(fake_wrapper())
+        self.assertEqual(response.query_id, "20240101_000000_00000_abcde")
+        self.assertEqual(response.cpu_time_ms, 1200)
+        self.assertEqual(response.processed_bytes, 65536)
+        self.assertEqual(response.to_dict()["wall_time_ms"], 3400)
+
+        response = ExtricaConnectionManager.get_response(fake_wrapper(stats=None))
+        self.assertIsNone(response.cpu_time_ms)
+
+    def test_streamed_response_leaves_out_stats(self):
+        response = ExtricaConnectionManager.get_response(fake_wrapper(streaming=True))
+        self.assertEqual(response.query_id, "20240101_000000_00000_abcde")
+        self.assertIsNone(response.cpu_time_ms)
+        self.assertIsNone(response.processed_rows)
+
+
+class TestProfilingSink(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "profile.jsonl")
+
+    def read_records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_are_appended_as_json_lines(self):
+        sink = ProfilingSink(self.path)
+        sink.record(query_id="a", execute_ms=1.0)
+        sink.close()
+        sink.record(query_id="b", execute_ms=2.0)
+        sink.close()
+
+        records = self.read_records()
+        self.assertEqual([record["query_id"] for record in records], ["a", "b"])
+        self.assertIn("timestamp", records[0])
+
+    def test_sinks_are_shared_per_path(self):
+        self.assertIs(get_profiling_sink(self.path), get_profiling_sink(self.path))
+
+    def test_add_query_records_each_statement(self):
+        manager = ExtricaConnectionManager.__new__(ExtricaConnectionManager)
+        manager._profiling_sink = ProfilingSink(self.path)
+        connection = SimpleNamespace(name="model.x.y")
+
+        with patch(
+            "dbt.adapters.sql.connections.SQLConnectionManager.add_query",
+            return_value=(connection, fake_wrapper()),
+        ) as add_query:
+            manager.add_query("select 1; select 2")
+        manager._profiling_sink.close()
+
+        self.assertEqual(add_query.call_count, 2)
+        records = self.read_records()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["connection"], "model.x.y")
+        self.assertEqual(records[0]["execute_ms"], 12.5)
+        self.assertEqual(records[0]["stats"]["cpu_time_ms"], 1200)
+        self.assertIsNotNone(records[0]["split_ms"])
+        self.assertIsNone(records[1]["split_ms"])
+        self.assertIn("add_query_ms", records[1])
@@ -0,0 +1,120 @@
+import datetime
+import decimal
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from dbt.clients import agate_helper
+
+from dbt.adapters.extrica.seed import (
+    SeedColumnStrategy,
+    build_seed_batches,
+    remove_staged_seed,
+    write_staged_seed,
+)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class TestSeedColumnStrategy(unittest.TestCase):
+    def test_typed_literal(self):
+        strategy = SeedColumnStrategy.from_type("date")
+        self.assertEqual(strategy.render("2024-01-01"), ("DATE '2024-01-01'", None))
+        self.assertEqual(strategy.render("it's"), ("DATE 'it''s'", None))
+
+    def test_interval_literal(self):
+        strategy = SeedColumnStrategy.from_type("interval day to second")
+        self.assertEqual(strategy.render("'2' day"), ("INTERVAL '2' day", None))
+
+    def test_varchar_binding(self):
+        strategy = SeedColumnStrategy.from_type("varchar(10)")
+        self.assertEqual(strategy.render("abc"), (None, "abc"))
+        self.assertEqual(strategy.render(decimal.Decimal(1)), (None, "1"))
+        self.assertEqual(strategy.render(None), (None, None))
+
+    def test_python_typed_binding(self):
+        strategy = SeedColumnStrategy.from_type("DATE")
+        value = datetime.date(2024, 1, 1)
+        self.assertEqual(strategy.render(value), (None, value))
+        self.assertEqual(strategy.render(None), (None, None))
+
+
+class TestBuildSeedBatches(unittest.TestCase):
+    insert_sql = 'insert into "db"."schema"."seed" ("id", "name", "day") values'
+
+    def test_single_batch(self):
+        rows = [[decimal.Decimal(1), "a", "2024-01-01"], [decimal.Decimal(2), None, None]]
+        batches = list(
+            build_seed_batches(self.insert_sql, rows, ["INTEGER", "VARCHAR", "date"], "?")
+        )
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(
+            batches[0].sql, self.insert_sql + "\n(?,?,DATE '2024-01-01'),(?,?,?)"
+        )
+        self.assertEqual(batches[0].bindings, [decimal.Decimal(1), "a", decimal.Decimal(2), None, None])
+
+    def test_batches_are_bounded_by_bytes(self):
+        rows = [[decimal.Decimal(i), "name_{}".format(i), "2024-01-01"] for i in range(10000)]
+        batches = list(
+            build_seed_batches(
+                self.insert_sql, rows, ["INTEGER", "VARCHAR", "date"], "?", batch_bytes=20000
+            )
+        )
+        self.assertGreater(len(batches), 1)
+        for batch in batches:
+            self.assertLessEqual(len(batch.sql) + sum(len(str(b)) for b in batch.bindings), 20000)
+            self.assertEqual(batch.sql.count("("), len(batch.bindings) // 2 + 1)
+        self.assertEqual(sum(len(batch.bindings) for batch in batches), 20000)
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class TestStagedSeed(unittest.TestCase):
+    def test_write_and_remove_local_staged_seed(self):
+        table = agate_helper.table_from_rows(
+            [("1", "a", "true", "2024-01-01", "1.5"), ("2", "", "false", "2024-01-02", "2")],
+            ["ID", "name", "flag", "day", "amount"],
+        )
+        with tempfile.TemporaryDirectory() as staging_dir:
+            staged = write_staged_seed(table, "file://" + staging_dir)
+
+            self.assertEqual(
+                staged.columns,
+                [
+                    ("id", "bigint"),
+                    ("name", "varchar"),
+                    ("flag", "boolean"),
+                    ("day", "date"),
+                    ("amount", "double"),
+                ],
+            )
+            path = staged.location[len("file://") :]
+            written = pq.read_table(os.path.join(path, "part-00000.parquet")).to_pydict()
+            self.assertEqual(written["id"], [1, 2])
+            self.assertEqual(written["name"], ["a", None])
+            self.assertEqual(written["day"], [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)])
+
+            remove_staged_seed(staged.location)
+            self.assertFalse(os.path.exists(path))
+
+    def test_integers_out_of_int64_are_staged_as_text(self):
+        table = agate_helper.table_from_rows(
+            [("1", "18446744073709551616"), ("2", "-3")], ["id", "big"]
+        )
+        with tempfile.TemporaryDirectory() as staging_dir:
+            staged = write_staged_seed(table, "file://" + staging_dir)
+            self.assertEqual(staged.columns, [("id", "bigint"), ("big", "varchar")])
+            path = staged.location[len("file://") :]
+            written = pq.read_table(os.path.join(path, "part-00000.parquet")).to_pydict()
+            self.assertEqual(written["big"], ["18446744073709551616", "-3"])
+
+    def test_failed_write_leaves_nothing_behind(self):
+        table = agate_helper.table_from_rows([("1",)], ["id"])
+        with tempfile.TemporaryDirectory() as staging_dir:
+            with patch.object(pq, "write_table", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    write_staged_seed(table, "file://" + staging_dir)
+            self.assertEqual(os.listdir(staging_dir), [])
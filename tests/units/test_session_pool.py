@@ -0,0 +1,32 @@
+import unittest
+
+from dbt.adapters.extrica.session_pool import HttpSessionPool, get_http_session_pool
+
+
+class TestHttpSessionPool(unittest.TestCase):
+    def test_released_sessions_are_reused(self):
+        pool = HttpSessionPool(max_size=2)
+        session = pool.acquire()
+        pool.release(session)
+
+        self.assertIs(pool.acquire(), session)
+        self.assertEqual(pool.stats()["hits"], 1)
+        self.assertEqual(pool.stats()["misses"], 1)
+
+    def test_idle_sessions_are_bounded(self):
+        pool = HttpSessionPool(max_size=1)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        self.assertEqual(pool.stats()["idle"], 1)
+        pool.resize(3)
+        self.assertEqual(pool.stats()["max_size"], 3)
+
+    def test_pools_are_shared_per_host_and_user(self):
+        pool = get_http_session_pool("pool-host", "user", 2)
+        self.assertIs(pool, get_http_session_pool("pool-host", "user"))
+        self.assertEqual(pool.max_size, 2)
+        get_http_session_pool("pool-host", "user", 5)
+        self.assertEqual(pool.max_size, 5)
+        self.assertIsNot(pool, get_http_session_pool("pool-host", "other"))
@@ -0,0 +1,180 @@
+import unittest
+from types import SimpleNamespace
+
+from dbt.adapters.extrica import ExtricaRelation
+
+from .utils import load_macros
+
+
+class TestSnapshotStagingRelation(unittest.TestCase):
+    def setUp(self):
+        self.statements = []
+        self.background_drops = []
+        self.drops = []
+        self.target = ExtricaRelation.create(
+            database="lake", schema="snapshots", identifier="orders", type="table"
+        )
+
+    def macros(self, supports_merge=True, **config):
+        def statement(name, caller=None):
+            self.statements.append((name, caller()))
+            return ""
+
+        adapter = SimpleNamespace(
+            catalog_supports_merge=lambda database: supports_merge,
+            drop_relation_in_background=self.background_drops.append,
+        )
+        return load_macros(
+            "materializations/snapshot.sql",
+            config=config,
+            adapter=adapter,
+            this=self.target,
+            statement=statement,
+            make_temp_relation=lambda relation: relation.incorporate(
+                path={"identifier": relation.identifier + "__dbt_tmp"}
+            ),
+            snapshot_staging_table=lambda strategy, sql, target: "select 1",
+            create_view_as=lambda relation, sql: "create view {} as {}".format(relation, sql),
+            create_table_as=lambda temporary, relation, sql: "create table {} as {}".format(
+                relation, sql
+            ),
+            drop_relation=self.drops.append,
+        )
+
+    def test_staging_table_by_default(self):
+        staging = self.macros().build_snapshot_staging_table({}, "select 1", self.target)
+        self.assertFalse(staging.is_view)
+        self.assertIn('create table "lake"."snapshots"."orders__dbt_tmp"', self.statements[0][1])
+
+        self.macros().extrica__post_snapshot(staging)
+        self.assertEqual(self.drops, [staging])
+        self.assertEqual(self.background_drops, [])
+
+    def test_staging_view_is_dropped_in_background(self):
+        macros = self.macros(snapshot_staging_view=True)
+        staging = macros.build_snapshot_staging_table({}, "select 1", self.target)
+        self.assertTrue(staging.is_view)
+        self.assertIn('create view "lake"."snapshots"."orders__dbt_tmp"', self.statements[0][1])
+
+        macros.extrica__post_snapshot(staging)
+        self.assertEqual(self.background_drops, [staging])
+        self.assertEqual(self.drops, [])
+
+    def test_staging_view_falls_back_to_a_table_without_merge(self):
+        macros = self.macros(supports_merge=False, snapshot_staging_view=True)
+        staging = macros.build_snapshot_staging_table({}, "select 1", self.target)
+        self.assertFalse(staging.is_view)
+
+    def test_merge_reads_the_staging_view(self):
+        staging = self.target.incorporate(path={"identifier": "orders__dbt_tmp"}, type="view")
+        macros = self.macros(snapshot_staging_view=True)
+        sql = " ".join(
+            macros.extrica__snapshot_merge_sql(self.target, staging, ["id", "dbt_scd_id"]).split()
+        )
+        self.assertIn(
+            'merge into "lake"."snapshots"."orders" as DBT_INTERNAL_DEST '
+            'using "lake"."snapshots"."orders__dbt_tmp" as DBT_INTERNAL_SOURCE '
+            "on DBT_INTERNAL_SOURCE.dbt_scd_id = DBT_INTERNAL_DEST.dbt_scd_id",
+            sql,
+        )
+        self.assertIn(
+            "then insert (id, dbt_scd_id) "
+            "values (DBT_INTERNAL_SOURCE.id, DBT_INTERNAL_SOURCE.dbt_scd_id)",
+            sql,
+        )
+
+
+class TestSnapshotCheckHashStrategy(unittest.TestCase):
+    def setUp(self):
+        self.statements = []
+        self.warnings = []
+        self.target = ExtricaRelation.create(
+            database="lake", schema="snapshots", identifier="orders", type="table"
+        )
+        self.node = {
+            "database": "lake",
+            "schema": "snapshots",
+            "alias": "orders",
+            "compiled_code": "select * from orders",
+        }
+
+    def strategy(self, check_cols, target_exists=False, target_columns=()):
+        def statement(name, caller=None):
+            self.statements.append((name, " ".join(caller().split())))
+            return ""
+
+        adapter = SimpleNamespace(
+            quote=lambda column: '"{}"'.format(column),
+            get_relation=lambda database, schema, identifier: self.target,
+            get_columns_in_relation=lambda relation: [
+                SimpleNamespace(name=name) for name in target_columns
+            ],
+            invalidate_relation_caches=lambda relation: "",
+        )
+        macros = load_macros(
+            "materializations/snapshot.sql",
+            adapter=adapter,
+            statement=statement,
+            snapshot_get_time=lambda: "current_timestamp",
+            get_columns_in_query=lambda sql: ["id", "status"],
+            snapshot_hash_arguments=lambda args: "md5({})".format(", ".join(args)),
+            exceptions=SimpleNamespace(raise_compiler_error=self.fail, warn=self.warnings.append),
+        )
+        return macros.snapshot_check_hash_strategy(
+            self.node,
+            "snapshotted_data",
+            "snapshotted_data_current",
+            {"check_cols": check_cols, "unique_key": "id"},
+            target_exists,
+        )
+
+    def test_rows_are_compared_on_the_hash(self):
+        strategy = self.strategy(["status", "amount"])
+        self.assertEqual(strategy["unique_key"], "id")
+        self.assertEqual(strategy["scd_id"], "md5(id, current_timestamp)")
+        self.assertEqual(
+            strategy["change_hash"],
+            "from_big_endian_64(xxhash64(to_utf8(concat("
+            "coalesce(cast(status as varchar), chr(0)), '|',"
+            "coalesce(cast(amount as varchar), chr(0))))))",
+        )
+        self.assertEqual(
+            strategy["row_changed"],
+            "(snapshotted_data.dbt_change_hash is null"
+            " or snapshotted_data.dbt_change_hash != snapshotted_data_current.dbt_change_hash)",
+        )
+        self.assertEqual(self.statements, [])
+
+    def test_all_columns_are_quoted(self):
+        strategy = self.strategy("all")
+        self.assertIn('coalesce(cast("id" as varchar), chr(0))', strategy["change_hash"])
+        self.assertIn('coalesce(cast("status" as varchar), chr(0))', strategy["change_hash"])
+
+    def test_existing_snapshot_gets_a_backfilled_hash(self):
+        self.strategy(
+            ["status"], target_exists=True, target_columns=["ID", "STATUS", "dbt_valid_to"]
+        )
+        self.assertEqual(
+            [name for name, sql in self.statements], ["add_change_hash", "backfill_change_hash"]
+        )
+        self.assertEqual(
+            self.statements[0][1],
+            'alter table "lake"."snapshots"."orders" add column dbt_change_hash bigint',
+        )
+        self.assertEqual(
+            self.statements[1][1],
+            'update "lake"."snapshots"."orders" set dbt_change_hash = '
+            "from_big_endian_64(xxhash64(to_utf8(concat("
+            "coalesce(cast(status as varchar), chr(0)))))) where dbt_valid_to is null",
+        )
+        self.assertEqual(self.warnings, [])
+
+    def test_backfill_is_skipped_with_a_warning_without_the_check_columns(self):
+        self.strategy(["status", "amount"], target_exists=True, target_columns=["id", "status"])
+        self.assertEqual([name for name, sql in self.statements], ["add_change_hash"])
+        self.assertEqual(len(self.warnings), 1)
+        self.assertIn("has no column amount", self.warnings[0])
+
+    def test_hash_column_is_added_once(self):
+        self.strategy(["status"], target_exists=True, target_columns=["id", "dbt_change_hash"])
+        self.assertEqual(self.statements, [])
@@ -0,0 +1,148 @@
+import unittest
+from types import SimpleNamespace
+
+from dbt.adapters.extrica import ExtricaRelation
+
+from .utils import load_macros
+
+
+class TestTableReplaceMode(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.target = ExtricaRelation.create(
+            database="lake", schema="marts", identifier="orders", type="table"
+        )
+
+    def materialize(self, existing=None, supports_create_or_replace=True, enforced=False):
+        events = self.events
+        cached = {} if existing is None else {str(existing): existing}
+
+        def record(*event):
+            events.append(event)
+            return ""
+
+        def statement(name, caller=None):
+            return record("statement", name, " ".join(caller().split()))
+
+        adapter = SimpleNamespace(
+            catalog_supports_create_or_replace=lambda database: supports_create_or_replace,
+            drop_relation=lambda relation: record("drop", str(relation)),
+            rename_relation=lambda old, new: record("rename", str(old), str(new)),
+            drop_relation_in_background=lambda relation: record(
+                "drop_in_background", str(relation)
+            ),
+            invalidate_relation_caches=lambda relation: record("invalidate", str(relation)),
+        )
+        macros = load_macros(
+            "materializations/table.sql",
+            config={
+                "on_table_exists": "replace",
+                "contract": SimpleNamespace(enforced=enforced),
+            },
+            adapter=adapter,
+            this=self.target,
+            sql="select 1 as id",
+            model={"description": None},
+            pre_hooks=[],
+            post_hooks=[],
+            log=lambda message: "",
+            load_cached_relation=lambda relation: cached.get(str(relation)),
+            make_intermediate_relation=lambda relation: relation.incorporate(
+                path={"identifier": relation.identifier + "__dbt_tmp"}
+            ),
+            make_backup_relation=lambda relation, relation_type: relation.incorporate(
+                path={"identifier": relation.identifier + "__dbt_backup"}, type=relation_type
+            ),
+            drop_relation_if_exists=lambda relation: (
+                record("drop", str(relation)) if relation is not None else ""
+            ),
+            run_hooks=lambda hooks: "",
+            statement=statement,
+            create_table_as=lambda temporary, relation, sql: "create table {} as ({})".format(
+                relation, sql
+            ),
+            comment=lambda description: "",
+            properties=lambda properties: "",
+            persist_docs=lambda relation, model: "",
+            should_revoke=lambda existing, full_refresh_mode: existing is not None,
+            apply_grants=lambda relation, grants, should_revoke: record(
+                "grants", str(relation), should_revoke
+            ),
+        )
+        return macros.materialization_table_extrica()
+
+    def test_new_table_is_created_in_place(self):
+        result = self.materialize()
+        self.assertEqual(result["relations"], [self.target])
+        self.assertEqual(
+            self.events,
+            [
+                (
+                    "statement",
+                    "main",
+                    'create table "lake"."marts"."orders" as (select 1 as id)',
+                ),
+                ("grants", '"lake"."marts"."orders"', False),
+            ],
+        )
+
+    def test_existing_table_is_replaced_by_the_connector(self):
+        self.materialize(existing=self.target)
+        self.assertEqual(
+            self.events,
+            [
+                (
+                    "statement",
+                    "main",
+                    'create or replace table "lake"."marts"."orders" as ( select 1 as id )',
+                ),
+                ("invalidate", '"lake"."marts"."orders"'),
+                ("grants", '"lake"."marts"."orders"', True),
+            ],
+        )
+
+    def test_replace_falls_back_to_renames(self):
+        for supports_create_or_replace, enforced in [(False, False), (True, True)]:
+            with self.subTest(
+                supports_create_or_replace=supports_create_or_replace, enforced=enforced
+            ):
+                self.events.clear()
+                self.materialize(
+                    existing=self.target,
+                    supports_create_or_replace=supports_create_or_replace,
+                    enforced=enforced,
+                )
+                self.assertEqual(
+                    self.events,
+                    [
+                        (
+                            "statement",
+                            "main",
+                            'create table "lake"."marts"."orders__dbt_tmp" as (select 1 as id)',
+                        ),
+                        (
+                            "rename",
+                            '"lake"."marts"."orders"',
+                            '"lake"."marts"."orders__dbt_backup"',
+                        ),
+                        ("rename", '"lake"."marts"."orders__dbt_tmp"', '"lake"."marts"."orders"'),
+                        ("drop_in_background", '"lake"."marts"."orders__dbt_backup"'),
+                        ("grants", '"lake"."marts"."orders"', True),
+                    ],
+                )
+
+    def test_existing_view_is_dropped_before_the_table_is_created(self):
+        view = self.target.incorporate(type="view")
+        self.materialize(existing=view)
+        self.assertEqual(
+            self.events,
+            [
+                ("drop", '"lake"."marts"."orders"'),
+                (
+                    "statement",
+                    "main",
+                    'create table "lake"."marts"."orders" as (select 1 as id)',
+                ),
+                ("grants", '"lake"."marts"."orders"', False),
+            ],
+        )
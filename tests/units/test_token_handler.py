@@ -0,0 +1,138 @@
+import datetime
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import jwt
+import trino
+
+from dbt.adapters.extrica.token_handler import (
+    ExtricaJWTAuthentication,
+    JWTHandler,
+    get_jwt_handler,
+)
+
+
+def make_token(expires_in=datetime.timedelta(hours=1)):
+    exp = datetime.datetime.now() + expires_in
+    return jwt.encode({"exp": int(exp.timestamp())}, "secret" * 8, algorithm="HS256")
+
+
+def signin_response(token):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = {"accessToken": token}
+    return response
+
+
+class TestJWTHandler(unittest.TestCase):
+    def setUp(self):
+        self.handler = JWTHandler(host="extrica", username="user", password="pass")
+        self.addCleanup(self.handler.stop)
+
+    @patch("requests.Session.post")
+    def test_token_is_cached_until_expiry(self, post):
+        token = make_token()
+        post.return_value = signin_response(token)
+
+        self.assertEqual(self.handler.get_token(), token)
+        self.assertEqual(self.handler.get_token(), token)
+        post.assert_called_once()
+        self.assertIsNotNone(self.handler.expires_at)
+
+    @patch("dbt.adapters.extrica.token_handler.jwt.decode")
+    @patch("requests.Session.post")
+    def test_expiry_is_decoded_once(self, post, decode):
+        decode.return_value = {"exp": int(time.time()) + 3600}
+        post.return_value = signin_response("token")
+
+        for _ in range(5):
+            self.handler.get_token()
+            self.handler.is_expired()
+        decode.assert_called_once()
+
+    @patch("requests.Session.post")
+    def test_token_within_leeway_is_refreshed(self, post):
+        post.return_value = signin_response(make_token(datetime.timedelta(minutes=1)))
+        self.handler.get_token()
+
+        token = make_token()
+        post.return_value = signin_response(token)
+        self.assertEqual(self.handler.get_token(), token)
+        self.assertEqual(post.call_count, 2)
+
+    @patch("requests.Session.post")
+    def test_concurrent_sign_in_is_single_flight(self, post):
+        def slow_signin(*args, **kwargs):
+            time.sleep(0.05)
+            return signin_response(make_token())
+
+        post.side_effect = slow_signin
+        threads = [threading.Thread(target=self.handler.get_token) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        post.assert_called_once()
+
+    @patch("requests.Session.post")
+    def test_background_refresh_is_scheduled(self, post):
+        post.return_value = signin_response(make_token())
+        self.handler.get_token()
+
+        timer = self.handler._refresh_timer
+        self.assertIsNotNone(timer)
+        self.assertTrue(timer.daemon)
+        self.assertLess(timer.interval, 3600 - self.handler.refresh_ahead.total_seconds() + 1)
+
+
+    @patch("requests.Session.post")
+    def test_failed_background_refresh_is_rescheduled(self, post):
+        post.return_value = signin_response(make_token())
+        self.handler.get_token()
+
+        post.side_effect = ConnectionError("sign-in endpoint unreachable")
+        self.handler._refresh()
+
+        timer = self.handler._refresh_timer
+        self.assertIsNotNone(timer)
+        self.assertTrue(timer.is_alive())
+
+
+class TestJWTHandlerRegistry(unittest.TestCase):
+    def test_handlers_are_shared_per_host_and_user(self):
+        first = get_jwt_handler("host-a", "user", "pass")
+        self.assertIs(first, get_jwt_handler("host-a", "user", "pass"))
+        self.assertIsNot(first, get_jwt_handler("host-b", "user", "pass"))
+        self.assertIsNot(first, get_jwt_handler("host-a", "other", "pass"))
+
+    def test_changed_password_replaces_handler(self):
+        first = get_jwt_handler("host-c", "user", "old")
+        with patch.object(first, "stop") as stop:
+            second = get_jwt_handler("host-c", "user", "new")
+        stop.assert_called_once()
+        self.assertIsNot(first, second)
+        self.assertEqual(second.password, "new")
+
+
+class TestExtricaJWTAuthentication(unittest.TestCase):
+    def test_token_is_resolved_per_request(self):
+        tokens = iter(["first", "second"])
+        session = trino.client.TrinoRequest.http.Session()
+        ExtricaJWTAuthentication(lambda: next(tokens)).set_http_session(session)
+
+        request = MagicMock()
+        request.headers = {}
+        session.auth(request)
+        self.assertEqual(request.headers["Authorization"], "Bearer first")
+        session.auth(request)
+        self.assertEqual(request.headers["Authorization"], "Bearer second")
+
+    def test_missing_token_raises_auth_error(self):
+        session = trino.client.TrinoRequest.http.Session()
+        ExtricaJWTAuthentication(lambda: None).set_http_session(session)
+
+        with self.assertRaises(trino.exceptions.TrinoAuthError):
+            session.auth(MagicMock())
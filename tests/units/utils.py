@@ -188,3 +188,48 @@ def generate_name_macros(package):
             macro_sql=sql,
         )
         yield pm
+
+
+def load_macros(path, **context):
+    """The macros of `path`, relative to the adapter's macros directory, as
+    functions returning what the macro returns (or renders). The macros of
+    the file can call each other; anything else they use comes from
+    `context`. Materializations are named like dbt names them, e.g.
+    `materialization_table_extrica`.
+    """
+    import re
+    from argparse import Namespace
+    from types import SimpleNamespace
+
+    from dbt.clients.jinja import MacroReturn, get_template
+    from dbt.flags import set_from_args
+    from dbt.include.extrica import PACKAGE_PATH
+
+    set_from_args(Namespace(), {})
+    with open(os.path.join(PACKAGE_PATH, "macros", path)) as f:
+        source = f.read()
+
+    def raise_return(value):
+        raise MacroReturn(value)
+
+    macros = {}
+
+    def as_function(name):
+        def call(*args, **kwargs):
+            try:
+                return getattr(macros["module"], f"dbt_macro__{name}")(*args, **kwargs)
+            except MacroReturn as e:
+                return e.value
+
+        return call
+
+    names = re.findall(r"{%-?\s*macro\s+(\w+)", source)
+    names += [
+        f"materialization_{name}_{adapter}"
+        for name, adapter in re.findall(
+            r"{%-?\s*materialization\s+(\w+),\s*adapter\s*=\s*'(\w+)'", source
+        )
+    ]
+    functions = {name: as_function(name) for name in names}
+    macros["module"] = get_template(source, {"return": raise_return, **context, **functions}).module
+    return SimpleNamespace(**functions)